@@ -0,0 +1,107 @@
+"""
+Benchmarks serving a locally cached artefact through a read-and-stream response against LocalArtefactResponse.
+
+Starts uvicorn in a subprocess, downloads the artefact repeatedly through each path and reports
+throughput and server CPU seconds per GB served (read from /proc, so Linux only).
+
+Usage:
+    python benchmarks/artefact_serving.py --size-mb 1024 --requests 8
+"""
+import argparse
+import http.client
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import StreamingResponse  # noqa: E402
+
+from local_artefacts import LocalArtefactResponse  # noqa: E402
+
+READ_SIZE = 1024 * 1024
+
+
+def create_app(path: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/streamed")
+    def streamed():
+        def chunks():
+            with open(path, 'rb') as f:
+                while data := f.read(READ_SIZE):
+                    yield data
+        return StreamingResponse(chunks(), media_type='application/octet-stream')
+
+    @app.get("/mapped")
+    def mapped(request: Request):
+        return LocalArtefactResponse(path, request.headers.get('range'))
+
+    return app
+
+
+def server_cpu_seconds(pid: int) -> float:
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def download(port: int, route: str) -> int:
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    connection.request('GET', route)
+    response = connection.getresponse()
+    buffer = bytearray(READ_SIZE)
+    received = 0
+    while n := response.readinto(buffer):
+        received += n
+    connection.close()
+    return received
+
+
+def wait_for_server(port: int) -> None:
+    for _ in range(100):
+        try:
+            http.client.HTTPConnection('127.0.0.1', port).connect()
+            return
+        except ConnectionRefusedError:
+            time.sleep(0.1)
+    raise RuntimeError('Server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size-mb', type=int, default=512)
+    parser.add_argument('--requests', type=int, default=8)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        import uvicorn
+        uvicorn.run(create_app(args.serve), host='127.0.0.1', port=args.port, log_level='warning')
+        return
+
+    with tempfile.NamedTemporaryFile() as artefact:
+        for _ in range(args.size_mb):
+            artefact.write(os.urandom(1024 * 1024))
+        artefact.flush()
+        server = subprocess.Popen([sys.executable, __file__, '--serve', artefact.name, '--port', str(args.port)])
+        try:
+            wait_for_server(args.port)
+            download(args.port, '/mapped')  # warm the page cache
+            for route in ('/streamed', '/mapped'):
+                cpu_before, start = server_cpu_seconds(server.pid), time.perf_counter()
+                served = sum(download(args.port, route) for _ in range(args.requests))
+                elapsed, cpu = time.perf_counter() - start, server_cpu_seconds(server.pid) - cpu_before
+                gigabytes = served / 1024 ** 3
+                print(f'{route:10} {gigabytes / elapsed:6.2f} GB/s  {cpu / gigabytes:6.2f} server CPU s/GB')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
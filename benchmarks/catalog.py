@@ -0,0 +1,98 @@
+"""
+Benchmarks the in-memory model catalog: memory per 100k models, snapshot save/restore and refresh cost.
+
+Memory and snapshot timings use synthetic records. Refresh cost compares a full load with an
+incremental refresh against an in-process DynamoDB mock, which needs `moto` installed.
+
+Usage:
+    python benchmarks/catalog.py --models 100000 --refresh-models 5000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import catalog as catalog_module  # noqa: E402
+from catalog import Catalog, CatalogRecord, _intern_tags  # noqa: E402
+from ids import generate_model_id  # noqa: E402
+
+TEAMS = ['vision', 'nlp', 'speech', 'recsys']
+
+
+def synthetic_record(i: int) -> CatalogRecord:
+    tags = {'team': random.choice(TEAMS), 'framework': 'pytorch', 'stage': random.choice(['dev', 'prod'])}
+    return CatalogRecord(generate_model_id(), f'model-{i}', random.randint(1, 20), time.time(),
+                         _intern_tags(tags.items()))
+
+
+def benchmark_memory_and_snapshot(models: int) -> None:
+    tracemalloc.start()
+    catalog = Catalog()
+    for i in range(models):
+        record = synthetic_record(i)
+        catalog.apply(record.model_id, record)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'memory: {used / 1024 ** 2:.1f} MB for {models} models ({used / models:.0f} bytes/model)')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'catalog.json')
+        start = time.perf_counter()
+        catalog.save(path)
+        saved = time.perf_counter()
+        Catalog.from_file(path)
+        restored = time.perf_counter()
+        print(f'snapshot: {os.path.getsize(path) / 1024 ** 2:.1f} MB, save {saved - start:.2f}s, '
+              f'restore {restored - saved:.2f}s')
+
+
+def benchmark_refresh(models: int, changed: int) -> None:
+    try:
+        from moto import mock_dynamodb
+    except ImportError:
+        print('refresh: skipped, moto is not installed')
+        return
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    with mock_dynamodb():
+        from models import ModelTable
+        ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        with ModelTable.batch_write() as batch:
+            for i in range(models):
+                batch.save(ModelTable(model_id=generate_model_id(), name=f'model-{i}', tags={'team': 'vision'}))
+        catalog = Catalog()
+        start = time.perf_counter()
+        catalog.load()
+        loaded = time.perf_counter()
+
+        # Without an overlap window only the models touched below are newer than the watermark.
+        catalog_module.REFRESH_OVERLAP = timedelta(0)
+        catalog.watermark = time.time()
+        time.sleep(0.01)
+        for record in random.sample(list(catalog), changed):
+            ModelTable(model_id=record.model_id, name='updated').save()
+        refresh_start = time.perf_counter()
+        read = catalog.refresh()
+        refreshed = time.perf_counter()
+        print(f'refresh: full load of {models} models {loaded - start:.2f}s, '
+              f'incremental refresh reading {read} changed models {refreshed - refresh_start:.2f}s')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--models', type=int, default=100_000)
+    parser.add_argument('--refresh-models', type=int, default=5_000)
+    parser.add_argument('--changed', type=int, default=50)
+    args = parser.parse_args()
+    benchmark_memory_and_snapshot(args.models)
+    benchmark_refresh(args.refresh_models, args.changed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Compares reading model metadata with the registry client against raw `requests` calls.
+
+Starts the server as `benchmarks/load_test.py` does, against DynamoDB and S3 stand-ins with
+`--dynamodb-latency-ms` of injected latency, then reads `--reads` random models from
+`--models` in each of these ways:
+
+- `requests.get` per read, which opens a new connection every time, as ad-hoc scripts do;
+- one `requests.Session`, which keeps its connection alive;
+- `RegistryClient.read_model`, which keeps connections alive and revalidates cached models with ETags;
+- `RegistryClient.read_models`, which also sends `--concurrency` reads at a time.
+
+Needs `moto`, `httpx` and `requests` installed.
+
+Usage:
+    python benchmarks/client.py --reads 2000 --models 200 --concurrency 16 --dynamodb-latency-ms 2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import requests  # noqa: E402
+
+from client import RegistryClient  # noqa: E402
+from load_test import AUTH, model_id, start_server, wait_until_ready  # noqa: E402
+
+
+def percentile(ordered, p):
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def run(label, read, ids):
+    latencies = []
+    start = time.perf_counter()
+    for i in ids:
+        began = time.perf_counter()
+        read(i)
+        latencies.append((time.perf_counter() - began) * 1000)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f'{label:22} {len(ids) / elapsed:8.0f} reads/s  p50 {percentile(latencies, 50):6.2f}ms  '
+          f'p99 {percentile(latencies, 99):6.2f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--reads', type=int, default=2000)
+    parser.add_argument('--models', type=int, default=200, help='Models to read from')
+    parser.add_argument('--concurrency', type=int, default=16, help='Concurrent reads in the batch helper')
+    parser.add_argument('--workers', type=int, default=1, help='Server worker processes')
+    parser.add_argument('--dynamodb-latency-ms', type=float, default=2.0)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    args.artefact_models, args.artefact_kb, args.s3_latency_ms = 0, 1, 0.0
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    server = start_server(args.workers, args.port, args)
+    try:
+        asyncio.run(wait_until_ready(base_url, server, args.workers))
+        rng = random.Random(0)
+        ids = [model_id(rng.randrange(args.models)) for _ in range(args.reads)]
+
+        run('requests.get', lambda i: requests.get(f'{base_url}/models/{i}', auth=AUTH).json(), ids)
+        with requests.Session() as session:
+            session.auth = AUTH
+            run('requests.Session', lambda i: session.get(f'{base_url}/models/{i}').json(), ids)
+        with RegistryClient(base_url, auth=AUTH, max_connections=args.concurrency) as client:
+            run('RegistryClient', client.read_model, ids)
+            print(f'{"":22} {client.cache.revalidations} of {len(ids)} reads answered 304 Not Modified')
+
+        with RegistryClient(base_url, auth=AUTH, max_connections=args.concurrency) as client:
+            start = time.perf_counter()
+            for batch in range(0, len(ids), args.concurrency * 4):
+                client.read_models(ids[batch:batch + args.concurrency * 4])
+            elapsed = time.perf_counter() - start
+            print(f'{"RegistryClient batch":22} {len(ids) / elapsed:8.0f} reads/s  '
+                  f'({args.concurrency} concurrent)')
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures read_model latency percentiles with and without hedged reads.
+
+Runs against an in-process DynamoDB stand-in (moto) whose responses take `--latency-ms`, except
+for a `--slow-fraction` of them that take `--slow-ms`, the occasional slow response that
+dominates p99 in production. Every attempt draws its own latency, as a retried request reaching a
+different storage node does. Reads are issued by `--threads` concurrent readers.
+
+Usage:
+    python benchmarks/hedged_reads.py --reads 3000 --latency-ms 4 --slow-ms 100 --slow-fraction 0.03
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+
+def percentile(ordered, p):
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+def run(label, read_model, args, model_ids):
+    def timed_read(model_id):
+        start = time.perf_counter()
+        read_model(model_id)
+        return (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = sorted(pool.map(timed_read, (random.choice(model_ids) for _ in range(args.reads))))
+    print(f'{label:10} p50 {percentile(latencies, 50):7.2f}ms  p90 {percentile(latencies, 90):7.2f}ms  '
+          f'p99 {percentile(latencies, 99):7.2f}ms  p99.9 {percentile(latencies, 99.9):7.2f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--reads', type=int, default=3000)
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent readers')
+    parser.add_argument('--latency-ms', type=float, default=4.0, help='Latency of a normal response')
+    parser.add_argument('--slow-ms', type=float, default=100.0, help='Latency of a slow response')
+    parser.add_argument('--slow-fraction', type=float, default=0.03, help='Fraction of responses that are slow')
+    parser.add_argument('--percentile', type=float, default=95.0, help='Hedge after this latency percentile')
+    parser.add_argument('--budget', type=float, default=0.05, help='Fraction of reads that may be hedged')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    from botocore.handlers import BUILTIN_HANDLERS
+    from moto import mock_dynamodb
+
+    def inject_latency(**kwargs):
+        slow = random.random() < args.slow_fraction
+        time.sleep((args.slow_ms if slow else args.latency_ms) / 1000)
+
+    # Registered before any client exists so PynamoDB's client picks it up.
+    BUILTIN_HANDLERS.append(('before-send.dynamodb', inject_latency))
+
+    with mock_dynamodb():
+        import operations
+        from models import ModelTable
+
+        ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        model_ids = [f'model-{i}' for i in range(100)]
+        with ModelTable.batch_write() as batch:
+            for model_id in model_ids:
+                batch.save(ModelTable(model_id=model_id, name=model_id))
+
+        run('plain', operations.read_model, args, model_ids)
+        hedger = operations.enable_hedged_reads(percentile=args.percentile, budget=args.budget)
+        run('hedged', operations.read_model, args, model_ids)
+        stats = hedger.stats()
+        print(f'hedged {stats["hedges"]} of {stats["requests"]} reads ({stats["hedge_rate"]:.1%}), '
+              f'{stats["hedge_wins"]} hedges won ({stats["win_rate"]:.0%}), '
+              f'{stats["hedges_denied"]} denied by the budget')
+        operations.disable_hedged_reads()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,284 @@
+"""
+Load-tests the API server at a realistic request mix to find how much traffic a number of workers can take.
+
+Starts `src/server.py` under uvicorn with the requested number of worker processes. Each worker
+runs against in-process DynamoDB and S3 stand-ins (moto) that sleep for a configurable latency on
+every call, so workers block on AWS the way they do in production. The stand-ins are seeded with
+the same models in every worker. Updates made through one worker are not seen by the others, which
+does not matter for load. The stand-ins also use CPU inside the workers, so absolute throughput is
+somewhat below production. Comparisons between worker counts are still meaningful.
+
+For each worker count, a closed-loop async load generator runs at increasing concurrency. Each
+step reports throughput, latency percentiles and rejected requests (the 429/503 responses from
+admission control). The knee is the concurrency level beyond which throughput stops growing by
+more than 10% per step while latency keeps rising. Pass `--output` to append one JSON line per
+step for later comparison.
+
+Needs `moto` and `httpx` installed.
+
+Usage:
+    python benchmarks/load_test.py --workers 1,2,4 --concurrency 1,4,16,64 --mix read=70,update=20,artefact=10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Optional
+
+import httpx
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_DIR)
+
+OPERATIONS = ('read', 'update', 'artefact')
+AUTH = ('user', 'password')
+# A step whose throughput grows by less than this fraction over the previous step is past the knee.
+KNEE_GAIN = 0.10
+
+
+def model_id(i: int) -> str:
+    return f'load-{i:06d}'
+
+
+def create_app():
+    """
+    Builds the server app against seeded AWS stand-ins. Runs once in every uvicorn worker; settings
+    arrive through LOAD_TEST_* environment variables because workers are started by import string.
+    """
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'load-test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'load-test')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    from botocore.handlers import BUILTIN_HANDLERS
+    from moto import mock_dynamodb, mock_s3
+
+    latency = {'dynamodb': 0.0, 's3': 0.0}
+
+    def inject_latency(service: str):
+        def handler(**kwargs):
+            if latency[service]:
+                time.sleep(latency[service])
+        return handler
+
+    # Registered before any client exists so every client, including PynamoDB's, picks them up.
+    BUILTIN_HANDLERS.append(('before-send.dynamodb', inject_latency('dynamodb')))
+    BUILTIN_HANDLERS.append(('before-send.s3', inject_latency('s3')))
+    mock_dynamodb().start()
+    mock_s3().start()
+
+    import server
+    import storage
+    from models import ModelTable
+
+    ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+    storage.backend.s3.create_bucket(Bucket=storage.backend.bucket_name)
+    rng = random.Random(0)
+    with ModelTable.batch_write() as batch:
+        for i in range(int(os.environ['LOAD_TEST_MODELS'])):
+            batch.save(ModelTable(model_id=model_id(i), name=f'model-{i}', description='load test model',
+                                  tags={'team': rng.choice(['vision', 'nlp', 'speech'])}))
+    artefact = rng.randbytes(int(os.environ['LOAD_TEST_ARTEFACT_KB']) * 1024)
+    for i in range(int(os.environ['LOAD_TEST_ARTEFACT_MODELS'])):
+        storage.store_artefact_fileobj(model_id(i), _BytesReader(artefact))
+
+    latency['dynamodb'] = float(os.environ['LOAD_TEST_DYNAMODB_LATENCY_MS']) / 1000
+    latency['s3'] = float(os.environ['LOAD_TEST_S3_LATENCY_MS']) / 1000
+    return server.app
+
+
+class _BytesReader:
+    def __init__(self, data: bytes):
+        self._data = memoryview(data)
+        self._offset = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._offset + size
+        chunk = self._data[self._offset:end]
+        self._offset += len(chunk)
+        return bytes(chunk)
+
+
+class Sample(NamedTuple):
+    operation: str
+    status: int
+    latency: float
+
+
+class StepResult(NamedTuple):
+    workers: int
+    concurrency: int
+    duration: float
+    requests: int
+    throughput: float
+    rejected: int
+    errors: int
+    percentiles: Dict[str, float]
+    by_operation: Dict[str, Dict[str, float]]
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)] if ordered else float('nan')
+
+
+def summarize(samples: List[Sample]) -> Dict[str, float]:
+    latencies = sorted(sample.latency * 1000 for sample in samples)
+    return {f'p{p}': round(percentile(latencies, p), 2) for p in (50, 90, 99, 99.9)}
+
+
+async def run_step(base_url: str, concurrency: int, duration: float, mix: Dict[str, float], models: int,
+                   artefact_models: int, update_bytes: int) -> List[Sample]:
+    operations, weights = zip(*mix.items())
+    samples: List[Sample] = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, auth=AUTH, limits=limits, timeout=60) as client:
+        async def user(seed: int):
+            rng = random.Random(seed)
+            while time.perf_counter() < deadline:
+                operation = rng.choices(operations, weights)[0]
+                start = time.perf_counter()
+                if operation == 'read':
+                    response = await client.get(f'/models/{model_id(rng.randrange(models))}')
+                elif operation == 'update':
+                    body = {'description': 'x' * update_bytes, 'tags': {'step': rng.randrange(1000)}}
+                    response = await client.put(f'/models/{model_id(rng.randrange(models))}', json=body)
+                else:
+                    async with client.stream('GET', f'/models/{model_id(rng.randrange(artefact_models))}/artefact') \
+                            as response:
+                        async for _ in response.aiter_raw():
+                            pass
+                samples.append(Sample(operation, response.status_code, time.perf_counter() - start))
+
+        await asyncio.gather(*(user(seed) for seed in range(concurrency)))
+    return samples
+
+
+def step_result(workers: int, concurrency: int, duration: float, samples: List[Sample]) -> StepResult:
+    statuses = Counter(sample.status for sample in samples)
+    ok = [sample for sample in samples if sample.status < 400]
+    by_operation = defaultdict(list)
+    for sample in ok:
+        by_operation[sample.operation].append(sample)
+    return StepResult(
+        workers=workers, concurrency=concurrency, duration=duration, requests=len(samples),
+        throughput=round(len(ok) / duration, 1), rejected=statuses[429] + statuses[503],
+        errors=sum(count for status, count in statuses.items() if status >= 400 and status not in (429, 503)),
+        percentiles=summarize(ok),
+        by_operation={operation: {'count': len(group), **summarize(group)}
+                      for operation, group in sorted(by_operation.items())})
+
+
+def find_knee(results: List[StepResult]) -> Optional[StepResult]:
+    """
+    Returns the step after which more concurrency stops buying throughput, or None if it kept growing.
+    """
+    for previous, current in zip(results, results[1:]):
+        if current.throughput < previous.throughput * (1 + KNEE_GAIN):
+            return previous
+    return None
+
+
+def start_server(workers: int, port: int, args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC_DIR, os.environ.get('PYTHONPATH', '')]),
+               LOAD_TEST_MODELS=str(args.models), LOAD_TEST_ARTEFACT_MODELS=str(args.artefact_models),
+               LOAD_TEST_ARTEFACT_KB=str(args.artefact_kb),
+               LOAD_TEST_DYNAMODB_LATENCY_MS=str(args.dynamodb_latency_ms),
+               LOAD_TEST_S3_LATENCY_MS=str(args.s3_latency_ms))
+    command = [sys.executable, '-m', 'uvicorn', 'load_test:create_app', '--factory',
+               '--app-dir', os.path.dirname(os.path.abspath(__file__)), '--host', '127.0.0.1',
+               '--port', str(port), '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    return subprocess.Popen(command, env=env)
+
+
+async def wait_until_ready(base_url: str, server: subprocess.Popen, workers: int) -> None:
+    async with httpx.AsyncClient(base_url=base_url, auth=AUTH) as client:
+        for _ in range(600):
+            if server.poll() is not None:
+                raise RuntimeError('Server exited during startup')
+            try:
+                # Several requests, so every worker is likely to have finished seeding.
+                responses = await asyncio.gather(*(client.get(f'/models/{model_id(0)}') for _ in range(workers * 4)))
+                if all(response.status_code == 200 for response in responses):
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError('Server did not start')
+
+
+def print_step(result: StepResult) -> None:
+    p = result.percentiles
+    print(f'workers={result.workers:<3} concurrency={result.concurrency:<5} {result.throughput:9.1f} req/s  '
+          f'p50 {p["p50"]:8.2f}ms  p99 {p["p99"]:8.2f}ms  p99.9 {p["p99.9"]:8.2f}ms  '
+          f'rejected {result.rejected:<6} errors {result.errors}')
+    for operation, stats in result.by_operation.items():
+        print(f'    {operation:9} {stats["count"]:7} ok  p50 {stats["p50"]:8.2f}ms  p99 {stats["p99"]:8.2f}ms')
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(','):
+        operation, _, weight = part.partition('=')
+        if operation not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f'unknown operation {operation!r}, expected one of {OPERATIONS}')
+        mix[operation] = float(weight)
+    return {operation: weight for operation, weight in mix.items() if weight > 0}
+
+
+def parse_ints(value: str) -> List[int]:
+    return [int(part) for part in value.split(',')]
+
+
+async def run(args: argparse.Namespace) -> None:
+    base_url = f'http://127.0.0.1:{args.port}'
+    for workers in args.workers:
+        server = start_server(workers, args.port, args)
+        try:
+            await wait_until_ready(base_url, server, workers)
+            results = []
+            for concurrency in args.concurrency:
+                samples = await run_step(base_url, concurrency, args.duration, args.mix, args.models,
+                                         args.artefact_models, args.update_bytes)
+                result = step_result(workers, concurrency, args.duration, samples)
+                results.append(result)
+                print_step(result)
+                if args.output:
+                    with open(args.output, 'a') as f:
+                        f.write(json.dumps(result._asdict()) + '\n')
+            knee = find_knee(results)
+            if knee is None:
+                print(f'workers={workers}: throughput still growing at concurrency {results[-1].concurrency}')
+            else:
+                print(f'workers={workers}: knee at concurrency {knee.concurrency}, '
+                      f'{knee.throughput} req/s with p99 {knee.percentiles["p99"]}ms')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=parse_ints, default=[1, 2, 4], help='Worker counts to compare')
+    parser.add_argument('--concurrency', type=parse_ints, default=[1, 4, 16, 64],
+                        help='Concurrent clients per step, in increasing order')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per step')
+    parser.add_argument('--mix', type=parse_mix, default='read=70,update=20,artefact=10',
+                        help='Operation weights, from read, update and artefact')
+    parser.add_argument('--models', type=int, default=1000)
+    parser.add_argument('--artefact-models', type=int, default=8, help='Models that have an artefact')
+    parser.add_argument('--artefact-kb', type=int, default=1024)
+    parser.add_argument('--update-bytes', type=int, default=256, help='Size of the description in each update')
+    parser.add_argument('--dynamodb-latency-ms', type=float, default=5.0)
+    parser.add_argument('--s3-latency-ms', type=float, default=20.0)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--output', help='Append one JSON line per step to this file')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
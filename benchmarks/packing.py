@@ -0,0 +1,111 @@
+"""
+Benchmarks storing a directory of many small files as one S3 object per file against a single packed artefact.
+
+Runs against an in-process S3 stand-in (moto) that sleeps for `--latency-ms` on every request, so
+per-request overhead is charged the way S3 charges it. Reports the time to upload the directory,
+to download all of it, and to fetch single files (for the pack, with its index already cached).
+
+Usage:
+    python benchmarks/packing.py --files 2000 --file-kb 4 --latency-ms 15 --workers 16
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from packing import ChunkReader, directory_members, extract, iter_pack, read_index  # noqa: E402
+
+
+def timed(label: str, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f'{label:44} {time.perf_counter() - start:8.2f}s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--file-kb', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=15.0, help='Sleep before every S3 request')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent requests for per-file objects')
+    parser.add_argument('--samples', type=int, default=200, help='Single-file fetches to time')
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    from botocore.handlers import BUILTIN_HANDLERS
+    from moto import mock_s3
+    # Registered before the client exists so its requests pick it up.
+    BUILTIN_HANDLERS.append(('before-send.s3', lambda **kwargs: time.sleep(args.latency_ms / 1000)))
+
+    with tempfile.TemporaryDirectory() as tmp, mock_s3():
+        from storage_backends import S3Backend
+        backend = S3Backend('benchmark-bucket')
+        backend.s3.create_bucket(Bucket=backend.bucket_name)
+        source = os.path.join(tmp, 'source')
+        for i in range(args.files):
+            path = os.path.join(source, f'shard-{i // 100:03d}', f'{i:05d}.json')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(os.urandom(args.file_kb * 1024))
+        files = directory_members(source)
+        names = [name for name, _ in files]
+        print(f'{args.files} files of {args.file_kb} KB, {args.latency_ms}ms per S3 request, '
+              f'{args.workers} concurrent requests for per-file objects')
+
+        with ThreadPoolExecutor(max_workers=args.workers) as pool:
+            def upload_files():
+                def put(item):
+                    name, path = item
+                    with open(path, 'rb') as f:
+                        backend.put(f'files/{name}', f)
+                list(pool.map(put, files))
+
+            def download_files():
+                def get(name):
+                    return backend.s3.meta.client.get_object(Bucket=backend.bucket_name,
+                                                             Key=f'files/{name}')['Body'].read()
+                return sum(len(data) for data in pool.map(get, names))
+
+            timed('upload, one object per file', upload_files)
+            timed('upload, packed', lambda: backend.put('packed', ChunkReader(iter_pack(files))))
+            timed('download all, one object per file', download_files)
+
+        def download_pack():
+            info = backend.head('packed')
+            index = read_index(lambda offset, length: backend.read_range('packed', info, offset, length), info.size)
+            chunks = iter(backend.iter_chunks('packed', info))
+            return extract(index, chunks, os.path.join(tmp, 'unpacked'))
+
+        timed('download all, packed', download_pack)
+
+        info = backend.head('packed')
+        index = read_index(lambda offset, length: backend.read_range('packed', info, offset, length), info.size)
+        sample = random.sample(names, min(args.samples, len(names)))
+
+        def single_file_latency(fetch):
+            latencies = []
+            for name in sample:
+                start = time.perf_counter()
+                fetch(name)
+                latencies.append((time.perf_counter() - start) * 1000)
+            return statistics.median(latencies)
+
+        per_file = single_file_latency(lambda name: backend.s3.meta.client.get_object(
+            Bucket=backend.bucket_name, Key=f'files/{name}')['Body'].read())
+        packed = single_file_latency(lambda name: backend.read_range(
+            'packed', info, index.get(name).offset, index.get(name).size))
+        print(f'{"single file p50, one object per file":44} {per_file:8.2f}ms')
+        print(f'{"single file p50, packed member":44} {packed:8.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Compares per-worker metadata caches with one cache shared by all workers as the worker count grows.
+
+`--reads` model IDs drawn from a Zipf distribution are split evenly across the worker processes,
+as a load balancer spreads traffic. A miss is a DynamoDB read and fills the cache. With private
+caches every worker misses each model once and the cache memory grows with the workers; the
+shared cache misses it once in total and stays at `--cache-mb`.
+
+Usage:
+    python benchmarks/shared_cache.py --workers 1 2 4 8 --reads 400000 --models 20000 --cache-mb 16
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from shared_cache import SharedMetadataCache  # noqa: E402
+
+VALUE = b'{"model_id": {"S": "model-1"}, "name": {"S": "model"}, "tags": {"M": {"team": {"S": "nlp"}}}}' + b' ' * 400
+
+
+def zipf_weights(models, exponent):
+    return [1 / rank ** exponent for rank in range(1, models + 1)]
+
+
+def read_loop(index, workers, cache, args, results, private):
+    if private:
+        cache = SharedMetadataCache(args.cache_mb * 1024 * 1024, ttl=args.ttl)
+    cache.worker = index
+    rng = random.Random(index)
+    keys = [f'model-{rank}' for rank in range(args.models)]
+    weights = zipf_weights(args.models, args.exponent)
+    misses = 0
+    for key in rng.choices(keys, weights, k=args.reads // workers):
+        value, generation = cache.get(key)
+        if value is None:
+            misses += 1
+            cache.put(key, VALUE, generation)
+    results.put(misses)
+    if private:
+        cache.close(unlink=True)
+
+
+def run(workers, args, private):
+    context = multiprocessing.get_context('fork')
+    cache = None if private else SharedMetadataCache(args.cache_mb * 1024 * 1024, ttl=args.ttl)
+    results = context.Queue()
+    processes = [context.Process(target=read_loop, args=(index, workers, cache, args, results, private))
+                 for index in range(workers)]
+    for process in processes:
+        process.start()
+    start = time.perf_counter()
+    misses = sum(results.get() for _ in processes)
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    if cache is not None:
+        cache.close(unlink=True)
+    reads = args.reads // workers * workers
+    memory = args.cache_mb * (workers if private else 1)
+    print(f'{workers:3} workers  {"private" if private else "shared":8} hit rate {1 - misses / reads:6.1%}  '
+          f'DynamoDB reads {misses:7}  cache reads/s {reads / elapsed:9.0f}  '
+          f'cache memory {memory:4} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--reads', type=int, default=400000, help='Reads across all workers')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--models', type=int, default=20000, help='Distinct model IDs')
+    parser.add_argument('--exponent', type=float, default=1.0, help='Zipf exponent of model popularity')
+    parser.add_argument('--cache-mb', type=int, default=16, help='Cache size, per worker for private caches')
+    parser.add_argument('--ttl', type=float, default=300.0, help='Seconds an entry is served')
+    args = parser.parse_args()
+
+    for workers in args.workers:
+        run(workers, args, private=True)
+        run(workers, args, private=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Routes that move artefact bytes; everything else is metadata.
+ARTEFACT_ROUTE = re.compile(r'^/models/[^/]+/(artefact|prefetch)(/|$)')
+
+# Per-client buckets kept before the least recently seen client is forgotten.
+MAX_TRACKED_CLIENTS = 10_000
+
+# Scope key under which the middleware hands the application a callable that gives up the request's pool slot.
+RELEASE_SLOT = 'admission.release_slot'
+
+# Largest zero-copy send passed to the server at once for a client with a bandwidth limit.
+THROTTLED_SENDFILE_SIZE = 1024 * 1024
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: refills at `rate` tokens per second up to `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float, optional): Maximum tokens held, i.e. the burst size (default: one second of `rate`).
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """
+        Takes tokens if they are all available.
+
+        Args:
+            tokens (float, optional): Number of tokens to take (default: 1).
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds until they would be available.
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def reserve(self, tokens: float) -> float:
+        """
+        Takes tokens unconditionally, going into debt if necessary.
+
+        Args:
+            tokens (float): Number of tokens to take.
+
+        Returns:
+            float: The seconds the caller should wait before using them, to stay within the rate.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when a ConcurrencyPool's queue is full or a request waited too long for a slot.
+    """
+
+
+class ConcurrencyPool:
+    """
+    Bounds how many requests of one class run at once, with a bounded wait queue in front.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, queue_timeout: float):
+        """
+        Args:
+            name (str): Name of the pool, for error messages.
+            limit (int): Maximum concurrent requests.
+            max_queue (int): Maximum requests waiting for a slot; further requests are rejected immediately.
+            queue_timeout (float): Seconds a request may wait for a slot before it is rejected.
+        """
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> None:
+        """
+        Waits for a slot.
+
+        Raises:
+            PoolSaturated: If the queue is full or no slot frees up within `queue_timeout`.
+        """
+        if self._semaphore is None:
+            # Created lazily so it binds to the server's event loop rather than the importing thread's.
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise PoolSaturated(self.name)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PoolSaturated(self.name)
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware that keeps artefact transfers from starving metadata requests.
+
+    Metadata and artefact routes get separate concurrency pools, so a burst of large downloads can
+    only occupy the artefact pool's slots (and the worker threads behind them). A slot is held until
+    the response is sent, unless the application gives it up earlier with `release_slot`, as
+    responses sent from the event loop rather than a worker thread do. Each client, keyed by its
+    address, can also be limited to a request rate and an artefact download bandwidth. Rejections
+    are immediate: 429 when a client is over its request rate, 503 when a pool is saturated, both
+    with a Retry-After header.
+    """
+
+    def __init__(self, app: ASGIApp, metadata_pool: ConcurrencyPool, artefact_pool: ConcurrencyPool,
+                 requests_per_second: Optional[float] = None, bytes_per_second: Optional[float] = None):
+        """
+        Args:
+            app (ASGIApp): The application to wrap.
+            metadata_pool (ConcurrencyPool): Pool for metadata routes.
+            artefact_pool (ConcurrencyPool): Pool for artefact routes.
+            requests_per_second (float, optional): Per-client request rate limit (default: unlimited).
+            bytes_per_second (float, optional): Per-client artefact download bandwidth limit (default: unlimited).
+        """
+        self.app = app
+        self.metadata_pool = metadata_pool
+        self.artefact_pool = artefact_pool
+        self.requests_per_second = requests_per_second
+        self.bytes_per_second = bytes_per_second
+        self._request_buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._bandwidth_buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        client = _client_key(scope)
+        if self.requests_per_second is not None:
+            bucket = _bucket_for(self._request_buckets, client, lambda: TokenBucket(self.requests_per_second))
+            wait = bucket.try_acquire()
+            if wait:
+                await _reject(send, 429, 'Too many requests', wait)
+                return
+
+        is_artefact = ARTEFACT_ROUTE.match(scope['path']) is not None
+        pool = self.artefact_pool if is_artefact else self.metadata_pool
+        try:
+            await pool.acquire()
+        except PoolSaturated:
+            await _reject(send, 503, f'Server is busy serving {pool.name} requests', pool.queue_timeout)
+            return
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                pool.release()
+
+        scope[RELEASE_SLOT] = release
+        try:
+            if is_artefact and self.bytes_per_second is not None:
+                bucket = _bucket_for(self._bandwidth_buckets, client, lambda: TokenBucket(self.bytes_per_second))
+                send = _throttled(send, bucket)
+            await self.app(scope, receive, send)
+        finally:
+            release()
+
+
+def release_slot(scope: Scope) -> None:
+    """
+    Gives up the request's admission slot before its response has been sent.
+
+    For responses whose body is sent from the event loop, e.g. from disk or the artefact cache, rather
+    than produced on a worker thread: holding the slot for the whole transfer would let a few long
+    downloads turn every other artefact request away. Bandwidth limits still apply to the transfer.
+
+    Args:
+        scope (Scope): The request's ASGI scope.
+    """
+    release = scope.get(RELEASE_SLOT)
+    if release is not None:
+        release()
+
+
+def _client_key(scope: Scope) -> str:
+    # Admission runs before authentication, so a username in the request could be anything; only the
+    # connection's address identifies the client.
+    client: Optional[Tuple[str, int]] = scope.get('client')
+    return 'addr:' + (client[0] if client else 'unknown')
+
+
+def _bucket_for(buckets: 'OrderedDict[str, TokenBucket]', client: str,
+                create: Callable[[], TokenBucket]) -> TokenBucket:
+    bucket = buckets.get(client)
+    if bucket is None:
+        bucket = buckets[client] = create()
+        if len(buckets) > MAX_TRACKED_CLIENTS:
+            buckets.popitem(last=False)
+    else:
+        buckets.move_to_end(client)
+    return bucket
+
+
+def _throttled(send: Send, bucket: TokenBucket) -> Send:
+    async def throttled_send(message: Message) -> None:
+        if message['type'] == 'http.response.zerocopysend':
+            # One message can hand the server a whole file; pass it on in pieces so the transfer is paced
+            # rather than sent at full speed after one long wait.
+            for piece in _split_zerocopysend(message, THROTTLED_SENDFILE_SIZE):
+                delay = bucket.reserve(piece['count'])
+                if delay:
+                    await asyncio.sleep(delay)
+                await send(piece)
+            return
+        if message['type'] == 'http.response.body':
+            delay = bucket.reserve(len(message.get('body', b'')))
+            if delay:
+                await asyncio.sleep(delay)
+        await send(message)
+    return throttled_send
+
+
+def _split_zerocopysend(message: Message, size: int) -> Iterator[Message]:
+    file = message['file']
+    fd = file if isinstance(file, int) else file.fileno()
+    offset = message.get('offset')
+    if offset is None:
+        offset = os.lseek(fd, 0, os.SEEK_CUR)
+    count = message.get('count')
+    end = offset + count if count is not None else os.fstat(fd).st_size
+    more_body = message.get('more_body', False)
+    while True:
+        count = min(size, end - offset)
+        yield dict(message, offset=offset, count=count, more_body=more_body or offset + count < end)
+        offset += count
+        if offset >= end:
+            return
+
+
+async def _reject(send: Send, status: int, detail: str, retry_after: float) -> None:
+    body = json.dumps({'detail': detail}).encode()
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+               (b'retry-after', str(max(1, math.ceil(retry_after))).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def admission_from_config(config: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Builds AdmissionMiddleware settings from MODEL_REGISTRY_* variables, falling back to defaults.
+
+    The default pool sizes add up to less than the 40 threads Starlette runs sync endpoints on, so
+    admitted requests never wait for a thread and artefact requests can hold at most 4 of them.
+
+    Args:
+        config (dict): Settings, usually os.environ.
+
+    Returns:
+        dict: Keyword arguments for AdmissionMiddleware.
+    """
+    queue_timeout = float(config.get('MODEL_REGISTRY_QUEUE_TIMEOUT', 1.0))
+    requests_per_second = config.get('MODEL_REGISTRY_CLIENT_REQUEST_RATE')
+    bytes_per_second = config.get('MODEL_REGISTRY_CLIENT_BANDWIDTH')
+    return {
+        'metadata_pool': ConcurrencyPool('metadata', int(config.get('MODEL_REGISTRY_METADATA_CONCURRENCY', 32)),
+                                         int(config.get('MODEL_REGISTRY_METADATA_QUEUE', 256)), queue_timeout),
+        'artefact_pool': ConcurrencyPool('artefact', int(config.get('MODEL_REGISTRY_ARTEFACT_CONCURRENCY', 4)),
+                                         int(config.get('MODEL_REGISTRY_ARTEFACT_QUEUE', 16)), queue_timeout),
+        'requests_per_second': float(requests_per_second) if requests_per_second else None,
+        'bytes_per_second': float(bytes_per_second) if bytes_per_second else None,
+    }
@@ -0,0 +1,369 @@
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Set, Tuple
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from admission import release_slot
+from local_artefacts import artefact_cache_path, is_cache_entry
+from storage import stream_artefact
+
+READ_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class FlightCancelled(Exception):
+    """
+    Raised in readers of a fetch that was cancelled because its artefact was replaced or deleted.
+    """
+
+
+class Flight:
+    """
+    A single upstream fetch of an artefact into the local cache, readable by any number of clients while it runs.
+
+    The bytes are written to a partial file next to the cache entry; readers follow the partial file
+    as it grows, so every client is served from the one S3 download. The partial file is renamed into
+    place only after the checksums have been verified against the version the fetch was started for.
+    """
+
+    def __init__(self, model_id: str, checksums: Dict[str, Any], final_path: str):
+        self.model_id = model_id
+        self.checksums = checksums
+        self.final_path = final_path
+        self.partial_path = f'{final_path}.{uuid.uuid4().hex}.partial'
+        self.size: Optional[int] = None
+        self.found: Optional[bool] = None
+        self.written = 0
+        self.done = False
+        self.cancelled = False
+        self.error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+        # Event loops of async readers waiting for progress, woken from the fetch thread.
+        self._waiters: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+
+    def _notify(self) -> None:
+        # Called with the condition held.
+        self._condition.notify_all()
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The reader's loop has closed; its iterator is gone with it.
+                pass
+
+    def run(self) -> None:
+        """
+        Performs the fetch. Called once, on the fetcher's background thread.
+        """
+        try:
+            stream = stream_artefact(self.model_id, expected=self.checksums)
+            if stream is None:
+                with self._condition:
+                    self.found = False
+                    self._notify()
+                return
+            os.makedirs(os.path.dirname(self.final_path), exist_ok=True)
+            with open(self.partial_path, 'wb') as f:
+                # Readers open the partial file as soon as they are told the artefact exists, so it must exist by then.
+                with self._condition:
+                    self.found = True
+                    self.size = stream.size
+                    self._notify()
+                for data in stream:
+                    if self.cancelled:
+                        raise FlightCancelled(f'The artefact of model {self.model_id} changed during the fetch')
+                    f.write(data)
+                    f.flush()
+                    with self._condition:
+                        self.written += len(data)
+                        self._notify()
+            with self._condition:
+                if self.cancelled:
+                    raise FlightCancelled(f'The artefact of model {self.model_id} changed during the fetch')
+                os.replace(self.partial_path, self.final_path)
+                self.done = True
+                self._notify()
+        except BaseException as e:
+            with self._condition:
+                self.error = e
+                self.found = bool(self.found)
+                self._notify()
+            if os.path.exists(self.partial_path):
+                os.remove(self.partial_path)
+
+    def cancel(self) -> None:
+        """
+        Stops the fetch without caching what it fetched, e.g. because the artefact was replaced or deleted.
+
+        Readers get FlightCancelled after the bytes fetched so far.
+        """
+        with self._condition:
+            self.cancelled = True
+
+    def wait_until_started(self) -> bool:
+        """
+        Blocks until it is known whether the artefact exists.
+
+        Returns:
+            bool: True if the artefact exists and is being fetched.
+
+        Raises:
+            BaseException: The error that stopped the fetch, if it failed before finding the artefact.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.found is not None)
+            if self.error is not None and not self.written:
+                raise self.error
+            return self.found
+
+    def _open(self):
+        # Called with the condition held, which guarantees the partial file has not been renamed or removed yet.
+        if self.error is not None:
+            raise self.error
+        return open(self.final_path if self.done else self.partial_path, 'rb')
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """
+        Yields the artefact from the start, following the fetch until it completes.
+
+        Blocks the calling thread while waiting for the fetch; async code should use `aiter_bytes`.
+
+        Raises:
+            BaseException: The error that stopped the fetch, after the bytes fetched so far.
+        """
+        with self._condition:
+            f = self._open()
+        with f:
+            position = 0
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self.written > position or self.done or self.error)
+                    available, done, error = self.written - position, self.done, self.error
+                while available > 0:
+                    data = f.read(min(available, READ_SIZE))
+                    position += len(data)
+                    available -= len(data)
+                    yield data
+                if error is not None:
+                    raise error
+                if done and position >= self.written:
+                    return
+
+    async def aiter_bytes(self) -> AsyncIterator[bytes]:
+        """
+        Yields the artefact from the start, following the fetch until it completes, without holding a thread.
+
+        The reader awaits the fetch's progress on the event loop instead of blocking a threadpool thread,
+        so any number of clients can follow a slow fetch. Reads are of bytes just written by the fetch,
+        which are still in the page cache.
+
+        Raises:
+            BaseException: The error that stopped the fetch, after the bytes fetched so far.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            f = self._open()
+            self._waiters.add(waiter)
+        try:
+            with f:
+                position = 0
+                while True:
+                    with self._condition:
+                        # Cleared under the lock, so progress made after this check sets it again.
+                        waiter[1].clear()
+                        available, done, error = self.written - position, self.done, self.error
+                    if available == 0 and not done and error is None:
+                        await waiter[1].wait()
+                        continue
+                    while available > 0:
+                        data = f.read(min(available, READ_SIZE))
+                        position += len(data)
+                        available -= len(data)
+                        yield data
+                    if error is not None:
+                        raise error
+                    if done:
+                        return
+        finally:
+            with self._condition:
+                self._waiters.discard(waiter)
+
+
+class FlightResponse(StreamingResponse):
+    """
+    Streams an artefact to a client as its fetch brings it into the cache.
+
+    The body is read with `Flight.aiter_bytes` on the event loop, so the transfer gives up its
+    admission slot instead of keeping other artefact requests out for as long as it runs.
+    """
+
+    def __init__(self, flight: Flight):
+        """
+        Args:
+            flight (Flight): The fetch to stream.
+        """
+        super().__init__(flight.aiter_bytes(), media_type='application/octet-stream',
+                         headers={'Content-Length': str(flight.size)})
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        release_slot(scope)
+        await super().__call__(scope, receive, send)
+
+
+class ArtefactFetcher:
+    """
+    Coalesces concurrent downloads of the same artefact into one upstream fetch (single flight).
+
+    However many clients ask for an artefact at once, only the first starts an S3 download; the rest
+    attach to the same Flight and receive its bytes as they arrive. Once the fetch completes the
+    artefact is in the local cache and later requests are served from disk. With a size cap, the
+    least recently used artefacts are evicted after each fetch until the cache fits it again. Each
+    version of an artefact is fetched and cached separately, by the SHA-256 recorded for it.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = None):
+        """
+        Args:
+            cache_dir (str): Directory holding cached artefacts as `{model_id}/artefact.{sha256}`.
+            max_bytes (int, optional): Total size the cached artefacts may take up (default: unbounded).
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.upstream_fetches = 0
+        self.evictions = 0
+        self._flights: Dict[Tuple[str, str], Flight] = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, model_id: str, checksums: Dict[str, Any]) -> Optional[Flight]:
+        """
+        Returns the in-progress fetch of a version of a model's artefact, starting one if none is running.
+
+        Args:
+            model_id (str): The ID of the model the artefact belongs to.
+            checksums (dict): The checksums recorded for the artefact, which the fetched bytes must match.
+
+        Returns:
+            Flight or None: The fetch to read the artefact from, or None if the model has no artefact or
+                the ID and checksums cannot name a cache entry.
+
+        Raises:
+            FlightCancelled: If the fetch was cancelled before it found the artefact.
+        """
+        path = artefact_cache_path(self.cache_dir, model_id, checksums.get('sha256'))
+        if path is None:
+            return None
+        key = (model_id, checksums['sha256'])
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = Flight(model_id, checksums, path)
+                self._flights[key] = flight
+                self.upstream_fetches += 1
+                threading.Thread(target=self._run, args=(flight,), name=f'fetch-{model_id}', daemon=True).start()
+        return flight if flight.wait_until_started() else None
+
+    def cancel(self, model_id: str) -> int:
+        """
+        Cancels every in-progress fetch of a model's artefact, so none of them is cached and later
+        requests start a fresh fetch.
+
+        Args:
+            model_id (str): The ID of the model the artefact belongs to.
+
+        Returns:
+            int: The number of fetches cancelled.
+        """
+        with self._lock:
+            keys = [key for key in self._flights if key[0] == model_id]
+            flights = [self._flights.pop(key) for key in keys]
+        for flight in flights:
+            flight.cancel()
+        return len(flights)
+
+    def touch(self, model_id: str, sha256: str) -> None:
+        """
+        Marks a cached artefact as used, so it is evicted after artefacts that were used less recently.
+
+        Args:
+            model_id (str): The ID of the model the artefact belongs to.
+            sha256 (str): The SHA-256 of the cached version.
+        """
+        path = artefact_cache_path(self.cache_dir, model_id, sha256)
+        if self.max_bytes is None or path is None:
+            return
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self) -> int:
+        """
+        Removes the least recently used cached artefacts until the cache fits within `max_bytes`.
+
+        Artefacts still being fetched are never evicted. Clients already reading an evicted artefact
+        keep their open file.
+
+        Returns:
+            int: The number of artefacts evicted.
+        """
+        if self.max_bytes is None:
+            return 0
+        with self._lock:
+            fetching = {model_id for model_id, _ in self._flights}
+        entries = []
+        try:
+            directories = list(os.scandir(self.cache_dir))
+        except FileNotFoundError:
+            return 0
+        for directory in directories:
+            if directory.name in fetching or not directory.is_dir():
+                continue
+            try:
+                names = os.listdir(directory.path)
+            except FileNotFoundError:
+                continue
+            for name in filter(is_cache_entry, names):
+                path = os.path.join(directory.path, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            evicted += 1
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                # The directory holds another version or another fetch's partial file.
+                pass
+        if evicted:
+            self.evictions += evicted
+            logger.info('Evicted %d cached artefacts to stay within %d bytes', evicted, self.max_bytes)
+        return evicted
+
+    def _run(self, flight: Flight) -> None:
+        try:
+            flight.run()
+        finally:
+            with self._lock:
+                key = (flight.model_id, flight.checksums['sha256'])
+                # A cancelled fetch has already been replaced, or dropped, by the time it ends.
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+        if flight.done:
+            self.evict()
@@ -0,0 +1,231 @@
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Set
+
+from changefeed import CREATE
+from ids import generate_model_id
+from models import ModelTable
+from operations import record_change
+from storage import store_artefact
+
+# BatchWriteItem accepts at most 25 items per call.
+BATCH_SIZE = 25
+
+_DONE = object()
+
+
+class ManifestEntry(NamedTuple):
+    """
+    One model to import: its metadata and optionally the path of its artefact.
+    """
+    line: int
+    model_id: str
+    name: str
+    description: Optional[str] = None
+    tags: Optional[Dict[str, Any]] = None
+    artefact: Optional[str] = None
+
+
+def read_manifest(manifest_path: str) -> Iterator[ManifestEntry]:
+    """
+    Reads an import manifest, either JSONL or CSV (chosen by the `.csv` extension).
+
+    Each record has a `name` and optionally `model_id`, `description`, `tags` (a JSON object; in CSV
+    a JSON-encoded string) and `artefact` (a local file path). Records without a `model_id` get a
+    generated one.
+
+    Args:
+        manifest_path (str): Path of the manifest file.
+
+    Returns:
+        Iterator[ManifestEntry]: The manifest entries, numbered from 1 in file order.
+    """
+    with open(manifest_path, newline='') as f:
+        if manifest_path.endswith('.csv'):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for line, record in enumerate(records, start=1):
+            tags = record.get('tags') or None
+            if isinstance(tags, str):
+                tags = json.loads(tags)
+            yield ManifestEntry(line=line, model_id=record.get('model_id') or generate_model_id(),
+                                name=record['name'], description=record.get('description') or None,
+                                tags=tags, artefact=record.get('artefact') or None)
+
+
+class Checkpoint:
+    """
+    Append-only record of import progress, keyed by manifest line.
+
+    Lines keep their model ID from before their metadata is written, so an entry with a generated ID gets
+    the same ID again on resume, even after a crash between the write and its checkpoint. Lines whose
+    metadata and artefact have both been stored are skipped on resume.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.model_ids: Dict[int, str] = {}
+        self.completed: Set[int] = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if line.strip():
+                        self._apply(json.loads(line))
+        self._lock = threading.Lock()
+        self._file = open(path, 'a')
+
+    def _apply(self, record: Dict[str, Any]) -> None:
+        self.model_ids[record['line']] = record['model_id']
+        if record['stage'] == 'done':
+            self.completed.add(record['line'])
+
+    def record(self, entry: ManifestEntry, stage: str) -> None:
+        """
+        Records that an entry has reached a stage: `assigned` (about to be written), `metadata` or `done`.
+        """
+        record = {'line': entry.line, 'model_id': entry.model_id, 'stage': stage}
+        with self._lock:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+            self._apply(record)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class StageStats:
+    """
+    Throughput counters for one stage of the import pipeline.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, items: int, seconds: float, nbytes: int = 0) -> None:
+        with self._lock:
+            self.items += items
+            self.bytes += nbytes
+            self.busy_seconds += seconds
+
+    def summary(self, elapsed: float) -> str:
+        rate = self.items / elapsed if elapsed else 0.0
+        line = f'{self.name}: {self.items} items, {rate:.1f} items/s'
+        if self.bytes:
+            line += f', {self.bytes / elapsed / 1024 ** 2:.1f} MB/s'
+        return line
+
+
+class ImportReport:
+    """
+    Outcome of an import: per-stage statistics, skipped and failed entries.
+    """
+
+    def __init__(self):
+        self.metadata = StageStats('metadata')
+        self.upload = StageStats('upload')
+        self.skipped = 0
+        self.failures: List[str] = []
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        lines = [self.metadata.summary(self.elapsed), self.upload.summary(self.elapsed),
+                 f'skipped {self.skipped} already imported, {len(self.failures)} failed, {self.elapsed:.1f}s total']
+        return '\n'.join(lines + self.failures)
+
+
+def import_manifest(manifest_path: str, checkpoint_path: Optional[str] = None, upload_workers: int = 8,
+                    queue_size: int = 64) -> ImportReport:
+    """
+    Registers every model in a manifest, writing metadata in DynamoDB batches and uploading artefacts concurrently.
+
+    The metadata stage writes batches of up to 25 items with BatchWriteItem and hands each committed
+    entry to the upload stage through a bounded queue, so it stalls rather than racing ahead when
+    uploads fall behind. Entries are checkpointed once their metadata and artefact are both stored,
+    so rerunning an interrupted import skips them. Failed uploads are reported and left out of the
+    checkpoint to be retried on the next run. BatchWriteItem cannot be conditional, so unlike
+    create_model an import overwrites existing models with the same ID.
+
+    Args:
+        manifest_path (str): Path of the JSONL or CSV manifest.
+        checkpoint_path (str, optional): Path of the checkpoint file (default: the manifest path plus `.checkpoint`).
+        upload_workers (int, optional): Number of concurrent artefact uploads (default: 8).
+        queue_size (int, optional): Number of entries that may wait between the stages (default: 64).
+
+    Returns:
+        ImportReport: Per-stage throughput, skipped and failed entries.
+    """
+    checkpoint = Checkpoint(checkpoint_path or f'{manifest_path}.checkpoint')
+    report = ImportReport()
+    handoff: queue.Queue = queue.Queue(maxsize=queue_size)
+    start = time.perf_counter()
+
+    def upload(entry: ManifestEntry) -> None:
+        began = time.perf_counter()
+        try:
+            store_artefact(entry.model_id, entry.artefact)
+        except Exception as e:
+            report.failures.append(f'line {entry.line} ({entry.model_id}): {e}')
+            return
+        report.upload.add(1, time.perf_counter() - began, os.path.getsize(entry.artefact))
+        checkpoint.record(entry, 'done')
+
+    def upload_stage() -> None:
+        with ThreadPoolExecutor(max_workers=upload_workers) as pool:
+            slots = threading.BoundedSemaphore(upload_workers)
+            while (entry := handoff.get()) is not _DONE:
+                slots.acquire()
+                pool.submit(upload, entry).add_done_callback(lambda _: slots.release())
+
+    uploader = threading.Thread(target=upload_stage, name='bulk-import-uploader')
+    uploader.start()
+    try:
+        batch: List[ManifestEntry] = []
+        for entry in read_manifest(manifest_path):
+            if entry.line in checkpoint.completed:
+                report.skipped += 1
+                continue
+            if entry.line in checkpoint.model_ids:
+                entry = entry._replace(model_id=checkpoint.model_ids[entry.line])
+            batch.append(entry)
+            if len(batch) == BATCH_SIZE:
+                _write_batch(batch, report, checkpoint, handoff)
+                batch = []
+        if batch:
+            _write_batch(batch, report, checkpoint, handoff)
+    finally:
+        handoff.put(_DONE)
+        uploader.join()
+        checkpoint.close()
+        report.elapsed = time.perf_counter() - start
+    return report
+
+
+def _write_batch(batch: List[ManifestEntry], report: ImportReport, checkpoint: Checkpoint,
+                 handoff: queue.Queue) -> None:
+    began = time.perf_counter()
+    # Generated IDs must be durable before the items are, or a crash before the records below would leave
+    # models that a resumed import writes again under new IDs.
+    for entry in batch:
+        checkpoint.record(entry, 'assigned')
+    with ModelTable.batch_write() as writer:
+        for entry in batch:
+            writer.save(ModelTable(model_id=entry.model_id, name=entry.name,
+                                   description=entry.description, tags=entry.tags))
+    report.metadata.add(len(batch), time.perf_counter() - began)
+    for entry in batch:
+        record_change(entry.model_id, CREATE)
+        if entry.artefact is None:
+            checkpoint.record(entry, 'done')
+        else:
+            checkpoint.record(entry, 'metadata')
+            handoff.put(entry)
@@ -0,0 +1,231 @@
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from changefeed import CREATE, DELETE, UPDATE
+from models import ModelTable
+from writebehind import MAX_FLUSH_INTERVAL
+
+# Attributes kept in the catalog; everything else on the item is left out of the scan.
+CATALOG_ATTRIBUTES = ['model_id', 'name', 'version', 'tags', 'last_updated_at']
+
+# How far behind the newest timestamp seen an incremental refresh starts. Updates can land after
+# later timestamps (write-behind holds them for up to MAX_FLUSH_INTERVAL, and clocks drift), so the
+# window overlaps the previous one; records seen twice are simply replaced.
+REFRESH_OVERLAP = timedelta(seconds=MAX_FLUSH_INTERVAL + 5)
+
+
+# Distinct tag sets shared between records. Capped so tags that change on every update (e.g. a
+# training step counter) cannot grow it without bound; past the cap new tag sets are not shared.
+MAX_SHARED_TAG_SETS = 100_000
+_tag_sets: Dict[Tuple[Tuple[str, Any], ...], Tuple[Tuple[str, Any], ...]] = {}
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def _intern_tags(pairs) -> Tuple[Tuple[str, Any], ...]:
+    tags = tuple((sys.intern(key), _intern(value)) for key, value in pairs)
+    try:
+        shared = _tag_sets.get(tags)
+    except TypeError:  # unhashable values, e.g. nested JSON
+        return tags
+    if shared is not None:
+        return shared
+    if len(_tag_sets) < MAX_SHARED_TAG_SETS:
+        _tag_sets[tags] = tags
+    return tags
+
+
+class CatalogRecord:
+    """
+    Compact in-memory summary of one model.
+
+    Tags are stored as a tuple of (key, value) pairs with interned keys and string values, and
+    identical tag sets are stored once, so the common case of many models carrying the same few
+    tags costs one pointer per record.
+    """
+    __slots__ = ('model_id', 'name', 'version', 'last_updated_at', 'tags')
+
+    def __init__(self, model_id: str, name: str, version: int, last_updated_at: float,
+                 tags: Tuple[Tuple[str, Any], ...] = ()):
+        self.model_id = model_id
+        self.name = name
+        self.version = version
+        self.last_updated_at = last_updated_at
+        self.tags = tags
+
+    @classmethod
+    def from_model(cls, model: ModelTable) -> 'CatalogRecord':
+        tags = model.tags if isinstance(model.tags, dict) else {}
+        return cls(model_id=model.model_id, name=model.name, version=int(model.version),
+                   last_updated_at=model.last_updated_at.timestamp(),
+                   tags=_intern_tags(tags.items()))
+
+    def tag_dict(self) -> Dict[str, Any]:
+        return dict(self.tags)
+
+
+class Catalog:
+    """
+    In-process snapshot of every model in the ModelTable: IDs, names, versions and tags.
+
+    `load` builds the snapshot with one projected Scan. `refresh` then only pulls models whose
+    `last_updated_at` is newer than the snapshot's watermark. A filtered Scan still reads the whole
+    table on the DynamoDB side, but only changed items are transferred and decoded. Deletions are
+    not visible to `refresh`; they arrive through `apply_change` from a change feed, or the next `load`.
+    Snapshots can be saved to and restored from a local file for fast cold starts.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, CatalogRecord] = {}
+        self._lock = threading.Lock()
+        self.watermark: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[CatalogRecord]:
+        return iter(list(self._records.values()))
+
+    def get(self, model_id: str) -> Optional[CatalogRecord]:
+        """
+        Returns the record for a model, or None if it is not in the catalog.
+        """
+        return self._records.get(model_id)
+
+    def apply(self, model_id: str, record: Optional[CatalogRecord]) -> None:
+        """
+        Applies a single change: replaces a model's record, or removes the model if `record` is None.
+
+        Args:
+            model_id (str): Unique identifier for the model.
+            record (CatalogRecord, optional): The model's new record, or None if it was deleted.
+        """
+        with self._lock:
+            if record is None:
+                self._records.pop(model_id, None)
+            else:
+                self._records[model_id] = record
+                if self.watermark is None or record.last_updated_at > self.watermark:
+                    self.watermark = record.last_updated_at
+
+    def apply_change(self, event) -> None:
+        """
+        Applies a change feed event, re-reading the model for creates and updates.
+
+        Can be passed directly to ChangeFeedConsumer.subscribe.
+
+        Args:
+            event (ChangeEvent): The change to apply.
+        """
+        if event.operation == DELETE:
+            self.apply(event.model_id, None)
+        elif event.operation in (CREATE, UPDATE):
+            try:
+                model = ModelTable.get(event.model_id, attributes_to_get=CATALOG_ATTRIBUTES)
+            except ModelTable.DoesNotExist:
+                self.apply(event.model_id, None)
+                return
+            self.apply(event.model_id, CatalogRecord.from_model(model))
+
+    def load(self) -> int:
+        """
+        Replaces the catalog with a full Scan of the ModelTable.
+
+        Returns:
+            int: The number of models loaded.
+        """
+        records = {}
+        watermark = None
+        for model in ModelTable.scan(attributes_to_get=CATALOG_ATTRIBUTES):
+            record = CatalogRecord.from_model(model)
+            records[record.model_id] = record
+            watermark = max(watermark or record.last_updated_at, record.last_updated_at)
+        with self._lock:
+            self._records = records
+            self.watermark = watermark
+        return len(records)
+
+    def refresh(self) -> int:
+        """
+        Pulls in models created or updated since the watermark, falling back to `load` for an empty catalog.
+
+        Returns:
+            int: The number of models read.
+        """
+        if self.watermark is None:
+            return self.load()
+        since = datetime.fromtimestamp(self.watermark, tz=timezone.utc) - REFRESH_OVERLAP
+        count = 0
+        for model in ModelTable.scan(ModelTable.last_updated_at > since, attributes_to_get=CATALOG_ATTRIBUTES):
+            self.apply(model.model_id, CatalogRecord.from_model(model))
+            count += 1
+        return count
+
+    def save(self, path: str) -> None:
+        """
+        Writes the snapshot to a local file, atomically replacing any previous snapshot.
+
+        The file is columnar: one list per field, with tag keys and distinct tag sets each stored once.
+
+        Args:
+            path (str): The path to write the snapshot to.
+        """
+        with self._lock:
+            records = list(self._records.values())
+            watermark = self.watermark
+        tag_keys: Dict[str, int] = {}
+        tag_sets: Dict[int, int] = {}
+        encoded_tag_sets = []
+        tag_set_indexes = []
+        for r in records:
+            # Shared tag sets are the same object, so they are written once and referenced by index.
+            index = tag_sets.get(id(r.tags))
+            if index is None:
+                index = tag_sets[id(r.tags)] = len(encoded_tag_sets)
+                encoded_tag_sets.append([[tag_keys.setdefault(key, len(tag_keys)), value] for key, value in r.tags])
+            tag_set_indexes.append(index)
+        snapshot = {
+            'watermark': watermark,
+            'model_ids': [r.model_id for r in records],
+            'names': [r.name for r in records],
+            'versions': [r.version for r in records],
+            'last_updated_at': [r.last_updated_at for r in records],
+            'tags': tag_set_indexes,
+            'tag_sets': encoded_tag_sets,
+            'tag_keys': list(tag_keys),
+        }
+        partial_path = f'{path}.partial'
+        with open(partial_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(partial_path, path)
+
+    @classmethod
+    def from_file(cls, path: str) -> 'Catalog':
+        """
+        Restores a snapshot written by `save`. Call `refresh` afterwards to catch up with the table.
+
+        Args:
+            path (str): The path of the snapshot file.
+
+        Returns:
+            Catalog: The restored catalog.
+        """
+        with open(path) as f:
+            snapshot = json.load(f)
+        tag_keys = [sys.intern(key) for key in snapshot['tag_keys']]
+        tag_sets = [_intern_tags((tag_keys[key], value) for key, value in tags) for tags in snapshot['tag_sets']]
+        catalog = cls()
+        catalog.watermark = snapshot['watermark']
+        catalog._records = {
+            model_id: CatalogRecord(model_id, name, version, last_updated_at, tag_sets[tags])
+            for model_id, name, version, last_updated_at, tags in zip(
+                snapshot['model_ids'], snapshot['names'], snapshot['versions'],
+                snapshot['last_updated_at'], snapshot['tags'])
+        }
+        return catalog
@@ -0,0 +1,265 @@
+import abc
+import bisect
+import heapq
+import logging
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Deque, List, NamedTuple, Optional, Set
+
+from ids import generate_model_id, id_floor, id_timestamp
+from models import ChangeLogTable
+
+logger = logging.getLogger(__name__)
+
+CREATE = 'create'
+UPDATE = 'update'
+DELETE = 'delete'
+ARTEFACT = 'artefact'
+
+# Changes are spread over this many partitions, `changes-0` to `changes-{SHARDS - 1}`, by model ID, so appends
+# are not limited by the write throughput of a single partition. Each shard is ordered; reads merge them.
+SHARDS = 8
+RETENTION = timedelta(days=7)
+PAGE_SIZE = 100
+
+
+class ChangeEvent(NamedTuple):
+    """
+    One change to a model: which model, what happened and when.
+
+    `sequence` is a time-ordered ID, so events sort by when they were recorded.
+    """
+    sequence: str
+    model_id: str
+    operation: str
+    changed_at: float
+
+
+class ChangeLog(abc.ABC):
+    """
+    Append-only, time-ordered log of model changes.
+    """
+
+    @abc.abstractmethod
+    def append(self, model_id: str, operation: str) -> ChangeEvent:
+        """
+        Records a change.
+
+        Args:
+            model_id (str): Unique identifier for the changed model.
+            operation (str): One of CREATE, UPDATE, DELETE or ARTEFACT.
+
+        Returns:
+            ChangeEvent: The recorded event.
+        """
+
+    @abc.abstractmethod
+    def read_after(self, sequence: str, limit: int = PAGE_SIZE) -> List[ChangeEvent]:
+        """
+        Returns up to `limit` events recorded after `sequence`, oldest first.
+
+        Args:
+            sequence (str): The sequence to read after.
+            limit (int, optional): Maximum number of events to return (default: PAGE_SIZE).
+        """
+
+
+class DynamoChangeLog(ChangeLog):
+    """
+    Change log stored in the ChangeLogTable. Items expire through DynamoDB TTL after RETENTION.
+
+    Events are spread over `shards` hash keys by model ID, so all changes to one model stay in one
+    ordered shard. Reads query every shard and merge the results in sequence order.
+    """
+
+    def __init__(self, shards: int = SHARDS):
+        """
+        Args:
+            shards (int, optional): Number of hash keys events are spread over (default: SHARDS). Every
+                writer and reader of a log must use the same number.
+        """
+        self.shards = shards
+
+    def shard(self, model_id: str) -> str:
+        """
+        Returns the hash key the changes to a model are stored under.
+
+        Args:
+            model_id (str): Unique identifier for the model.
+        """
+        return f'changes-{zlib.crc32(model_id.encode()) % self.shards}'
+
+    def append(self, model_id: str, operation: str) -> ChangeEvent:
+        now = datetime.now(timezone.utc)
+        item = ChangeLogTable(shard=self.shard(model_id), sequence=generate_model_id(), model_id=model_id,
+                              operation=operation, changed_at=now, expires_at=now + RETENTION)
+        item.save()
+        return ChangeEvent(item.sequence, model_id, operation, now.timestamp())
+
+    def read_after(self, sequence: str, limit: int = PAGE_SIZE) -> List[ChangeEvent]:
+        # The first `limit` events overall are among the first `limit` of their own shard.
+        shards = [[ChangeEvent(item.sequence, item.model_id, item.operation, item.changed_at.timestamp())
+                   for item in ChangeLogTable.query(f'changes-{index}', ChangeLogTable.sequence > sequence,
+                                                    limit=limit)]
+                  for index in range(self.shards)]
+        return list(heapq.merge(*shards))[:limit]
+
+
+class InMemoryChangeLog(ChangeLog):
+    """
+    Change log held in process memory, as a local stand-in for DynamoChangeLog in tests and benchmarks.
+    """
+
+    def __init__(self):
+        self._events: List[ChangeEvent] = []
+        self._sequences: List[str] = []
+        self._lock = threading.Lock()
+
+    def append(self, model_id: str, operation: str) -> ChangeEvent:
+        event = ChangeEvent(generate_model_id(), model_id, operation, time.time())
+        with self._lock:
+            index = bisect.bisect(self._sequences, event.sequence)
+            self._sequences.insert(index, event.sequence)
+            self._events.insert(index, event)
+        return event
+
+    def read_after(self, sequence: str, limit: int = PAGE_SIZE) -> List[ChangeEvent]:
+        with self._lock:
+            start = bisect.bisect_right(self._sequences, sequence)
+            return self._events[start:start + limit]
+
+
+class ChangeFeedConsumer:
+    """
+    Tails a change log and hands every new event to its subscribers.
+
+    Writers in different processes can record events slightly out of sequence order, so each poll
+    re-reads the last `lookback` seconds of the log and skips events it has already delivered; an
+    event is therefore never missed, though it may arrive after a later one. Progress can be
+    checkpointed to a file so a restarted consumer resumes where it stopped rather than at the
+    present; events from the lookback window before the checkpoint are delivered again after a
+    restart, so subscribers must tolerate repeats. The delay between each change and its delivery
+    is kept for latency reporting.
+    """
+
+    def __init__(self, change_log: ChangeLog, checkpoint_path: Optional[str] = None, poll_interval: float = 1.0,
+                 lookback: float = 5.0):
+        """
+        Args:
+            change_log (ChangeLog): The log to tail.
+            checkpoint_path (str, optional): File to persist progress in. Without one, tailing starts at the present.
+            poll_interval (float, optional): Seconds between polls when the log is idle (default: 1.0).
+            lookback (float, optional): Seconds of the log re-read on each poll to catch late writers (default: 5.0).
+        """
+        self.change_log = change_log
+        self.checkpoint_path = checkpoint_path
+        self.poll_interval = poll_interval
+        self.lookback = lookback
+        self.position = self._load_checkpoint() or id_floor(time.time())
+        self.latencies: Deque[float] = deque(maxlen=10_000)
+        self._subscribers: List[Callable[[ChangeEvent], None]] = []
+        self._delivered: Set[str] = set()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None]) -> None:
+        """
+        Registers a callback to receive every event, in the consumer's thread.
+
+        Args:
+            callback (Callable[[ChangeEvent], None]): Called once per event. Exceptions are logged and ignored.
+        """
+        self._subscribers.append(callback)
+
+    def poll(self) -> int:
+        """
+        Delivers every event recorded since the last poll.
+
+        Returns:
+            int: The number of events delivered.
+        """
+        delivered = 0
+        cursor = id_floor(id_timestamp(self.position) - self.lookback) if self.lookback else self.position
+        while True:
+            events = self.change_log.read_after(cursor)
+            for event in events:
+                if event.sequence not in self._delivered:
+                    self._deliver(event)
+                    delivered += 1
+                if event.sequence > self.position:
+                    self.position = event.sequence
+            if len(events) < PAGE_SIZE:
+                break
+            cursor = events[-1].sequence
+        self._forget_before(id_floor(id_timestamp(self.position) - self.lookback))
+        if delivered:
+            self._save_checkpoint()
+        return delivered
+
+    def _deliver(self, event: ChangeEvent) -> None:
+        self._delivered.add(event.sequence)
+        self.latencies.append(time.time() - event.changed_at)
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception:
+                logger.exception("Change feed subscriber failed on %s", event)
+
+    def _forget_before(self, sequence: str) -> None:
+        self._delivered = {seen for seen in self._delivered if seen >= sequence}
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Returns a percentile of the delay between recording and delivering recent events, in seconds.
+
+        Args:
+            percentile (float): The percentile, between 0 and 100.
+        """
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(int(len(ordered) * percentile / 100), len(ordered) - 1)]
+
+    def start(self) -> None:
+        """
+        Starts polling on a background thread.
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='change-feed-consumer', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the background thread.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Change feed poll failed")
+            self._stop.wait(self.poll_interval)
+
+    def _load_checkpoint(self) -> Optional[str]:
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return None
+        with open(self.checkpoint_path) as f:
+            return f.read().strip() or None
+
+    def _save_checkpoint(self) -> None:
+        if self.checkpoint_path is None:
+            return
+        partial_path = f'{self.checkpoint_path}.partial'
+        with open(partial_path, 'w') as f:
+            f.write(self.position)
+        os.replace(partial_path, self.checkpoint_path)
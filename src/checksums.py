@@ -0,0 +1,157 @@
+import base64
+import hashlib
+from typing import Any, Dict, List, Optional
+
+try:
+    import crc32c
+except ImportError:  # CRC32C is optional; SHA-256 and the ETag are always computed.
+    crc32c = None
+
+# Part size used for multipart uploads. The S3 ETag of a multipart object depends on it, so it is
+# recorded alongside the checksums and must match the TransferConfig used to upload.
+PART_SIZE = 8 * 1024 * 1024
+
+
+class ArtefactIntegrityError(Exception):
+    """
+    Raised when the bytes of an artefact do not match its recorded checksums.
+    """
+
+
+class ArtefactDigest:
+    """
+    Incrementally computes the checksums of an artefact as its bytes stream past.
+
+    Computes the SHA-256 of the whole artefact, the S3-compatible ETag (the MD5 of the object, or
+    for multipart uploads the MD5 of the concatenated part MD5s suffixed with the part count) and,
+    when the `crc32c` package is installed, the S3-compatible CRC32C checksum built the same way.
+    """
+
+    def __init__(self, part_size: int = PART_SIZE):
+        """
+        Args:
+            part_size (int, optional): Multipart upload part size the ETag is computed for (default: PART_SIZE).
+        """
+        self.part_size = part_size
+        self.size = 0
+        self._sha256 = hashlib.sha256()
+        self._part_md5 = hashlib.md5()
+        self._part_crc = 0
+        self._part_filled = 0
+        self._part_md5s: List[bytes] = []
+        self._part_crcs: List[int] = []
+
+    def update(self, data: bytes) -> None:
+        """
+        Feeds the next chunk of the artefact into the digest.
+
+        Args:
+            data (bytes): The next bytes of the artefact, in order.
+        """
+        view = memoryview(data)
+        self._sha256.update(view)
+        self.size += len(view)
+        while len(view):
+            chunk = view[:self.part_size - self._part_filled]
+            self._part_md5.update(chunk)
+            if crc32c is not None:
+                self._part_crc = crc32c.crc32c(chunk, self._part_crc)
+            self._part_filled += len(chunk)
+            view = view[len(chunk):]
+            if self._part_filled == self.part_size:
+                self._close_part()
+
+    def _close_part(self) -> None:
+        self._part_md5s.append(self._part_md5.digest())
+        self._part_crcs.append(self._part_crc)
+        self._part_md5 = hashlib.md5()
+        self._part_crc = 0
+        self._part_filled = 0
+
+    def _parts(self):
+        md5s, crcs = list(self._part_md5s), list(self._part_crcs)
+        if self._part_filled or not md5s:
+            md5s.append(self._part_md5.digest())
+            crcs.append(self._part_crc)
+        return md5s, crcs
+
+    @property
+    def multipart(self) -> bool:
+        """
+        Whether an upload of this artefact uses multipart upload, which happens from one full part upwards.
+        """
+        return self.size >= self.part_size
+
+    @property
+    def sha256(self) -> str:
+        """
+        Hex SHA-256 of the whole artefact.
+        """
+        return self._sha256.hexdigest()
+
+    @property
+    def etag(self) -> str:
+        """
+        ETag S3 reports for the artefact when it is uploaded with `part_size` parts, without quotes.
+        """
+        md5s, _ = self._parts()
+        if not self.multipart:
+            return md5s[0].hex()
+        return f'{hashlib.md5(b"".join(md5s)).hexdigest()}-{len(md5s)}'
+
+    @property
+    def crc32c(self) -> Optional[str]:
+        """
+        Base64 CRC32C in S3's format (composite for multipart uploads), or None if `crc32c` is not installed.
+        """
+        if crc32c is None:
+            return None
+        _, crcs = self._parts()
+        if not self.multipart:
+            return base64.b64encode(crcs[0].to_bytes(4, 'big')).decode()
+        composite = crc32c.crc32c(b''.join(crc.to_bytes(4, 'big') for crc in crcs))
+        return f'{base64.b64encode(composite.to_bytes(4, "big")).decode()}-{len(crcs)}'
+
+    def as_dict(self) -> Dict[str, Any]:
+        """
+        Returns the checksums in the form stored on the ModelTable item.
+        """
+        checksums = {'sha256': self.sha256, 'etag': self.etag, 'size': self.size, 'part_size': self.part_size}
+        if self.crc32c is not None:
+            checksums['crc32c'] = self.crc32c
+        return checksums
+
+    def verify(self, expected: Dict[str, Any]) -> None:
+        """
+        Checks the digest against previously recorded checksums. Checksums missing on either side are skipped.
+
+        Args:
+            expected (dict): Recorded checksums, as returned by `as_dict`.
+
+        Raises:
+            ArtefactIntegrityError: If any checksum present on both sides differs.
+        """
+        actual = self.as_dict()
+        mismatched = [name for name in ('size', 'sha256', 'etag', 'crc32c')
+                      if expected.get(name) is not None and actual.get(name) is not None
+                      and expected[name] != actual[name]]
+        if mismatched:
+            details = ', '.join(f'{name} expected {expected[name]} got {actual[name]}' for name in mismatched)
+            raise ArtefactIntegrityError(f'Artefact checksum mismatch: {details}')
+
+
+class HashingReader:
+    """
+    Read-only file wrapper that feeds every byte read through an ArtefactDigest.
+
+    It deliberately exposes no `seek`, so boto3 treats it as a stream and reads it exactly once, in order.
+    """
+
+    def __init__(self, fileobj, digest: ArtefactDigest):
+        self._fileobj = fileobj
+        self.digest = digest
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self.digest.update(data)
+        return data
@@ -1,32 +1,49 @@
-from typing import Optional
+import os
+import time
+from typing import List, Optional
 
 import typer
-import boto3
 
-from operations import create_model, delete_model, read_model, update_model
+from bulk_import import import_manifest
+from changefeed import ChangeFeedConsumer, DynamoChangeLog
+from checksums import ArtefactIntegrityError
+from ids import generate_model_id
+from operations import create_model, delete_model, enable_change_log, read_model, update_model
 from models import ModelTable
+from packing import PackError
+from storage import (ModelNotFoundError, backend, read_pack_index, retrieve_artefact as download_artefact,
+                     store_artefact as upload_artefact, store_packed_artefact, unpack_artefact, verify_artefact)
+from sweeper import UPLOAD_MAX_AGE, Sweeper
 
 app = typer.Typer()
 
-s3 = boto3.resource('s3')
-bucket_name = 'my-model-bucket'
 
-app = typer.Typer()
+@app.callback()
+def main():
+    """
+    Manage models in the model registry.
+    """
+    if os.environ.get('MODEL_REGISTRY_CHANGE_LOG'):
+        enable_change_log(DynamoChangeLog())
 
 
 @app.command()
-def create(id: str, name: str, description: Optional[str] = None, tags: Optional[str] = None):
+def create(name: str, id: Optional[str] = None, description: Optional[str] = None, tags: Optional[str] = None):
     """
-    Create a new model with the given ID, name, description, and tags.
+    Create a new model with the given name, ID, description, and tags.
 
     Args:
-        id (str): The ID of the model to create.
         name (str): The name of the model to create.
+        id (str, optional): The ID of the model to create. A new time-ordered ID is generated if omitted.
         description (str, optional): The description of the model to create.
         tags (str, optional): The tags of the model to create.
     """
-    model = ModelTable(id=id, name=name, description=description, tags=tags)
-    create_model(model)
+    model_id = id if id is not None else generate_model_id()
+    model = create_model(model_id, name, description, tags)
+    if model is None:
+        typer.echo(f"Model with ID '{model_id}' already exists.")
+        raise typer.Exit(code=1)
+    typer.echo(model_id)
 
 
 @app.command()
@@ -63,7 +80,7 @@ def update(id: str, name: Optional[str] = None, description: Optional[str] = Non
     if tags is not None:
         update_fields['tags'] = tags
 
-    update_model(id, update_fields)
+    update_model(id, **update_fields)
 
 
 @app.command()
@@ -89,32 +106,165 @@ def list():
 @app.command()
 def store_artefact(model_id: str, artefact: str):
     """
-    Uploads a model artefact file to S3.
+    Uploads a model artefact file to storage.
 
     Args:
         model_id (str): The ID of the model the artefact belongs to.
         artefact (str): The path to the artefact file to be uploaded.
     """
-    key = f'{model_id}/artefact'
-    with open(artefact, 'rb') as f:
-        store_artefact(s3, bucket_name, key, f)
+    try:
+        key = upload_artefact(model_id, artefact)
+    except (ModelNotFoundError, ArtefactIntegrityError) as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
     typer.echo(f"Artefact {key} uploaded successfully")
 
 
 @app.command()
 def retrieve_artefact(model_id: str, output_file: str):
     """
-    Downloads a model artefact file from S3.
+    Downloads a model artefact file from storage.
 
     Args:
         model_id (str): The ID of the model the artefact belongs to.
         output_file (str): The path to save the downloaded artefact file.
     """
-    key = f'{model_id}/artefact'
-    with open(output_file, 'wb') as f:
-        artefact_file = retrieve_artefact(s3, bucket_name, key)
-        f.write(artefact_file.read())
-    typer.echo(f"Artefact {key} downloaded successfully")
+    try:
+        download_artefact(model_id, output_file)
+    except ArtefactIntegrityError as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
+    typer.echo(f"Artefact {model_id}/artefact downloaded successfully")
+
+
+@app.command()
+def verify(model_id: str, workers: int = 8):
+    """
+    Verifies a stored model artefact against its recorded checksums using parallel ranged reads.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        workers (int, optional): The number of concurrent ranged reads.
+    """
+    try:
+        checksums = verify_artefact(model_id, workers=workers)
+    except ArtefactIntegrityError as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
+    typer.echo(f"Artefact {model_id}/artefact is intact (sha256 {checksums['sha256']})")
+
+
+@app.command()
+def pack(model_id: str, directory: str):
+    """
+    Packs every file under a directory into a single artefact and uploads it.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        directory (str): The directory to pack.
+    """
+    try:
+        checksums = store_packed_artefact(model_id, directory)
+    except (ModelNotFoundError, ArtefactIntegrityError) as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
+    typer.echo(f"Packed artefact {model_id}/artefact uploaded successfully ({checksums['size']} bytes)")
+
+
+@app.command()
+def unpack(model_id: str, directory: str, member: Optional[List[str]] = typer.Option(None)):
+    """
+    Extracts a packed artefact into a directory.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        directory (str): The directory to extract into.
+        member (List[str], optional): Members to extract, each fetched with its own ranged read. Extracts
+            everything from a single download if omitted.
+    """
+    try:
+        extracted = unpack_artefact(model_id, directory, names=member or None)
+    except (FileNotFoundError, PackError, ArtefactIntegrityError) as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
+    typer.echo(f"Extracted {len(extracted)} members ({sum(extracted.values())} bytes) to {directory}")
+
+
+@app.command()
+def list_members(model_id: str):
+    """
+    Lists the members of a packed artefact without downloading it.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+    """
+    try:
+        index = read_pack_index(model_id)
+    except PackError as e:
+        typer.echo(str(e))
+        raise typer.Exit(code=1)
+    if index is None:
+        typer.echo(f"Artefact not found for model {model_id}")
+        raise typer.Exit(code=1)
+    for member in index:
+        typer.echo(f"{member.size:>12}  {member.sha256[:12]}  {member.name}")
+
+
+@app.command(name="import")
+def import_models(manifest: str, checkpoint: Optional[str] = None, workers: int = 8):
+    """
+    Registers every model in a JSONL or CSV manifest, resuming from the checkpoint of an interrupted run.
+
+    Args:
+        manifest (str): The path to the manifest of model metadata and artefact paths.
+        checkpoint (str, optional): The path to the checkpoint file. Defaults to the manifest path plus `.checkpoint`.
+        workers (int, optional): The number of concurrent artefact uploads.
+    """
+    report = import_manifest(manifest, checkpoint_path=checkpoint, upload_workers=workers)
+    typer.echo(report.summary())
+    if report.failures:
+        raise typer.Exit(code=1)
+
+
+@app.command()
+def watch(checkpoint: Optional[str] = None, poll_interval: float = 1.0):
+    """
+    Prints model changes from the change log as they happen.
+
+    Args:
+        checkpoint (str, optional): The path to a checkpoint file to resume from. Starts at the present if omitted.
+        poll_interval (float, optional): Seconds between polls of the change log.
+    """
+    consumer = ChangeFeedConsumer(DynamoChangeLog(), checkpoint_path=checkpoint, poll_interval=poll_interval)
+    consumer.subscribe(lambda event: typer.echo(
+        f"{event.sequence} {event.operation} {event.model_id} (+{time.time() - event.changed_at:.2f}s)"))
+    consumer.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        consumer.stop()
+        typer.echo(f"p50 latency {consumer.latency_percentile(50)}s, p99 latency {consumer.latency_percentile(99)}s")
+
+
+@app.command()
+def sweep(dry_run: bool = False, deletes_per_second: Optional[float] = None,
+          upload_max_age: float = UPLOAD_MAX_AGE, prefix: str = ''):
+    """
+    Deletes stored artefacts of models that no longer exist and aborts abandoned uploads.
+
+    Args:
+        dry_run (bool, optional): Report what would be deleted without deleting anything.
+        deletes_per_second (float, optional): The most objects to delete per second. Unlimited if omitted.
+        upload_max_age (float, optional): Seconds after which an incomplete upload is aborted.
+        prefix (str, optional): Only sweep keys starting with this prefix.
+    """
+    stats = Sweeper(backend, dry_run=dry_run, deletes_per_second=deletes_per_second,
+                    upload_max_age=upload_max_age).sweep(prefix)
+    verb = "Would delete" if dry_run else "Deleted"
+    typer.echo(f"Scanned {stats['scanned']} objects ({stats['scanned_bytes']} bytes). "
+               f"{verb} {stats['orphaned']} orphaned objects ({stats['orphaned_bytes']} bytes) "
+               f"and {stats['uploads_aborted']} incomplete uploads.")
 
 
 if __name__ == "__main__":
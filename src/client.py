@@ -0,0 +1,648 @@
+import asyncio
+import copy
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
+
+import httpx
+
+from checksums import PART_SIZE, ArtefactDigest
+from tensors import LazyTensors
+
+# Statuses admission control answers before a request is processed, so any request can be retried.
+REJECTED_STATUSES = (429, 503)
+# Statuses after which a request may or may not have been processed, so only idempotent ones are retried.
+GATEWAY_STATUSES = (502, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE')
+# Errors raised before a request reached the server, so any request can be retried.
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Size of each write when streaming an artefact to disk.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class RegistryError(Exception):
+    """
+    Raised when the registry answers a request with an error.
+    """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f'{status_code}: {detail}')
+        self.status_code = status_code
+        self.detail = detail
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests to retry and how long to wait first, with exponential backoff and full jitter.
+
+    Jitter spreads the retries of many clients that failed together, e.g. when admission control
+    shed them all at once, so they do not come back together.
+    """
+
+    def __init__(self, attempts: int = 4, base_delay: float = 0.1, max_delay: float = 5.0):
+        """
+        Args:
+            attempts (int, optional): Most attempts per request, including the first (default: 4).
+            base_delay (float, optional): Upper bound of the first backoff in seconds, doubled on every retry (default: 0.1).
+            max_delay (float, optional): Largest backoff in seconds (default: 5).
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, method: str, attempt: int, status_code: Optional[int] = None,
+                     error: Optional[Exception] = None) -> bool:
+        """
+        Args:
+            method (str): The request's HTTP method.
+            attempt (int): The attempt that failed, from 0.
+            status_code (int, optional): The status the server answered with, if it answered.
+            error (Exception, optional): The transport error, if the server did not answer.
+
+        Returns:
+            bool: True if the request should be sent again.
+        """
+        if attempt + 1 >= self.attempts:
+            return False
+        if error is not None:
+            return isinstance(error, CONNECT_ERRORS) or (
+                method in IDEMPOTENT_METHODS and isinstance(error, httpx.TransportError))
+        return status_code in REJECTED_STATUSES or (method in IDEMPOTENT_METHODS and status_code in GATEWAY_STATUSES)
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Args:
+            attempt (int): The attempt that failed, from 0.
+            retry_after (str, optional): The response's Retry-After header, waited for at least when it is in seconds.
+
+        Returns:
+            float: Seconds to wait before the next attempt.
+        """
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        return delay
+
+
+class MetadataCache:
+    """
+    Thread-safe LRU cache of model metadata and the ETags the server returned with it.
+
+    Metadata is copied on the way in and out, so callers can change what they are given without
+    changing what later reads return.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_age: float = 0.0):
+        """
+        Args:
+            max_entries (int, optional): Most models cached (default: 10000).
+            max_age (float, optional): Seconds an entry is used without asking the server whether it changed.
+                With 0, every read is revalidated with If-None-Match (default: 0).
+        """
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries: 'OrderedDict[str, Tuple[str, Dict[str, Any], float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+
+    def get(self, model_id: str) -> Optional[Tuple[str, Dict[str, Any], bool]]:
+        """
+        Returns a model's ETag, metadata and whether it is young enough to use without revalidating, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(model_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(model_id)
+            etag, values, stored_at = entry
+        return etag, copy.deepcopy(values), time.monotonic() - stored_at < self.max_age
+
+    def put(self, model_id: str, etag: str, values: Dict[str, Any]) -> None:
+        values = copy.deepcopy(values)
+        with self._lock:
+            self._entries[model_id] = (etag, values, time.monotonic())
+            self._entries.move_to_end(model_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def forget(self, model_id: str) -> None:
+        with self._lock:
+            self._entries.pop(model_id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _model_path(model_id: str, suffix: str = '') -> str:
+    # Model IDs can hold characters that mean something in a URL, such as `/`, `?`, `#` or `%`.
+    return f'/models/{quote(model_id, safe="")}{suffix}'
+
+
+def _entry_path(model_id: str, kind: str, name: str) -> str:
+    # So can member and tensor names, though `/` separates their path components.
+    return _model_path(model_id, f'/artefact/{kind}/{quote(name, safe="/")}')
+
+
+class _RegistryClientBase:
+    """
+    Request building and response handling shared by the sync and async clients.
+    """
+
+    def __init__(self, retry: Optional[RetryPolicy], cache: Optional[MetadataCache], cache_dir: Optional[str],
+                 max_connections: int):
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.cache = cache if cache is not None else MetadataCache()
+        self.cache_dir = cache_dir
+        self.max_connections = max_connections
+        self.retries = 0
+
+    @staticmethod
+    def _limits(max_connections: int) -> httpx.Limits:
+        # Every pooled connection is kept alive, so bursts do not end with connections being closed and reopened.
+        return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+    @staticmethod
+    def _check(response: httpx.Response) -> httpx.Response:
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get('detail', response.text)
+            except ValueError:
+                detail = response.text
+            raise RegistryError(response.status_code, str(detail))
+        return response
+
+    def _conditional(self, model_id: str) -> Tuple[Optional[Tuple[str, Dict[str, Any], bool]], Dict[str, str]]:
+        cached = self.cache.get(model_id)
+        return cached, ({'If-None-Match': cached[0]} if cached is not None else {})
+
+    def _model_result(self, model_id: str, response: httpx.Response,
+                      cached: Optional[Tuple[str, Dict[str, Any], bool]]) -> Optional[Dict[str, Any]]:
+        if response.status_code == 304 and cached is not None:
+            self.cache.revalidations += 1
+            self.cache.put(model_id, cached[0], cached[1])
+            return cached[1]
+        if response.status_code == 404:
+            self.cache.forget(model_id)
+            return None
+        values = self._check(response).json()
+        etag = response.headers.get('etag')
+        if etag is not None:
+            self.cache.put(model_id, etag, values)
+        else:
+            self.cache.forget(model_id)
+        return values
+
+    @staticmethod
+    def _update_body(name: Optional[str], description: Optional[str],
+                     tags: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        fields = {'name': name, 'description': description, 'tags': tags}
+        return {field: value for field, value in fields.items() if value is not None}
+
+    def _cached_artefact_path(self, model_id: str) -> str:
+        if self.cache_dir is None:
+            raise ValueError('fetch_artefact needs a cache_dir')
+        return os.path.join(self.cache_dir, model_id, 'artefact')
+
+    @staticmethod
+    def _cached_digest(path: str) -> Optional[str]:
+        try:
+            with open(f'{path}.sha256') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _tensor_result(response: httpx.Response) -> Tuple[bytes, str, Tuple[int, ...]]:
+        shape = response.headers.get('x-tensor-shape', '')
+        return (response.content, response.headers.get('x-tensor-dtype', ''),
+                tuple(int(dim) for dim in shape.split(',') if dim))
+
+
+class _ArtefactWriter:
+    """
+    Streams an artefact into a partial file next to its destination, checking it against its recorded checksums.
+    """
+
+    def __init__(self, path: str, checksums: Optional[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.checksums = checksums
+        self.partial_path = f'{path}.partial-{uuid.uuid4().hex}'
+        self.digest = ArtefactDigest((checksums or {}).get('part_size') or PART_SIZE)
+        self._file = open(self.partial_path, 'wb')
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self.digest.update(chunk)
+
+    def finish(self) -> str:
+        self._file.close()
+        if self.checksums:
+            self.digest.verify(self.checksums)
+        os.replace(self.partial_path, self.path)
+        return self.digest.sha256
+
+    def discard(self) -> None:
+        self._file.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+
+
+class RegistryClient(_RegistryClientBase):
+    """
+    Client for the registry server, reusing keep-alive connections from a pool across requests and threads.
+
+    Model reads are cached and revalidated with If-None-Match, so an unchanged model costs a 304
+    with no body. Requests that fail before the server processed them, or that are idempotent, are
+    retried with jittered exponential backoff.
+    """
+
+    def __init__(self, base_url: str, auth: Any = None, timeout: float = 60.0, max_connections: int = 16,
+                 retry: Optional[RetryPolicy] = None, cache: Optional[MetadataCache] = None,
+                 cache_dir: Optional[str] = None, http2: bool = False, client: Optional[httpx.Client] = None):
+        """
+        Args:
+            base_url (str): The server's base URL.
+            auth (optional): HTTP auth for the server, e.g. a (username, password) tuple.
+            timeout (float, optional): Seconds to wait for the server on each request (default: 60).
+            max_connections (int, optional): Most connections kept open to the server, and most concurrent
+                requests in batch helpers (default: 16).
+            retry (RetryPolicy, optional): Which requests to retry and how (default: RetryPolicy()).
+            cache (MetadataCache, optional): Cache for model metadata (default: MetadataCache()).
+            cache_dir (str, optional): Directory `fetch_artefact` keeps artefacts in.
+            http2 (bool, optional): Use HTTP/2 when the server offers it; needs the `h2` package (default: False).
+            client (httpx.Client, optional): Client to send requests with instead of a new one, e.g. a test client.
+        """
+        super().__init__(retry, cache, cache_dir, max_connections)
+        self._client = client if client is not None else httpx.Client(
+            base_url=base_url, auth=auth, timeout=timeout, limits=self._limits(max_connections), http2=http2)
+
+    def _send(self, method: str, send: Callable[[], httpx.Response]) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = send()
+            except httpx.TransportError as e:
+                if not self.retry.should_retry(method, attempt, error=e):
+                    raise
+                delay = self.retry.delay(attempt)
+            else:
+                if not self.retry.should_retry(method, attempt, status_code=response.status_code):
+                    return response
+                delay = self.retry.delay(attempt, response.headers.get('retry-after'))
+            self.retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        return self._send(method, lambda: self._client.request(method, url, **kwargs))
+
+    def create_model(self, name: str, description: Optional[str] = None,
+                     tags: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Creates a new model with a generated ID.
+
+        Returns:
+            dict: The created model.
+
+        Raises:
+            RegistryError: If the server refused the request.
+        """
+        return self._check(self._request('POST', '/models', json=self._update_body(name, description, tags))).json()
+
+    def read_model(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Reads a model, from the metadata cache if the server confirms it has not changed.
+
+        Args:
+            model_id (str): Unique identifier for the model.
+
+        Returns:
+            dict: The model, or None if it does not exist.
+        """
+        cached, headers = self._conditional(model_id)
+        if cached is not None and cached[2]:
+            self.cache.hits += 1
+            return cached[1]
+        return self._model_result(model_id, self._request('GET', _model_path(model_id), headers=headers), cached)
+
+    def read_models(self, model_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Reads several models concurrently, up to `max_connections` at a time.
+
+        Args:
+            model_ids (Iterable[str]): Unique identifiers of the models.
+
+        Returns:
+            dict: The models that exist, keyed by model ID.
+        """
+        unique_ids = list(dict.fromkeys(model_ids))
+        if not unique_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_connections, len(unique_ids))) as pool:
+            models = dict(zip(unique_ids, pool.map(self.read_model, unique_ids)))
+        return {model_id: model for model_id, model in models.items() if model is not None}
+
+    def update_model(self, model_id: str, name: Optional[str] = None, description: Optional[str] = None,
+                     tags: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Updates the given fields of a model.
+
+        Returns:
+            dict: The updated model, or None if it does not exist.
+        """
+        self.cache.forget(model_id)
+        response = self._request('PUT', _model_path(model_id), json=self._update_body(name, description, tags))
+        if response.status_code == 404:
+            return None
+        return self._check(response).json()
+
+    def delete_model(self, model_id: str) -> bool:
+        """
+        Deletes a model.
+
+        Returns:
+            bool: True if the model was deleted, False if it did not exist.
+        """
+        self.cache.forget(model_id)
+        response = self._request('DELETE', _model_path(model_id))
+        if response.status_code == 404:
+            return False
+        self._check(response)
+        return True
+
+    def upload_artefact(self, model_id: str, path: str) -> Dict[str, Any]:
+        """
+        Uploads a file as a model's artefact.
+
+        Returns:
+            dict: The artefact checksums the server recorded.
+
+        Raises:
+            RegistryError: If the upload failed, e.g. because the artefact was corrupted on its way to storage.
+        """
+        def send() -> httpx.Response:
+            with open(path, 'rb') as f:
+                return self._client.post(_model_path(model_id, '/artefact'),
+                                         files={'artefact': (os.path.basename(path), f)})
+
+        self.cache.forget(model_id)
+        return self._check(self._send('POST', send)).json()['checksums']
+
+    def download_artefact(self, model_id: str, path: str, checksums: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Streams a model's artefact to a file, which only appears once the download is complete.
+
+        Args:
+            model_id (str): Unique identifier for the model.
+            path (str): The file to write.
+            checksums (dict, optional): Checksums to verify the artefact against (default: none).
+
+        Returns:
+            str: The artefact's SHA-256.
+
+        Raises:
+            RegistryError: If the model has no artefact.
+            ArtefactIntegrityError: If the artefact does not match `checksums`. Nothing is written.
+        """
+        sha256 = None
+
+        def send() -> httpx.Response:
+            nonlocal sha256
+            with self._client.stream('GET', _model_path(model_id, '/artefact')) as response:
+                if response.status_code == 200:
+                    writer = _ArtefactWriter(path, checksums)
+                    try:
+                        for chunk in response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            writer.write(chunk)
+                        sha256 = writer.finish()
+                    except BaseException:
+                        writer.discard()
+                        raise
+                else:
+                    response.read()
+            return response
+
+        self._check(self._send('GET', send))
+        return sha256
+
+    def fetch_artefact(self, model_id: str) -> str:
+        """
+        Returns the path of a model's artefact in `cache_dir`, downloading it only if it is missing or
+        the model's recorded artefact changed since it was downloaded.
+
+        Raises:
+            RegistryError: If the model or its artefact does not exist.
+            ValueError: If the client has no `cache_dir`.
+        """
+        path = self._cached_artefact_path(model_id)
+        model = self.read_model(model_id)
+        if model is None:
+            raise RegistryError(404, 'Model not found')
+        checksums = model.get('artefact_checksums') or {}
+        if checksums.get('sha256') and os.path.exists(path) and self._cached_digest(path) == checksums['sha256']:
+            return path
+        sha256 = self.download_artefact(model_id, path, checksums)
+        with open(f'{path}.sha256', 'w') as f:
+            f.write(sha256)
+        return path
+
+    def list_members(self, model_id: str) -> List[Dict[str, Any]]:
+        """
+        Lists the members of a packed artefact.
+        """
+        return self._check(self._request('GET', _model_path(model_id, '/artefact/members'))).json()['members']
+
+    def read_member(self, model_id: str, name: str) -> bytes:
+        """
+        Reads one member of a packed artefact.
+        """
+        return self._check(self._request('GET', _entry_path(model_id, 'members', name))).content
+
+    def list_tensors(self, model_id: str) -> Dict[str, Any]:
+        """
+        Lists the tensors of a safetensors artefact, with the artefact's metadata.
+        """
+        return self._check(self._request('GET', _model_path(model_id, '/artefact/tensors'))).json()
+
+    def read_tensor(self, model_id: str, name: str) -> Tuple[bytes, str, Tuple[int, ...]]:
+        """
+        Reads one tensor of a safetensors artefact.
+
+        Returns:
+            tuple: The tensor's bytes, dtype and shape.
+        """
+        return self._tensor_result(self._check(self._request('GET', _entry_path(model_id, 'tensors', name))))
+
+    def tensors(self, model_id: str) -> LazyTensors:
+        """
+        Opens a safetensors artefact whose tensors are fetched on first access over this client's connections.
+        """
+        return LazyTensors.from_server(str(self._client.base_url), model_id, client=self._client)
+
+    def prefetch(self, model_id: str) -> Dict[str, Any]:
+        """
+        Asks the server to load a model's artefact into its local cache.
+        """
+        return self._check(self._request('POST', _model_path(model_id, '/prefetch'))).json()
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self) -> 'RegistryClient':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class AsyncRegistryClient(_RegistryClientBase):
+    """
+    asyncio version of RegistryClient, with the same methods as coroutines.
+    """
+
+    def __init__(self, base_url: str, auth: Any = None, timeout: float = 60.0, max_connections: int = 16,
+                 retry: Optional[RetryPolicy] = None, cache: Optional[MetadataCache] = None,
+                 cache_dir: Optional[str] = None, http2: bool = False, client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            See RegistryClient. `client` is an httpx.AsyncClient.
+        """
+        super().__init__(retry, cache, cache_dir, max_connections)
+        self._client = client if client is not None else httpx.AsyncClient(
+            base_url=base_url, auth=auth, timeout=timeout, limits=self._limits(max_connections), http2=http2)
+
+    async def _send(self, method: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        attempt = 0
+        while True:
+            try:
+                response = await send()
+            except httpx.TransportError as e:
+                if not self.retry.should_retry(method, attempt, error=e):
+                    raise
+                delay = self.retry.delay(attempt)
+            else:
+                if not self.retry.should_retry(method, attempt, status_code=response.status_code):
+                    return response
+                delay = self.retry.delay(attempt, response.headers.get('retry-after'))
+            self.retries += 1
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        return await self._send(method, lambda: self._client.request(method, url, **kwargs))
+
+    async def create_model(self, name: str, description: Optional[str] = None,
+                           tags: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._check(await self._request('POST', '/models',
+                                               json=self._update_body(name, description, tags))).json()
+
+    async def read_model(self, model_id: str) -> Optional[Dict[str, Any]]:
+        cached, headers = self._conditional(model_id)
+        if cached is not None and cached[2]:
+            self.cache.hits += 1
+            return cached[1]
+        response = await self._request('GET', _model_path(model_id), headers=headers)
+        return self._model_result(model_id, response, cached)
+
+    async def read_models(self, model_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        unique_ids = list(dict.fromkeys(model_ids))
+        slots = asyncio.Semaphore(self.max_connections)
+
+        async def read(model_id: str) -> Optional[Dict[str, Any]]:
+            async with slots:
+                return await self.read_model(model_id)
+
+        models = await asyncio.gather(*(read(model_id) for model_id in unique_ids))
+        return {model_id: model for model_id, model in zip(unique_ids, models) if model is not None}
+
+    async def update_model(self, model_id: str, name: Optional[str] = None, description: Optional[str] = None,
+                           tags: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        self.cache.forget(model_id)
+        response = await self._request('PUT', _model_path(model_id), json=self._update_body(name, description, tags))
+        if response.status_code == 404:
+            return None
+        return self._check(response).json()
+
+    async def delete_model(self, model_id: str) -> bool:
+        self.cache.forget(model_id)
+        response = await self._request('DELETE', _model_path(model_id))
+        if response.status_code == 404:
+            return False
+        self._check(response)
+        return True
+
+    async def upload_artefact(self, model_id: str, path: str) -> Dict[str, Any]:
+        async def send() -> httpx.Response:
+            with open(path, 'rb') as f:
+                return await self._client.post(_model_path(model_id, '/artefact'),
+                                               files={'artefact': (os.path.basename(path), f)})
+
+        self.cache.forget(model_id)
+        return self._check(await self._send('POST', send)).json()['checksums']
+
+    async def download_artefact(self, model_id: str, path: str, checksums: Optional[Dict[str, Any]] = None) -> str:
+        sha256 = None
+
+        async def send() -> httpx.Response:
+            nonlocal sha256
+            async with self._client.stream('GET', _model_path(model_id, '/artefact')) as response:
+                if response.status_code == 200:
+                    writer = _ArtefactWriter(path, checksums)
+                    try:
+                        async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            writer.write(chunk)
+                        sha256 = writer.finish()
+                    except BaseException:
+                        writer.discard()
+                        raise
+                else:
+                    await response.aread()
+            return response
+
+        self._check(await self._send('GET', send))
+        return sha256
+
+    async def fetch_artefact(self, model_id: str) -> str:
+        path = self._cached_artefact_path(model_id)
+        model = await self.read_model(model_id)
+        if model is None:
+            raise RegistryError(404, 'Model not found')
+        checksums = model.get('artefact_checksums') or {}
+        if checksums.get('sha256') and os.path.exists(path) and self._cached_digest(path) == checksums['sha256']:
+            return path
+        sha256 = await self.download_artefact(model_id, path, checksums)
+        with open(f'{path}.sha256', 'w') as f:
+            f.write(sha256)
+        return path
+
+    async def list_members(self, model_id: str) -> List[Dict[str, Any]]:
+        return self._check(await self._request('GET', _model_path(model_id, '/artefact/members'))).json()['members']
+
+    async def read_member(self, model_id: str, name: str) -> bytes:
+        return self._check(await self._request('GET', _entry_path(model_id, 'members', name))).content
+
+    async def list_tensors(self, model_id: str) -> Dict[str, Any]:
+        return self._check(await self._request('GET', _model_path(model_id, '/artefact/tensors'))).json()
+
+    async def read_tensor(self, model_id: str, name: str) -> Tuple[bytes, str, Tuple[int, ...]]:
+        return self._tensor_result(self._check(await self._request('GET', _entry_path(model_id, 'tensors', name))))
+
+    async def prefetch(self, model_id: str) -> Dict[str, Any]:
+        return self._check(await self._request('POST', _model_path(model_id, '/prefetch'))).json()
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self) -> 'AsyncRegistryClient':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
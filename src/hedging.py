@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Hedges that can be banked for a burst of slow requests, on top of the per-request budget.
+MAX_BANKED_HEDGES = 10.0
+
+
+class LatencyWindow:
+    """
+    The latencies of the most recent calls of one kind, and a percentile of them that is recomputed
+    every `window // 10` calls rather than on every call.
+    """
+
+    def __init__(self, percentile: float, window: int = 1000, min_samples: int = 50):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._refresh_every = max(1, window // 10)
+        self._since_refresh = 0
+        self._threshold: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        with self._lock:
+            self._samples.append(latency)
+            self._since_refresh += 1
+            if len(self._samples) >= self.min_samples and (
+                    self._threshold is None or self._since_refresh >= self._refresh_every):
+                ordered = sorted(self._samples)
+                self._threshold = ordered[min(int(len(ordered) * self.percentile / 100), len(ordered) - 1)]
+                self._since_refresh = 0
+
+    @property
+    def threshold(self) -> Optional[float]:
+        """
+        The latency percentile in seconds, or None until `min_samples` calls have completed.
+        """
+        return self._threshold
+
+
+class Hedger:
+    """
+    Runs idempotent reads with hedging: when an attempt has not answered within a percentile of
+    recent latencies, a duplicate is sent and whichever answers first is used.
+
+    Hedges are capped at a fraction of requests, so a slowdown that affects every request cannot
+    double the load on the service that is slow. Latency windows are kept per kind of call, since
+    e.g. a single-item read and a batch read have very different latency.
+    """
+
+    def __init__(self, percentile: float = 95.0, budget: float = 0.05, min_delay: float = 0.002,
+                 window: int = 1000, min_samples: int = 50, max_workers: int = 64):
+        """
+        Args:
+            percentile (float, optional): Percentile of recent latency after which a hedge is sent (default: 95).
+            budget (float, optional): Fraction of requests that may be hedged (default: 0.05).
+            min_delay (float, optional): Shortest wait in seconds before hedging (default: 0.002).
+            window (int, optional): Number of recent latencies the percentile is taken over (default: 1000).
+            min_samples (int, optional): Latencies needed before anything is hedged (default: 50).
+            max_workers (int, optional): Threads running attempts (default: 64).
+
+        Raises:
+            ValueError: If `percentile` is not in (0, 100) or `budget` is not in [0, 1].
+        """
+        if not 0 < percentile < 100:
+            raise ValueError(f"percentile must be in (0, 100), got {percentile}")
+        if not 0 <= budget <= 1:
+            raise ValueError(f"budget must be in [0, 1], got {budget}")
+        self.percentile = percentile
+        self.budget = budget
+        self.min_delay = min_delay
+        self._window = window
+        self._min_samples = min_samples
+        self._windows: Dict[str, LatencyWindow] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedged-read')
+        self._lock = threading.Lock()
+        self._banked = 1.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.hedges_denied = 0
+
+    def _latency_window(self, kind: str) -> LatencyWindow:
+        with self._lock:
+            window = self._windows.get(kind)
+            if window is None:
+                window = self._windows[kind] = LatencyWindow(self.percentile, self._window, self._min_samples)
+            return window
+
+    def _submit(self, window: LatencyWindow, fn: Callable[..., Any], args: tuple) -> Future:
+        start = time.perf_counter()
+        future = self._executor.submit(fn, *args)
+
+        def record(done: Future) -> None:
+            # Losing attempts are recorded too, so the window sees the service's latency rather than the hedged one.
+            if not done.cancelled() and done.exception() is None:
+                window.record(time.perf_counter() - start)
+
+        future.add_done_callback(record)
+        return future
+
+    def _try_hedge(self) -> bool:
+        with self._lock:
+            if self._banked >= 1:
+                self._banked -= 1
+                self.hedges += 1
+                return True
+            self.hedges_denied += 1
+            return False
+
+    def call(self, kind: str, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Calls `fn(*args)`, hedging it if it is slow.
+
+        `fn` must be safe to call twice. An exception is only raised if every attempt raised.
+
+        Args:
+            kind (str): Kind of call, for the latency window, e.g. 'get_item'.
+            fn (Callable): The call.
+            *args: Arguments for the call.
+
+        Returns:
+            The result of the first attempt to succeed.
+        """
+        window = self._latency_window(kind)
+        with self._lock:
+            self.requests += 1
+            self._banked = min(self._banked + self.budget, MAX_BANKED_HEDGES)
+        primary = self._submit(window, fn, args)
+        threshold = window.threshold
+        if threshold is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=max(threshold, self.min_delay))
+        if done or not self._try_hedge():
+            return primary.result()
+
+        hedge = self._submit(window, fn, args)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for attempt in (primary, hedge):
+                if attempt not in done:
+                    continue
+                if attempt.exception() is None:
+                    if attempt is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return attempt.result()
+                error = error or attempt.exception()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the request, hedge and win counts, the hedge and win rates, and the current hedging delays.
+        """
+        with self._lock:
+            stats = {'requests': self.requests, 'hedges': self.hedges, 'hedge_wins': self.hedge_wins,
+                     'hedges_denied': self.hedges_denied,
+                     'hedge_rate': self.hedges / self.requests if self.requests else 0.0,
+                     'win_rate': self.hedge_wins / self.hedges if self.hedges else 0.0}
+            windows = dict(self._windows)
+        stats['delays'] = {kind: window.threshold for kind, window in windows.items()}
+        return stats
+
+    def close(self) -> None:
+        """
+        Stops accepting calls and logs the hedging counts.
+        """
+        self._executor.shutdown(wait=False)
+        stats = self.stats()
+        logger.info("Hedged %d of %d reads (%.1f%%), %d hedges won, %d denied by the budget",
+                    stats['hedges'], stats['requests'], stats['hedge_rate'] * 100, stats['hedge_wins'],
+                    stats['hedges_denied'])
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+
+# Crockford's base32 alphabet, as used by ULID. Its characters sort in the same order as their values.
+_ENCODING = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+_MAX_RANDOM = (1 << _RANDOM_BITS) - 1
+ID_LENGTH = 26
+
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(ID_LENGTH):
+        value, index = divmod(value, 32)
+        chars.append(_ENCODING[index])
+    return ''.join(reversed(chars))
+
+
+class ModelIdGenerator:
+    """
+    Generates ULID-style model IDs: a 48-bit millisecond timestamp followed by 80 random bits,
+    encoded as 26 characters of Crockford base32.
+
+    IDs sort lexicographically by creation time. Within a process they are strictly increasing:
+    IDs generated in the same millisecond increment the random part of the previous ID instead of
+    drawing new randomness, so they cannot collide with each other, and the fresh randomness drawn
+    each millisecond makes collisions across processes and hosts practically impossible.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._last_ms = 0
+        self._last_random = 0
+
+    def generate(self) -> str:
+        """
+        Returns a new model ID.
+        """
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(_RANDOM_BITS // 8), 'big')
+            elif self._last_random < _MAX_RANDOM:
+                # Same millisecond, or the clock went backwards: stay on the last timestamp and count up.
+                self._last_random += 1
+            else:
+                self._last_ms += 1
+                self._last_random = int.from_bytes(os.urandom(_RANDOM_BITS // 8), 'big')
+            return _encode((self._last_ms << _RANDOM_BITS) | self._last_random)
+
+
+_generator = ModelIdGenerator()
+# A forked worker must not continue counting from its parent's last ID, or both would emit the same sequence.
+os.register_at_fork(after_in_child=_generator._reset)
+
+
+def generate_model_id() -> str:
+    """
+    Generates a new unique, time-ordered model ID.
+
+    Returns:
+        str: A 26 character ID that sorts lexicographically by creation time.
+    """
+    return _generator.generate()
+
+
+def id_floor(timestamp: float) -> str:
+    """
+    Returns the smallest ID that can be generated at a given time, for range conditions over IDs.
+
+    Args:
+        timestamp (float): Seconds since the epoch.
+
+    Returns:
+        str: An ID that sorts before every ID generated at or after `timestamp`.
+    """
+    return _encode(int(timestamp * 1000) << _RANDOM_BITS)
+
+
+def id_timestamp(model_id: str) -> float:
+    """
+    Returns the time an ID was generated at, in seconds since the epoch.
+
+    Args:
+        model_id (str): An ID produced by generate_model_id.
+    """
+    value = 0
+    for char in model_id:
+        value = value * 32 + _ENCODING.index(char)
+    return (value >> _RANDOM_BITS) / 1000
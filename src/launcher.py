@@ -0,0 +1,146 @@
+"""
+Production launcher for the API server: binds the listening socket, creates a metadata cache in
+shared memory, then forks the uvicorn workers, which all accept on the socket and read models
+through the one cache.
+
+Usage:
+    python src/launcher.py --workers 8 --port 8000 --cache-mb 64
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Dict
+
+import uvicorn
+
+from shared_cache import MAX_WORKERS, SharedMetadataCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds workers get to finish in-flight requests after SIGTERM before they are killed.
+GRACEFUL_TIMEOUT = 30.0
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """
+    Binds the listening socket the workers share.
+
+    TCP_NODELAY is set on it because Linux copies it to every accepted connection. Without it,
+    keep-alive responses from multiple uvicorn workers wait for a delayed ACK unless uvloop is installed.
+    """
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(index: int, sock: socket.socket, cache: SharedMetadataCache, app: str, log_level: str) -> None:
+    """
+    Runs one uvicorn worker on the shared socket, reading models through the shared cache.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    cache.worker = index
+    import operations
+    operations.enable_metadata_cache(cache)
+    uvicorn.Server(uvicorn.Config(app, log_level=log_level)).run(sockets=[sock])
+
+
+def serve(host: str = '127.0.0.1', port: int = 8000, workers: int = 4, cache_mb: int = 64,
+          slot_size: int = 1024, ttl: float = 30.0, app: str = 'server:app', log_level: str = 'info') -> None:
+    """
+    Runs the server with pre-forked workers until SIGINT or SIGTERM, restarting workers that die.
+
+    Args:
+        host (str, optional): Address to listen on (default: 127.0.0.1).
+        port (int, optional): Port to listen on (default: 8000).
+        workers (int, optional): Number of worker processes (default: 4).
+        cache_mb (int, optional): Size of the shared metadata cache in MiB, whatever the number of workers (default: 64).
+        slot_size (int, optional): Bytes per cached model; larger models are not cached (default: 1024).
+        ttl (float, optional): Seconds a cached model is served before it is read again (default: 30).
+        app (str, optional): The ASGI app, as an import string (default: server:app).
+        log_level (str, optional): uvicorn log level (default: info).
+
+    Raises:
+        ValueError: If `workers` is not between 1 and MAX_WORKERS, or MODEL_REGISTRY_WRITE_BEHIND_INTERVAL is
+            set: each worker would buffer its own updates, invisible to the other workers and the shared cache.
+            Also if MODEL_REGISTRY_STORAGE is `tiered` with more than one worker: each worker would keep
+            its own read counts and hot-tier accounting for the one directory they share.
+    """
+    if not 1 <= workers <= MAX_WORKERS:
+        raise ValueError(f"workers must be between 1 and {MAX_WORKERS}, got {workers}")
+    if os.environ.get('MODEL_REGISTRY_WRITE_BEHIND_INTERVAL'):
+        raise ValueError("MODEL_REGISTRY_WRITE_BEHIND_INTERVAL cannot be used with the shared metadata cache")
+    if workers > 1 and os.environ.get('MODEL_REGISTRY_STORAGE') == 'tiered':
+        raise ValueError("MODEL_REGISTRY_STORAGE=tiered can only be used with a single worker")
+    sock = bind_socket(host, port)
+    cache = SharedMetadataCache(cache_mb * 1024 * 1024, slot_size=slot_size, ttl=ttl)
+    context = multiprocessing.get_context('fork')
+    processes: Dict[int, multiprocessing.Process] = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    def start(index: int) -> None:
+        process = context.Process(target=run_worker, args=(index, sock, cache, app, log_level),
+                                  name=f'server-worker-{index}')
+        process.start()
+        processes[index] = process
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    logger.info("Serving on %s:%d with %d workers and a %d MiB shared metadata cache (%d entries)",
+                host, port, workers, cache_mb, cache.stats()['entries'])
+    try:
+        for index in range(workers):
+            start(index)
+        while not stopping:
+            time.sleep(0.5)
+            for index, process in list(processes.items()):
+                if not stopping and not process.is_alive():
+                    logger.warning("Worker %d exited with code %s, restarting it", index, process.exitcode)
+                    start(index)
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + GRACEFUL_TIMEOUT
+        for process in processes.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        stats = cache.stats()
+        logger.info("Metadata cache served %d hits and %d misses (%.1f%% hit rate)",
+                    stats['hits'], stats['misses'], stats['hit_rate'] * 100)
+        cache.close(unlink=True)
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--cache-mb', type=int, default=64, help='Size of the shared metadata cache')
+    parser.add_argument('--slot-size', type=int, default=1024, help='Bytes per cached model')
+    parser.add_argument('--ttl', type=float, default=30.0, help='Seconds a cached model is served')
+    parser.add_argument('--app', default='server:app')
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+    serve(args.host, args.port, args.workers, args.cache_mb, args.slot_size, args.ttl, args.app, args.log_level)
+
+
+if __name__ == '__main__':
+    main()
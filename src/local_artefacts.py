@@ -0,0 +1,244 @@
+import mmap
+import os
+import re
+from typing import Optional, Tuple
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from admission import release_slot
+
+# Directory holding local artefact copies, one per version as `{model_id}/artefact.{sha256}`.
+artefact_cache_dir = os.environ.get('MODEL_REGISTRY_ARTEFACT_CACHE_DIR')
+
+# Total size the artefacts fetched into the cache directory may take up before the least recently used are evicted.
+artefact_cache_max_bytes = (int(os.environ['MODEL_REGISTRY_ARTEFACT_CACHE_MAX_BYTES'])
+                            if os.environ.get('MODEL_REGISTRY_ARTEFACT_CACHE_MAX_BYTES') else None)
+
+# Largest slice of the mapping handed to the server per send when zero-copy send is unavailable.
+CHUNK_SIZE = 4 * 1024 * 1024
+
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class RangeNotSatisfiable(Exception):
+    """
+    Raised when a Range header lies entirely outside the artefact.
+    """
+
+
+def model_cache_dir(cache_dir: str, model_id: str) -> Optional[str]:
+    """
+    Returns the directory holding a model's cached artefacts, refusing IDs that would escape the cache.
+
+    Args:
+        cache_dir (str): The cache directory.
+        model_id (str): The ID of the model the artefacts belong to.
+
+    Returns:
+        str or None: The model's directory, or None if the ID is empty or a path component.
+    """
+    if model_id in ('', '.', '..') or os.sep in model_id or (os.altsep and os.altsep in model_id):
+        return None
+    return os.path.join(cache_dir, model_id)
+
+
+def artefact_cache_path(cache_dir: str, model_id: str, sha256: Optional[str]) -> Optional[str]:
+    """
+    Returns where one version of a model's artefact lives in a cache directory.
+
+    Entries are named by the SHA-256 recorded for the artefact, so a copy left behind by a replaced
+    artefact is never served in place of the current one, even if its eviction was missed.
+
+    Args:
+        cache_dir (str): The cache directory.
+        model_id (str): The ID of the model the artefact belongs to.
+        sha256 (str, optional): The artefact's recorded SHA-256.
+
+    Returns:
+        str or None: The path of the cache entry, or None if the ID cannot name a cache entry or there is
+            no valid SHA-256 to name it by.
+    """
+    directory = model_cache_dir(cache_dir, model_id)
+    if directory is None or sha256 is None or not _SHA256_PATTERN.match(sha256):
+        return None
+    return os.path.join(directory, f'artefact.{sha256}')
+
+
+def is_cache_entry(name: str) -> bool:
+    """
+    Tells whether a file name in a model's cache directory is a complete artefact rather than a partial fetch.
+
+    Args:
+        name (str): The file name.
+
+    Returns:
+        bool: True for complete cache entries.
+    """
+    return name.startswith('artefact.') and not name.endswith('.partial')
+
+
+def local_artefact_path(model_id: str, sha256: Optional[str]) -> Optional[str]:
+    """
+    Returns the path of the local copy of a model's artefact, if there is one for the given version.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        sha256 (str, optional): The artefact's recorded SHA-256.
+
+    Returns:
+        str or None: The path of the local copy, or None if there is no cache directory or no copy.
+    """
+    if artefact_cache_dir is None:
+        return None
+    path = artefact_cache_path(artefact_cache_dir, model_id, sha256)
+    return path if path is not None and os.path.isfile(path) else None
+
+
+def evict_local_artefact(model_id: str) -> bool:
+    """
+    Removes every local copy of a model's artefact, e.g. because the artefact was replaced or deleted.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+
+    Returns:
+        bool: True if a local copy was removed.
+    """
+    if artefact_cache_dir is None:
+        return False
+    directory = model_cache_dir(artefact_cache_dir, model_id)
+    if directory is None:
+        return False
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return False
+    removed = False
+    for name in filter(is_cache_entry, names):
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        removed = True
+    return removed
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range `Range: bytes=...` header.
+
+    Args:
+        header (str, optional): The Range header value.
+        size (int): The size of the artefact in bytes.
+
+    Returns:
+        tuple or None: The inclusive (first, last) byte positions, or None if the whole artefact should be
+            sent, which is also the answer for malformed and multi-range headers.
+
+    Raises:
+        RangeNotSatisfiable: If the range does not overlap the artefact.
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if first:
+        first = int(first)
+        last = min(int(last), size - 1) if last else size - 1
+        if first > last:
+            if first >= size:
+                raise RangeNotSatisfiable(header)
+            return None
+    elif last:
+        suffix = int(last)
+        if suffix == 0:
+            raise RangeNotSatisfiable(header)
+        first, last = max(size - suffix, 0), size - 1
+    else:
+        return None
+    if size == 0:
+        raise RangeNotSatisfiable(header)
+    return first, last
+
+
+class LocalArtefactResponse(Response):
+    """
+    Serves a local artefact file without reading it through Python.
+
+    Uses the ASGI zero-copy send extension (sendfile) when the server offers it, otherwise hands the
+    server slices of a memory mapping of the file so the bytes go from the page cache to the socket
+    without intermediate Python copies. Honours single byte-range requests.
+    """
+
+    media_type = 'application/octet-stream'
+
+    def __init__(self, path: str, range_header: Optional[str] = None):
+        """
+        The file is opened here rather than when the response is sent, so a file removed in between, e.g.
+        by cache eviction, is still served whole, and a file already gone can be handled by the caller.
+
+        Args:
+            path (str): Path of the local artefact file.
+            range_header (str, optional): The request's Range header, if any.
+
+        Raises:
+            FileNotFoundError: If the file no longer exists.
+        """
+        super().__init__(media_type=self.media_type)
+        self.path = path
+        self.range_header = range_header
+        self.file = open(path, 'rb')
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        # The file is sent from the event loop, so the transfer need not hold an admission slot.
+        release_slot(scope)
+        with self.file as f:
+            size = os.fstat(f.fileno()).st_size
+            headers = [(b'accept-ranges', b'bytes'), (b'content-type', self.media_type.encode())]
+            try:
+                byte_range = parse_range(self.range_header, size)
+            except RangeNotSatisfiable:
+                headers += [(b'content-range', f'bytes */{size}'.encode()), (b'content-length', b'0')]
+                await send({'type': 'http.response.start', 'status': 416, 'headers': headers})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+
+            if byte_range is None:
+                status, offset, count = 200, 0, size
+            else:
+                status, offset, count = 206, byte_range[0], byte_range[1] - byte_range[0] + 1
+                headers.append((b'content-range', f'bytes {byte_range[0]}-{byte_range[1]}/{size}'.encode()))
+            headers.append((b'content-length', str(count).encode()))
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+
+            if 'http.response.zerocopysend' in scope.get('extensions', {}):
+                await send({'type': 'http.response.zerocopysend', 'file': f.fileno(),
+                            'offset': offset, 'count': count, 'more_body': False})
+            elif count == 0:
+                await send({'type': 'http.response.body', 'body': b''})
+            else:
+                await self._send_mapped(f, offset, count, send)
+
+    async def _send_mapped(self, f, offset: int, count: int, send: Send) -> None:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapping)
+        end = offset + count
+        try:
+            while offset < end:
+                chunk_end = min(offset + CHUNK_SIZE, end)
+                await send({'type': 'http.response.body', 'body': view[offset:chunk_end],
+                            'more_body': chunk_end < end})
+                offset = chunk_end
+        finally:
+            try:
+                view.release()
+                mapping.close()
+            except BufferError:
+                # The server still holds a slice it has not finished writing; the mapping is
+                # unmapped when that slice is garbage collected.
+                pass
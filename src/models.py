@@ -1,7 +1,7 @@
 from datetime import datetime 
 
 from pynamodb.models import Model
-from pynamodb.attributes import UnicodeAttribute, NumberAttribute, UTCDateTimeAttribute, JSONAttribute
+from pynamodb.attributes import UnicodeAttribute, NumberAttribute, UTCDateTimeAttribute, JSONAttribute, TTLAttribute
 
 
 class ModelTable(Model):
@@ -14,7 +14,23 @@ class ModelTable(Model):
     model_id = UnicodeAttribute(hash_key=True)
     name = UnicodeAttribute()
     description = UnicodeAttribute(null=True)
-    created_at = UTCDateTimeAttribute(default=datetime.utcnow())
-    last_updated_at = UTCDateTimeAttribute(default=datetime.utcnow())
+    created_at = UTCDateTimeAttribute(default=datetime.utcnow)
+    last_updated_at = UTCDateTimeAttribute(default=datetime.utcnow)
     version = NumberAttribute(default=1)
     tags = JSONAttribute(null=True)
+    artefact_checksums = JSONAttribute(null=True)
+
+
+class ChangeLogTable(Model):
+    """
+    DynamoDB table holding the ordered log of changes made to the ModelTable
+    """
+    class Meta:
+        table_name = 'model-change-log'
+        region = 'us-east-1'
+    shard = UnicodeAttribute(hash_key=True)
+    sequence = UnicodeAttribute(range_key=True)
+    model_id = UnicodeAttribute()
+    operation = UnicodeAttribute()
+    changed_at = UTCDateTimeAttribute()
+    expires_at = TTLAttribute(null=True)
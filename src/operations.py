@@ -1,15 +1,222 @@
+import atexit
+import json
+import logging
 from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
 
+from pynamodb.exceptions import DeleteError, PutError, UpdateError
+
+from changefeed import ARTEFACT, CREATE, DELETE, UPDATE, ChangeLog
+from hedging import Hedger
 from models import ModelTable
-from typing import Dict, Optional, Union
-from datetime import datetime
+from shared_cache import SharedMetadataCache
+from writebehind import WriteBehindQueue
+
+logger = logging.getLogger(__name__)
+
+# Set by enable_write_behind(); when present, update_model buffers writes instead of saving them.
+write_behind_queue: Optional[WriteBehindQueue] = None
+
+# Set by enable_change_log(); when present, every mutation is appended to it.
+change_log: Optional[ChangeLog] = None
+
+# Set by enable_hedged_reads(); when present, read_model and batch_read_models hedge slow reads.
+read_hedger: Optional[Hedger] = None
+
+# Set by enable_metadata_cache(); when present, models are read through it.
+metadata_cache: Optional[SharedMetadataCache] = None
+
+# Keys per BatchGetItem request, DynamoDB's limit.
+BATCH_READ_SIZE = 100
+
+
+def enable_change_log(log: ChangeLog) -> None:
+    """
+    Starts appending an event to the given change log for every create, update and delete.
+
+    Args:
+        log (ChangeLog): The change log to append to.
+
+    """
+    global change_log
+    change_log = log
+
+
+def record_change(model_id: str, operation: str) -> None:
+    """
+    Invalidates the model in the metadata cache and appends a change event to the change log, if they are enabled.
+
+    The event is written after the mutation it describes. A failure to write it is logged rather than
+    raised, because the mutation itself has already succeeded.
+
+    Args:
+        model_id (str): Unique identifier for the model.
+        operation (str): One of changefeed.CREATE, UPDATE, DELETE or ARTEFACT.
+
+    """
+    invalidate_cached_model(model_id)
+    if change_log is not None:
+        try:
+            change_log.append(model_id, operation)
+        except Exception:
+            logger.exception("Failed to record %s of model %s in the change log", operation, model_id)
+
+
+def enable_metadata_cache(cache: SharedMetadataCache) -> None:
+    """
+    Starts reading models through a metadata cache, typically one shared by all server workers.
+
+    Mutations made through this module invalidate the cached model. Changes made elsewhere are picked
+    up through invalidate_cached_model (e.g. from the change feed) or when the entry expires.
+
+    Write-behind cannot be combined with a shared cache: updates buffered in one worker are invisible
+    to the others, which would go on serving and caching the model as it was before the update.
+
+    Args:
+        cache (SharedMetadataCache): The cache.
+
+    Raises:
+        RuntimeError: If write-behind mode is enabled.
+
+    """
+    global metadata_cache
+    if write_behind_queue is not None:
+        raise RuntimeError("Write-behind updates cannot be combined with a shared metadata cache")
+    metadata_cache = cache
+
+
+def invalidate_cached_model(model_id: str) -> None:
+    """
+    Drops a model from the metadata cache, if one is enabled.
+
+    Args:
+        model_id (str): Unique identifier for the model.
+
+    """
+    if metadata_cache is not None:
+        metadata_cache.invalidate(model_id)
+
+
+def enable_write_behind(flush_interval: float = 1.0, max_pending: int = 1000) -> WriteBehindQueue:
+    """
+    Switches update_model to write-behind mode, coalescing updates in memory and flushing them in the background.
+
+    Buffered updates are only visible in this process, so write-behind cannot be combined with a
+    metadata cache shared with other processes (see enable_metadata_cache).
+
+    Args:
+        flush_interval (float, optional): Seconds between background flushes (default: 1.0).
+        max_pending (int, optional): Number of buffered models that triggers an early flush (default: 1000).
+
+    Returns:
+        WriteBehindQueue: The running queue.
+
+    Raises:
+        RuntimeError: If a metadata cache is enabled.
+
+    """
+    global write_behind_queue
+    if metadata_cache is not None:
+        raise RuntimeError("Write-behind updates cannot be combined with a shared metadata cache")
+    if write_behind_queue is None:
+        write_behind_queue = WriteBehindQueue(flush_interval=flush_interval, max_pending=max_pending,
+                                              on_write=lambda model_id: record_change(model_id, UPDATE))
+        write_behind_queue.start()
+        atexit.register(disable_write_behind)
+    return write_behind_queue
+
+
+def disable_write_behind() -> None:
+    """
+    Drains any buffered updates to DynamoDB and switches update_model back to synchronous saves.
+    """
+    global write_behind_queue
+    if write_behind_queue is not None:
+        queue, write_behind_queue = write_behind_queue, None
+        queue.close()
+
+
+def enable_hedged_reads(percentile: float = 95.0, budget: float = 0.05) -> Hedger:
+    """
+    Starts hedging reads: a read still unanswered after the given percentile of recent read latency
+    is sent again, and the first answer is used.
+
+    Args:
+        percentile (float, optional): Percentile of recent latency after which a read is hedged (default: 95).
+        budget (float, optional): Fraction of reads that may be hedged (default: 0.05).
+
+    Returns:
+        Hedger: The hedger, whose counters show how many reads were hedged and how many hedges won.
+
+    """
+    global read_hedger
+    if read_hedger is None:
+        read_hedger = Hedger(percentile=percentile, budget=budget)
+        atexit.register(disable_hedged_reads)
+    return read_hedger
+
+
+def disable_hedged_reads() -> None:
+    """
+    Stops hedging reads.
+    """
+    global read_hedger
+    if read_hedger is not None:
+        hedger, read_hedger = read_hedger, None
+        hedger.close()
+
+
+def _hedged(kind: str, fn, *args):
+    hedger = read_hedger
+    if hedger is None:
+        return fn(*args)
+    return hedger.call(kind, fn, *args)
+
+
+def _get_model(model_id: str) -> Optional[ModelTable]:
+    try:
+        return ModelTable.get(model_id)
+    except ModelTable.DoesNotExist:
+        return None
+
+
+def _batch_get_models(model_ids: List[str]) -> List[ModelTable]:
+    return list(ModelTable.batch_get(model_ids))
+
+
+def _cache_model(cache: SharedMetadataCache, model: ModelTable, generation: int) -> None:
+    cache.put(model.model_id, json.dumps(model.serialize()).encode(), generation)
+
+
+def _cached_model(value: bytes) -> ModelTable:
+    return ModelTable.from_raw_data(json.loads(value))
+
+
+def _read_model_item(model_id: str) -> Optional[ModelTable]:
+    cache = metadata_cache
+    if cache is None:
+        return _hedged('get_item', _get_model, model_id)
+    value, generation = cache.get(model_id)
+    if value is not None:
+        return _cached_model(value)
+    model = _hedged('get_item', _get_model, model_id)
+    if model is not None:
+        _cache_model(cache, model, generation)
+    return model
+
+
+def _apply_fields(model: ModelTable, fields: Dict[str, Any]) -> None:
+    for name, value in fields.items():
+        setattr(model, name, value)
 
 
 def create_model(model_id: str, name: str, description: Optional[str] = None,
-                 tags: Optional[Dict[str, Union[str, int]]] = None) -> ModelTable:
+                 tags: Optional[Dict[str, Union[str, int]]] = None) -> Optional[ModelTable]:
     """
     Creates a new model in the ModelTable.
 
+    The write is conditional on no model with the same ID existing, so an existing model is never overwritten.
+
     Args:
         model_id (str): Unique identifier for the model.
         name (str): Name of the model.
@@ -17,7 +224,7 @@ def create_model(model_id: str, name: str, description: Optional[str] = None,
         tags (dict, optional): Dictionary of key-value pairs to associate with the model (default: None).
 
     Returns:
-        ModelTable: The newly created model.
+        ModelTable or None: The newly created model, or None if a model with that ID already exists.
 
     """
     new_model = ModelTable(
@@ -26,7 +233,13 @@ def create_model(model_id: str, name: str, description: Optional[str] = None,
         description=description,
         tags=tags
     )
-    new_model.save()
+    try:
+        new_model.save(condition=ModelTable.model_id.does_not_exist())
+    except PutError as e:
+        if e.cause_response_code == 'ConditionalCheckFailedException':
+            return None
+        raise
+    record_change(model_id, CREATE)
     return new_model
 
 
@@ -34,6 +247,9 @@ def read_model(model_id: str) -> Optional[ModelTable]:
     """
     Reads a model from the ModelTable.
 
+    When a metadata cache is enabled the model is served from it if possible. When hedged reads are
+    enabled, a slow read from DynamoDB is duplicated and the first answer is used.
+
     Args:
         model_id (str): Unique identifier for the model.
 
@@ -41,10 +257,54 @@ def read_model(model_id: str) -> Optional[ModelTable]:
         ModelTable or None: The model if it exists, otherwise None.
 
     """
-    try:
-        return ModelTable.get(model_id)
-    except ModelTable.DoesNotExist:
+    model = _read_model_item(model_id)
+    if model is None:
         return None
+    if write_behind_queue is not None:
+        pending = write_behind_queue.pending(model_id)
+        if pending is not None:
+            _apply_fields(model, pending)
+    return model
+
+
+def batch_read_models(model_ids: Iterable[str]) -> Dict[str, ModelTable]:
+    """
+    Reads several models from the ModelTable with BatchGetItem requests of up to BATCH_READ_SIZE keys.
+
+    Models in the metadata cache, when one is enabled, are not requested. When hedged reads are
+    enabled, each request is hedged on its own.
+
+    Args:
+        model_ids (Iterable[str]): Unique identifiers of the models.
+
+    Returns:
+        dict: The models that exist, keyed by model ID.
+
+    """
+    unique_ids = list(dict.fromkeys(model_ids))
+    models: Dict[str, ModelTable] = {}
+    cache = metadata_cache
+    generations: Dict[str, int] = {}
+    if cache is not None:
+        missing = []
+        for model_id in unique_ids:
+            value, generations[model_id] = cache.get(model_id)
+            if value is not None:
+                models[model_id] = _cached_model(value)
+            else:
+                missing.append(model_id)
+        unique_ids = missing
+    for start in range(0, len(unique_ids), BATCH_READ_SIZE):
+        for model in _hedged('batch_get', _batch_get_models, unique_ids[start:start + BATCH_READ_SIZE]):
+            models[model.model_id] = model
+            if cache is not None:
+                _cache_model(cache, model, generations[model.model_id])
+    if write_behind_queue is not None:
+        for model_id, model in models.items():
+            pending = write_behind_queue.pending(model_id)
+            if pending is not None:
+                _apply_fields(model, pending)
+    return models
 
 
 def update_model(model_id: str, name: Optional[str] = None, description: Optional[str] = None,
@@ -52,6 +312,12 @@ def update_model(model_id: str, name: Optional[str] = None, description: Optiona
     """
     Updates an existing model in the ModelTable.
 
+    Only the given fields are written, with an UpdateItem conditional on the model existing, so
+    attributes written by others in the meantime (e.g. artefact checksums) are kept. The model is
+    never read through the metadata cache, whose copy may be stale. When write-behind mode is
+    enabled the update is buffered and written asynchronously; it is visible to read_model in this
+    process immediately.
+
     Args:
         model_id (str): Unique identifier for the model.
         name (str, optional): New name for the model (default: None).
@@ -62,25 +328,68 @@ def update_model(model_id: str, name: Optional[str] = None, description: Optiona
         ModelTable or None: The updated model if it exists, otherwise None.
 
     """
-    existing_model = read_model(model_id)
-    if existing_model is not None:
-        if name is not None:
-            existing_model.name = name
-        if description is not None:
-            existing_model.description = description
-        if tags is not None:
-            existing_model.tags = tags
-        existing_model.last_updated_at = datetime.utcnow()
-        existing_model.save()
+    update_fields: Dict[str, Any] = {}
+    if name is not None:
+        update_fields['name'] = name
+    if description is not None:
+        update_fields['description'] = description
+    if tags is not None:
+        update_fields['tags'] = tags
+    update_fields['last_updated_at'] = datetime.utcnow()
+
+    if write_behind_queue is not None:
+        existing_model = _hedged('get_item', _get_model, model_id)
+        if existing_model is None:
+            return None
+        pending = write_behind_queue.pending(model_id)
+        if pending is not None:
+            _apply_fields(existing_model, pending)
+        _apply_fields(existing_model, update_fields)
+        write_behind_queue.put(model_id, update_fields)
         return existing_model
-    else:
-        return None
+
+    updated_model = ModelTable(model_id)
+    try:
+        updated_model.update(actions=[getattr(ModelTable, field).set(value) for field, value in update_fields.items()],
+                             condition=ModelTable.model_id.exists())
+    except UpdateError as e:
+        if e.cause_response_code == 'ConditionalCheckFailedException':
+            return None
+        raise
+    record_change(model_id, UPDATE)
+    return updated_model
+
+
+def record_artefact_checksums(model_id: str, checksums: Dict[str, Any]) -> bool:
+    """
+    Records the checksums of a model's artefact on its ModelTable item.
+
+    Args:
+        model_id (str): Unique identifier for the model.
+        checksums (dict): The artefact checksums, as computed by checksums.ArtefactDigest.
+
+    Returns:
+        bool: True if the checksums were recorded, False if the model does not exist.
+
+    """
+    try:
+        ModelTable(model_id).update(actions=[ModelTable.artefact_checksums.set(checksums)],
+                                    condition=ModelTable.model_id.exists())
+    except UpdateError as e:
+        if e.cause_response_code == 'ConditionalCheckFailedException':
+            return False
+        raise
+    record_change(model_id, ARTEFACT)
+    return True
 
 
 def delete_model(model_id: str) -> bool:
     """
     Deletes an existing model from the ModelTable.
 
+    The delete is conditional on the model existing, so a model that is already gone, even if a
+    stale copy is still cached, is reported as not deleted.
+
     Args:
         model_id (str): Unique identifier for the model.
 
@@ -88,9 +397,13 @@ def delete_model(model_id: str) -> bool:
         bool: True if the model was deleted, False otherwise.
 
     """
-    existing_model = read_model(model_id)
-    if existing_model is not None:
-        existing_model.delete()
-        return True
-    else:
-        return False
+    if write_behind_queue is not None:
+        write_behind_queue.discard(model_id)
+    try:
+        ModelTable(model_id).delete(condition=ModelTable.model_id.exists())
+    except DeleteError as e:
+        if e.cause_response_code == 'ConditionalCheckFailedException':
+            return False
+        raise
+    record_change(model_id, DELETE)
+    return True
@@ -0,0 +1,234 @@
+import hashlib
+import json
+import os
+import struct
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# A packed artefact is its members' bytes back to back, then a JSON index of the members, then a
+# fixed-size footer holding the index length and PACK_MAGIC. Reading the tail of the object is
+# enough to find every member, and each member is one contiguous byte range.
+PACK_MAGIC = b'MRPACK01'
+_FOOTER = struct.Struct('<Q8s')
+FOOTER_SIZE = _FOOTER.size
+# Bytes read from the end of a pack when looking for its index; larger indexes take a second read.
+INDEX_READ_SIZE = 64 * 1024
+READ_SIZE = 1024 * 1024
+
+
+class PackError(Exception):
+    """
+    Raised when an artefact is not a valid pack.
+    """
+
+
+class PackMember(NamedTuple):
+    """
+    One file in a pack: its relative path, where its bytes are and their SHA-256.
+    """
+    name: str
+    offset: int
+    size: int
+    sha256: str
+
+
+class PackIndex:
+    """
+    The members of a pack, in the order their bytes appear.
+    """
+
+    def __init__(self, members: List[PackMember]):
+        self.members = members
+        self._by_name = {member.name: member for member in members}
+
+    def get(self, name: str) -> Optional[PackMember]:
+        return self._by_name.get(name)
+
+    def __iter__(self) -> Iterator[PackMember]:
+        return iter(self.members)
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def to_bytes(self) -> bytes:
+        index = json.dumps({'members': [member._asdict() for member in self.members]},
+                           separators=(',', ':')).encode()
+        return index + _FOOTER.pack(len(index), PACK_MAGIC)
+
+
+def directory_members(directory: str) -> List[Tuple[str, str]]:
+    """
+    Lists the files under a directory as pack members.
+
+    Args:
+        directory (str): The directory to pack.
+
+    Returns:
+        list: (member name, file path) pairs sorted by name, where names are `/`-separated relative paths.
+    """
+    members = []
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            members.append((os.path.relpath(path, directory).replace(os.sep, '/'), path))
+    return sorted(members)
+
+
+def iter_pack(files: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    """
+    Produces a pack from files without holding more than one read of them in memory.
+
+    Args:
+        files (Iterable[Tuple[str, str]]): (member name, file path) pairs, e.g. from directory_members.
+
+    Yields:
+        bytes: The pack, in order.
+    """
+    members = []
+    offset = 0
+    for name, path in files:
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            while data := f.read(READ_SIZE):
+                digest.update(data)
+                size += len(data)
+                yield data
+        members.append(PackMember(name, offset, size, digest.hexdigest()))
+        offset += size
+    yield PackIndex(members).to_bytes()
+
+
+class ChunkReader:
+    """
+    Read-only file-like object over an iterator of byte chunks, for uploading a stream that is
+    being generated.
+    """
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+
+    def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+
+def read_index(read_range: Callable[[int, int], bytes], size: int) -> PackIndex:
+    """
+    Reads a pack's index from the end of the pack.
+
+    Args:
+        read_range (Callable[[int, int], bytes]): Returns `length` bytes of the pack from `offset`.
+        size (int): The size of the pack in bytes.
+
+    Returns:
+        PackIndex: The index.
+
+    Raises:
+        PackError: If the bytes are not a pack.
+    """
+    if size < FOOTER_SIZE:
+        raise PackError('Artefact is too small to be a pack')
+    tail_size = min(size, INDEX_READ_SIZE)
+    tail = read_range(size - tail_size, tail_size)
+    index_size, magic = _FOOTER.unpack(tail[-FOOTER_SIZE:])
+    if magic != PACK_MAGIC or index_size > size - FOOTER_SIZE:
+        raise PackError('Artefact is not a pack')
+    if index_size + FOOTER_SIZE > tail_size:
+        index = read_range(size - FOOTER_SIZE - index_size, index_size)
+    else:
+        index = tail[-FOOTER_SIZE - index_size:-FOOTER_SIZE]
+    try:
+        members = [PackMember(**member) for member in json.loads(index)['members']]
+    except (ValueError, KeyError, TypeError) as e:
+        raise PackError(f'Pack index is corrupt: {e}')
+    return PackIndex(members)
+
+
+def verify_member(member: PackMember, data: bytes) -> bool:
+    """
+    Checks a member's bytes against the digest in the index.
+    """
+    return len(data) == member.size and hashlib.sha256(data).hexdigest() == member.sha256
+
+
+def member_path(directory: str, name: str) -> str:
+    """
+    Returns the path a member is extracted to, creating its parent directories.
+
+    Args:
+        directory (str): The directory members are extracted under.
+        name (str): The member name.
+
+    Raises:
+        PackError: If the member name would escape the directory.
+    """
+    root = os.path.abspath(directory)
+    path = os.path.normpath(os.path.join(root, name))
+    if not path.startswith(root + os.sep):
+        raise PackError(f'Invalid member name {name!r}')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def extract(index: PackIndex, chunks: Iterable[bytes], directory: str,
+            names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Writes members of a pack to a directory from one sequential pass over the pack.
+
+    Args:
+        index (PackIndex): The pack's index.
+        chunks (Iterable[bytes]): The pack's bytes, in order.
+        directory (str): The directory to write members under, at their relative paths.
+        names (Iterable[str], optional): Members to extract (default: all of them).
+
+    Returns:
+        dict: Extracted member names mapped to their sizes.
+
+    Raises:
+        PackError: If a member's bytes do not match its digest, or a member name escapes the directory.
+    """
+    wanted = set(names) if names is not None else None
+    members = iter(index)
+    member = next(members, None)
+    position = 0
+    extracted = {}
+    f, digest = None, None
+    try:
+        for chunk in chunks:
+            view = memoryview(chunk)
+            while view and member is not None:
+                if f is None and position == member.offset:
+                    if wanted is None or member.name in wanted:
+                        f = open(member_path(directory, member.name), 'wb')
+                    digest = hashlib.sha256()
+                take = min(len(view), member.offset + member.size - position)
+                if f is not None:
+                    f.write(view[:take])
+                digest.update(view[:take])
+                view = view[take:]
+                position += take
+                if position == member.offset + member.size:
+                    if digest.hexdigest() != member.sha256:
+                        raise PackError(f'Member {member.name} does not match its digest')
+                    if f is not None:
+                        f.close()
+                        f = None
+                        extracted[member.name] = member.size
+                    member = next(members, None)
+            if member is None:
+                break
+    finally:
+        if f is not None:
+            f.close()
+    if member is not None:
+        raise PackError('Pack ended before its last member')
+    return extracted
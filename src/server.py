@@ -1,21 +1,46 @@
-from typing import Dict, Union
-from datetime import datetime
+import hashlib
+import json
+import os
+from typing import Dict, Optional, Union
 
-import boto3
-from fastapi import FastAPI, File, HTTPException, Depends, UploadFile
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, File, HTTPException, Depends, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from pydantic import BaseModel
 import uvicorn 
 
-from operations import create_model, read_model, update_model, delete_model
+from admission import AdmissionMiddleware, admission_from_config
+from artefact_fetcher import ArtefactFetcher, FlightCancelled, FlightResponse
+from changefeed import ARTEFACT, DELETE, ChangeEvent, ChangeFeedConsumer, DynamoChangeLog
+from checksums import ArtefactIntegrityError
+from ids import generate_model_id
+from local_artefacts import (LocalArtefactResponse, artefact_cache_dir, artefact_cache_max_bytes, evict_local_artefact,
+                             local_artefact_path)
+from models import ModelTable
+from operations import (create_model, read_model, update_model, delete_model, enable_change_log,
+                        enable_write_behind, disable_write_behind, enable_hedged_reads, disable_hedged_reads,
+                        invalidate_cached_model)
+from packing import PackError
+from storage import (ModelNotFoundError, evict_cached_artefact, local_artefact_file, read_pack_index,
+                     read_pack_member, read_tensor_index, read_tensor_with_info, store_artefact_fileobj,
+                     stream_artefact)
+from tensors import TensorError
+from warmpool import WarmPool
 
 
 app = FastAPI()
+app.add_middleware(AdmissionMiddleware, **admission_from_config(os.environ))
 security = HTTPBasic()
 
-s3 = boto3.resource('s3')
-bucket_name = 'my-model-bucket'
+# Coalesces concurrent artefact downloads into one storage fetch each, when there is a cache to fetch into.
+artefact_fetcher = (ArtefactFetcher(artefact_cache_dir, artefact_cache_max_bytes)
+                    if artefact_cache_dir is not None else None)
+
+# Tails the change log when MODEL_REGISTRY_CHANGE_LOG is set, so changes made elsewhere reach this worker.
+change_feed_consumer = None
+
+# Keeps connections to DynamoDB open when MODEL_REGISTRY_DYNAMODB_WARM_CONNECTIONS is set.
+warm_pool = None
 
 
 class ModelCreateRequest(BaseModel):
@@ -36,6 +61,123 @@ class ModelUpdateRequest(BaseModel):
     tags: Union[Dict[str, Union[str, int]], None] = None
 
 
+@app.on_event("startup")
+def start_write_behind():
+    """
+    Enables write-behind metadata updates when MODEL_REGISTRY_WRITE_BEHIND_INTERVAL is set.
+    """
+    flush_interval = os.environ.get('MODEL_REGISTRY_WRITE_BEHIND_INTERVAL')
+    if flush_interval:
+        enable_write_behind(flush_interval=float(flush_interval))
+
+
+@app.on_event("shutdown")
+def stop_write_behind():
+    """
+    Drains any buffered metadata updates before the server exits.
+    """
+    disable_write_behind()
+
+
+@app.on_event("startup")
+def start_warm_pool():
+    """
+    Keeps MODEL_REGISTRY_DYNAMODB_WARM_CONNECTIONS connections to DynamoDB open, when it is set.
+    """
+    global warm_pool
+    connections = os.environ.get('MODEL_REGISTRY_DYNAMODB_WARM_CONNECTIONS')
+    if connections:
+        warm_pool = WarmPool(ModelTable, connections=int(connections),
+                             interval=float(os.environ.get('MODEL_REGISTRY_DYNAMODB_WARM_INTERVAL', 30)))
+        warm_pool.start()
+
+
+@app.on_event("shutdown")
+def stop_warm_pool():
+    """
+    Stops keeping DynamoDB connections warm.
+    """
+    if warm_pool is not None:
+        warm_pool.close()
+
+
+@app.on_event("startup")
+def start_hedged_reads():
+    """
+    Hedges metadata reads slower than the MODEL_REGISTRY_HEDGE_PERCENTILE percentile, when it is set.
+    """
+    percentile = os.environ.get('MODEL_REGISTRY_HEDGE_PERCENTILE')
+    if percentile:
+        enable_hedged_reads(percentile=float(percentile),
+                            budget=float(os.environ.get('MODEL_REGISTRY_HEDGE_BUDGET', 0.05)))
+
+
+@app.on_event("shutdown")
+def stop_hedged_reads():
+    """
+    Stops hedging metadata reads and logs how many were hedged.
+    """
+    disable_hedged_reads()
+
+
+def forget_cached_artefact(model_id: str):
+    """
+    Drops every locally cached copy of a model's artefact and cancels any fetch of it in progress.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+    """
+    if artefact_fetcher is not None:
+        artefact_fetcher.cancel(model_id)
+    evict_local_artefact(model_id)
+    evict_cached_artefact(model_id)
+
+
+def invalidate_cached_artefact(event: ChangeEvent):
+    """
+    Drops the locally cached copy of an artefact that was replaced or whose model was deleted.
+
+    Args:
+        event (ChangeEvent): The change feed event.
+    """
+    if event.operation in (ARTEFACT, DELETE):
+        forget_cached_artefact(event.model_id)
+
+
+def invalidate_cached_metadata(event: ChangeEvent):
+    """
+    Drops the cached metadata of a model that was changed elsewhere.
+
+    Args:
+        event (ChangeEvent): The change feed event.
+    """
+    invalidate_cached_model(event.model_id)
+
+
+@app.on_event("startup")
+def start_change_feed():
+    """
+    Records every mutation in the change log and follows it when MODEL_REGISTRY_CHANGE_LOG is set.
+    """
+    global change_feed_consumer
+    if os.environ.get('MODEL_REGISTRY_CHANGE_LOG'):
+        change_log = DynamoChangeLog()
+        enable_change_log(change_log)
+        change_feed_consumer = ChangeFeedConsumer(change_log)
+        change_feed_consumer.subscribe(invalidate_cached_artefact)
+        change_feed_consumer.subscribe(invalidate_cached_metadata)
+        change_feed_consumer.start()
+
+
+@app.on_event("shutdown")
+def stop_change_feed():
+    """
+    Stops following the change log.
+    """
+    if change_feed_consumer is not None:
+        change_feed_consumer.stop()
+
+
 def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
     """
     Authenticates the user based on the provided HTTPBasic credentials.
@@ -57,6 +199,19 @@ def authenticate_user(credentials: HTTPBasicCredentials = Depends(security)):
         )
 
 
+def model_etag(model: ModelTable) -> str:
+    """
+    Returns an ETag for a model's metadata that changes whenever any attribute does.
+
+    Args:
+        model (ModelTable): The model.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return '"' + hashlib.sha256(json.dumps(model.serialize(), sort_keys=True).encode()).hexdigest()[:32] + '"'
+
+
 @app.post("/models")
 def create_new_model(request: ModelCreateRequest, credentials: HTTPBasicCredentials = Depends(security)):
     """
@@ -67,22 +222,31 @@ def create_new_model(request: ModelCreateRequest, credentials: HTTPBasicCredenti
         credentials (HTTPBasicCredentials, optional): The HTTPBasic credentials to use (default: Depends(security)).
 
     Returns:
-        dict: Dictionary representation of the created model.
+        dict: Dictionary representation of the created model, otherwise raises an HTTPException if the
+            generated ID is already taken.
 
     """
     authenticate_user(credentials)
-    new_model = create_model(model_id=str(datetime.now().timestamp()), name=request.name,
+    new_model = create_model(model_id=generate_model_id(), name=request.name,
                              description=request.description, tags=request.tags)
+    if new_model is None:
+        raise HTTPException(status_code=409, detail="Model ID already exists")
     return new_model.attribute_values
 
 
 @app.get("/models/{model_id}")
-def read_model_by_id(model_id: str, credentials: HTTPBasicCredentials = Depends(security)):
+def read_model_by_id(model_id: str, request: Request, response: Response,
+                     credentials: HTTPBasicCredentials = Depends(security)):
     """
     Reads a model from the ModelTable.
 
+    The response carries an ETag. A request whose If-None-Match header holds the current ETag is
+    answered 304 Not Modified without a body, so clients can cache metadata and revalidate it cheaply.
+
     Args:
         model_id (str): Unique identifier for the model.
+        request (Request): The incoming request, for its If-None-Match header.
+        response (Response): The outgoing response, for its ETag header.
         credentials (HTTPBasicCredentials, optional): The HTTPBasic credentials to use (default: Depends(security)).
 
     Returns:
@@ -93,8 +257,11 @@ def read_model_by_id(model_id: str, credentials: HTTPBasicCredentials = Depends(
     model = read_model(model_id)
     if model is None:
         raise HTTPException(status_code=404, detail="Model not found")
-    else:
-        return model.attribute_values
+    etag = model_etag(model)
+    if etag in (tag.strip() for tag in request.headers.get('if-none-match', '').split(',')):
+        return Response(status_code=304, headers={'ETag': etag})
+    response.headers['ETag'] = etag
+    return model.attribute_values
 
 
 @app.put("/models/{model_id}")
@@ -113,9 +280,6 @@ def update_model_by_id(model_id: str, request: ModelUpdateRequest,
 
     """
     authenticate_user(credentials)
-    model = read_model(model_id)
-    if model is None:
-        raise HTTPException(status_code=404, detail="Model not found")
 
     # Only update fields that are provided in the request
     updated_fields = {}
@@ -127,7 +291,9 @@ def update_model_by_id(model_id: str, request: ModelUpdateRequest,
         updated_fields['tags'] = request.tags
 
     # Perform the update and return the updated model
-    updated_model = update_model(model_id, updated_fields)
+    updated_model = update_model(model_id, **updated_fields)
+    if updated_model is None:
+        raise HTTPException(status_code=404, detail="Model not found")
     return updated_model.attribute_values
 
 
@@ -146,41 +312,240 @@ def delete_model_by_id(model_id: str, credentials: HTTPBasicCredentials = Depend
     """
     authenticate_user(credentials)
     model = read_model(model_id)
-    if model is None:
+    # The read may come from the metadata cache; the conditional delete is what decides whether the model existed.
+    if model is None or not delete_model(model_id):
         raise HTTPException(status_code=404, detail="Model not found")
-    else:
-        delete_model(model_id)
-        return model.attribute_values
+    forget_cached_artefact(model_id)
+    return model.attribute_values
 
 
 @app.post("/models/{model_id}/artefact")
-async def store_artefact(model_id: str, artefact: UploadFile = File(...)):
+def store_artefact(model_id: str, artefact: UploadFile = File(...)):
     """
-    Uploads a model artefact file to S3.
+    Uploads a model artefact file to storage.
 
     Args:
         model_id (str): The ID of the model the artefact belongs to.
         artefact (UploadFile): The uploaded artefact file.
+
+    Returns:
+        dict: A confirmation message and the artefact checksums, otherwise raises an HTTPException if the
+            model does not exist or the artefact was corrupted in transit to storage.
     """
     key = f'{model_id}/artefact'
-    store_artefact(s3, bucket_name, key, artefact.file)
-    return {"message": f"Artefact {key} uploaded successfully"}
+    try:
+        checksums = store_artefact_fileobj(model_id, artefact.file)
+    except ModelNotFoundError:
+        raise HTTPException(status_code=404, detail="Model not found")
+    except ArtefactIntegrityError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    forget_cached_artefact(model_id)
+    return {"message": f"Artefact {key} uploaded successfully", "checksums": checksums}
+
+
+def _local_artefact_response(model_id: str, sha256: Optional[str],
+                             range_header: Optional[str]) -> Optional[LocalArtefactResponse]:
+    """
+    Opens the local copy of a model's artefact, from the cache directory or the storage backend's disk.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        sha256 (str, optional): The artefact's recorded SHA-256, which names its version in the cache directory.
+        range_header (str, optional): The request's Range header, if any.
+
+    Returns:
+        LocalArtefactResponse or None: The response serving the open file, or None if there is no local
+            copy, including one removed between being found and being opened.
+    """
+    path = local_artefact_path(model_id, sha256)
+    if path is not None:
+        try:
+            response = LocalArtefactResponse(path, range_header)
+        except FileNotFoundError:
+            pass
+        else:
+            if artefact_fetcher is not None:
+                artefact_fetcher.touch(model_id, sha256)
+            return response
+    path = local_artefact_file(model_id)
+    if path is not None:
+        try:
+            return LocalArtefactResponse(path, range_header)
+        except FileNotFoundError:
+            pass
+    return None
 
 
 @app.get("/models/{model_id}/artefact")
-async def retrieve_artefact(model_id: str):
+def retrieve_artefact(model_id: str, request: Request):
     """
-    Downloads a model artefact file from S3.
+    Downloads a model artefact file from storage.
+
+    If the server has a local copy of the artefact in MODEL_REGISTRY_ARTEFACT_CACHE_DIR, or the storage
+    backend keeps it on local disk, it is served straight from disk, with support for byte-range
+    requests. Otherwise the artefact is streamed from storage and verified against its recorded
+    checksums as it streams; on a mismatch the connection is aborted before the last byte so the
+    client never sees a complete transfer. With a cache directory configured, concurrent requests
+    share a single fetch from storage, which also fills the cache. Cached copies are looked up by
+    the SHA-256 recorded on the model, so a replaced artefact is never served from an older copy;
+    artefacts uploaded before checksums were recorded bypass the cache. Downloads served from disk or
+    from a shared fetch give up their artefact admission slot once they start, since they are sent
+    from the event loop rather than a worker thread.
 
     Args:
         model_id (str): The ID of the model the artefact belongs to.
+        request (Request): The incoming request, for its Range header.
 
     Returns:
-        The downloaded artefact file.
+        The downloaded artefact file, otherwise raises an HTTPException if the model has no artefact.
     """
-    key = f'{model_id}/artefact'
-    artefact_file = retrieve_artefact(s3, bucket_name, key)
-    return StreamingResponse(iter(artefact_file.read()), media_type='application/octet-stream')
+    model = read_model(model_id)
+    if model is None:
+        raise HTTPException(status_code=404, detail="Model artefact not found")
+    checksums = model.artefact_checksums or {}
+    response = _local_artefact_response(model_id, checksums.get('sha256'), request.headers.get('range'))
+    if response is not None:
+        return response
+
+    if artefact_fetcher is not None and 'sha256' in checksums:
+        try:
+            flight = artefact_fetcher.fetch(model_id, checksums)
+        except FlightCancelled as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        if flight is None:
+            raise HTTPException(status_code=404, detail="Model artefact not found")
+        return FlightResponse(flight)
+
+    stream = stream_artefact(model_id)
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Model artefact not found")
+    return StreamingResponse(iter(stream), media_type='application/octet-stream',
+                             headers={'Content-Length': str(stream.size)})
+
+
+@app.get("/models/{model_id}/artefact/members")
+def list_artefact_members(model_id: str):
+    """
+    Lists the members of a packed model artefact.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+
+    Returns:
+        dict: The name, size and SHA-256 of every member, otherwise raises an HTTPException if the model
+            has no artefact or the artefact is not packed.
+    """
+    try:
+        index = read_pack_index(model_id)
+    except PackError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if index is None:
+        raise HTTPException(status_code=404, detail="Model artefact not found")
+    return {"members": [{"name": member.name, "size": member.size, "sha256": member.sha256} for member in index]}
+
+
+@app.get("/models/{model_id}/artefact/members/{name:path}")
+def retrieve_artefact_member(model_id: str, name: str):
+    """
+    Downloads one member of a packed model artefact with a single ranged read of the artefact.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        name (str): The member's path within the pack.
+
+    Returns:
+        The member's contents, otherwise raises an HTTPException if there is no such member, the artefact
+            is not packed or the member does not match its digest.
+    """
+    try:
+        data = read_pack_member(model_id, name)
+    except PackError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ArtefactIntegrityError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if data is None:
+        raise HTTPException(status_code=404, detail="Artefact member not found")
+    return Response(data, media_type='application/octet-stream')
+
+
+@app.get("/models/{model_id}/artefact/tensors")
+def list_artefact_tensors(model_id: str):
+    """
+    Lists the tensors of a safetensors model artefact, from the index recorded when it was uploaded.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+
+    Returns:
+        dict: The artefact's metadata, and the name, dtype, shape, byte offset and size of every tensor,
+            otherwise raises an HTTPException if the model has no artefact or it is not a safetensors file.
+    """
+    try:
+        index = read_tensor_index(model_id)
+    except TensorError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if index is None:
+        raise HTTPException(status_code=404, detail="Model artefact not found")
+    return {"metadata": index.metadata,
+            "tensors": [{"name": tensor.name, "dtype": tensor.dtype, "shape": tensor.shape,
+                         "offset": tensor.offset, "size": tensor.size} for tensor in index]}
+
+
+@app.get("/models/{model_id}/artefact/tensors/{name:path}")
+def retrieve_artefact_tensor(model_id: str, name: str):
+    """
+    Downloads the raw bytes of one tensor of a safetensors model artefact with a single ranged read.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        name (str): The tensor's name.
+
+    Returns:
+        The tensor's bytes, with its dtype and shape in the X-Tensor-Dtype and X-Tensor-Shape headers,
+            otherwise raises an HTTPException if there is no such tensor, the artefact is not a safetensors
+            file or the tensor does not match its checksum.
+    """
+    try:
+        read = read_tensor_with_info(model_id, name)
+    except TensorError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ArtefactIntegrityError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    if read is None:
+        raise HTTPException(status_code=404, detail="Artefact tensor not found")
+    tensor, data = read
+    return Response(data, media_type='application/octet-stream',
+                    headers={'X-Tensor-Dtype': tensor.dtype, 'X-Tensor-Shape': ','.join(map(str, tensor.shape))})
+
+
+@app.post("/models/{model_id}/prefetch", status_code=202)
+def prefetch_artefact(model_id: str, credentials: HTTPBasicCredentials = Depends(security)):
+    """
+    Starts loading a model artefact into the server's local cache ahead of a rollout.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        credentials (HTTPBasicCredentials, optional): The HTTPBasic credentials to use (default: Depends(security)).
+
+    Returns:
+        dict: A confirmation message, otherwise raises an HTTPException if there is no cache or no artefact
+            with recorded checksums to cache it by.
+
+    """
+    authenticate_user(credentials)
+    if artefact_fetcher is None:
+        raise HTTPException(status_code=501, detail="Artefact cache is not configured")
+    model = read_model(model_id)
+    checksums = (model.artefact_checksums if model is not None else None) or {}
+    if local_artefact_path(model_id, checksums.get('sha256')) is not None:
+        return {"message": f"Artefact {model_id}/artefact is already cached"}
+    try:
+        flight = artefact_fetcher.fetch(model_id, checksums)
+    except FlightCancelled as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if flight is None:
+        raise HTTPException(status_code=404, detail="Model artefact not found")
+    return {"message": f"Artefact {model_id}/artefact is being prefetched"}
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,212 @@
+import hashlib
+import multiprocessing
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+# Entries per bucket. A key can only live in its bucket, so a lookup reads at most this many slots.
+WAYS = 8
+# Locks serializing writers; bucket i is guarded by lock i % LOCK_STRIPES.
+LOCK_STRIPES = 64
+# Worker processes that can keep hit and miss counters in the shared segment.
+MAX_WORKERS = 256
+# Attempts at reading a slot that a writer keeps changing before giving up and counting a miss.
+READ_ATTEMPTS = 3
+
+_COUNTERS = struct.Struct(f'<{MAX_WORKERS * 2}Q')
+_GENERATION = struct.Struct('<Q')
+# Sequence (odd while a writer is in the slot), key hash, expiry time, key length, value length, value CRC32.
+_SLOT_HEADER = struct.Struct('<QQdHII')
+_SEQUENCE = struct.Struct('<Q')
+
+
+def _key_hash(key: str) -> int:
+    # Python's hash() is salted per process, so it cannot place keys for other processes.
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+
+class SharedMetadataCache:
+    """
+    Fixed-size cache of serialized model metadata in shared memory, used by every worker process
+    forked from the process that created it.
+
+    The segment is a set-associative hash table: each key hashes to a bucket of WAYS fixed-size
+    slots, so memory is fixed at creation regardless of the number of workers. Reads take no lock:
+    a writer makes a slot's sequence number odd while it is in the slot, and readers retry when
+    the sequence changed under them. Writers lock the bucket.
+
+    Each bucket has a generation that every invalidation increments. `get` returns the generation
+    it saw, and a `put` made with an older generation is dropped. A worker that read a model from
+    DynamoDB just before another worker changed it therefore cannot put the old version back
+    after the change was invalidated.
+    """
+
+    def __init__(self, size_bytes: int, slot_size: int = 1024, ttl: float = 30.0):
+        """
+        Args:
+            size_bytes (int): Size of the shared segment.
+            slot_size (int, optional): Bytes per entry, including its key and header; larger values are not
+                cached (default: 1024).
+            ttl (float, optional): Seconds an entry is served before it is read again from DynamoDB (default: 30).
+
+        Raises:
+            ValueError: If the segment cannot hold at least one bucket.
+        """
+        if slot_size <= _SLOT_HEADER.size:
+            raise ValueError(f"slot_size must be larger than {_SLOT_HEADER.size}, got {slot_size}")
+        self.slot_size = slot_size
+        self.ttl = ttl
+        self._bucket_size = _GENERATION.size + WAYS * slot_size
+        self.buckets = (size_bytes - _COUNTERS.size) // self._bucket_size
+        if self.buckets < 1:
+            raise ValueError(f"size_bytes must be at least {_COUNTERS.size + self._bucket_size}, got {size_bytes}")
+        self._shm = shared_memory.SharedMemory(create=True, size=_COUNTERS.size + self.buckets * self._bucket_size)
+        self._buf = self._shm.buf
+        # Locks created before forking are shared with the workers.
+        context = multiprocessing.get_context('fork')
+        self._locks = [context.Lock() for _ in range(LOCK_STRIPES)]
+        self.worker = 0
+        self.oversized = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._shm.size
+
+    def _bucket(self, key_hash: int) -> Tuple[int, Any]:
+        bucket = key_hash % self.buckets
+        return _COUNTERS.size + bucket * self._bucket_size, self._locks[bucket % LOCK_STRIPES]
+
+    def _count(self, index: int) -> None:
+        offset = (self.worker * 2 + index) * 8
+        count, = _SEQUENCE.unpack_from(self._buf, offset)
+        _SEQUENCE.pack_into(self._buf, offset, count + 1)
+
+    def _read_slot(self, slot: int, key_hash: int, encoded: bytes) -> Optional[bytes]:
+        buf = self._buf
+        for _ in range(READ_ATTEMPTS):
+            sequence, slot_hash, expires, key_size, value_size, crc = _SLOT_HEADER.unpack_from(buf, slot)
+            if sequence & 1:
+                continue
+            if slot_hash != key_hash:
+                return None
+            start = slot + _SLOT_HEADER.size
+            key = bytes(buf[start:start + key_size])
+            value = bytes(buf[start + key_size:start + key_size + value_size])
+            if _SEQUENCE.unpack_from(buf, slot)[0] != sequence:
+                continue
+            if key != encoded or expires < time.time() or zlib.crc32(value) != crc:
+                return None
+            return value
+        return None
+
+    def get(self, key: str) -> Tuple[Optional[bytes], int]:
+        """
+        Looks up a key.
+
+        Args:
+            key (str): The key, e.g. a model ID.
+
+        Returns:
+            tuple: The value, or None on a miss, and the bucket generation to pass to `put` when filling a miss.
+        """
+        key_hash = _key_hash(key)
+        bucket, _ = self._bucket(key_hash)
+        generation, = _GENERATION.unpack_from(self._buf, bucket)
+        encoded = key.encode()
+        for way in range(WAYS):
+            value = self._read_slot(bucket + _GENERATION.size + way * self.slot_size, key_hash, encoded)
+            if value is not None:
+                self._count(0)
+                return value, generation
+        self._count(1)
+        return None, generation
+
+    def put(self, key: str, value: bytes, generation: int) -> bool:
+        """
+        Stores a value, replacing the entry for the same key or else the entry closest to expiry in its bucket.
+
+        Args:
+            key (str): The key.
+            value (bytes): The value.
+            generation (int): The generation returned by the `get` that missed.
+
+        Returns:
+            bool: True if the value was stored, False if it is too large or the key was invalidated since the `get`.
+        """
+        encoded = key.encode()
+        if _SLOT_HEADER.size + len(encoded) + len(value) > self.slot_size:
+            self.oversized += 1
+            return False
+        key_hash = _key_hash(key)
+        bucket, lock = self._bucket(key_hash)
+        buf = self._buf
+        with lock:
+            if _GENERATION.unpack_from(buf, bucket)[0] != generation:
+                return False
+            now = time.time()
+            victim, victim_expires = None, None
+            for way in range(WAYS):
+                slot = bucket + _GENERATION.size + way * self.slot_size
+                _, slot_hash, expires, key_size, _, _ = _SLOT_HEADER.unpack_from(buf, slot)
+                start = slot + _SLOT_HEADER.size
+                if slot_hash == key_hash and bytes(buf[start:start + key_size]) == encoded:
+                    victim = slot
+                    break
+                if slot_hash == 0 or expires < now:
+                    expires = 0.0
+                if victim is None or expires < victim_expires:
+                    victim, victim_expires = slot, expires
+            sequence, = _SEQUENCE.unpack_from(buf, victim)
+            _SEQUENCE.pack_into(buf, victim, sequence + 1)
+            start = victim + _SLOT_HEADER.size
+            buf[start:start + len(encoded)] = encoded
+            buf[start + len(encoded):start + len(encoded) + len(value)] = value
+            _SLOT_HEADER.pack_into(buf, victim, sequence + 2, key_hash, now + self.ttl, len(encoded), len(value),
+                                   zlib.crc32(value))
+        return True
+
+    def invalidate(self, key: str) -> None:
+        """
+        Removes a key and stops any `put` of it that started from an earlier `get` from taking effect.
+
+        Args:
+            key (str): The key.
+        """
+        key_hash = _key_hash(key)
+        bucket, lock = self._bucket(key_hash)
+        buf = self._buf
+        encoded = key.encode()
+        with lock:
+            generation, = _GENERATION.unpack_from(buf, bucket)
+            _GENERATION.pack_into(buf, bucket, generation + 1)
+            for way in range(WAYS):
+                slot = bucket + _GENERATION.size + way * self.slot_size
+                sequence, slot_hash, _, key_size, _, _ = _SLOT_HEADER.unpack_from(buf, slot)
+                start = slot + _SLOT_HEADER.size
+                if slot_hash == key_hash and bytes(buf[start:start + key_size]) == encoded:
+                    _SEQUENCE.pack_into(buf, slot, sequence + 1)
+                    _SLOT_HEADER.pack_into(buf, slot, sequence + 2, 0, 0.0, 0, 0, 0)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hits and misses of all workers together, the hit rate, and the cache's size.
+        """
+        counters = _COUNTERS.unpack_from(self._buf, 0)
+        hits, misses = sum(counters[0::2]), sum(counters[1::2])
+        lookups = hits + misses
+        return {'hits': hits, 'misses': misses, 'hit_rate': hits / lookups if lookups else 0.0,
+                'entries': self.buckets * WAYS, 'size_bytes': self.size_bytes}
+
+    def close(self, unlink: bool = False) -> None:
+        """
+        Detaches this process from the segment.
+
+        Args:
+            unlink (bool, optional): Also free the segment; only the process that created it should (default: False).
+        """
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
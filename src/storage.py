@@ -1,32 +1,463 @@
-import boto3
+import io
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Tuple
 
-s3 = boto3.resource('s3')
-bucket_name = 'my-model-bucket'
+from checksums import PART_SIZE, ArtefactDigest, ArtefactIntegrityError, HashingReader
+from operations import read_model, record_artefact_checksums
+from packing import (ChunkReader, PackIndex, directory_members, extract, iter_pack, member_path, read_index,
+                     verify_member)
+from storage_backends import ObjectInfo, StaleObjectError, StorageBackend, backend_from_config
+from tensors import TensorIndex, TensorIndexer, TensorInfo, read_header, verify_tensor
+
+# Where artefacts are stored, selected by MODEL_REGISTRY_STORAGE (S3 unless configured otherwise).
+backend: StorageBackend = backend_from_config(os.environ)
+
+# Indexes of recently read packed and safetensors artefacts, so reading a member or a tensor usually
+# takes a single ranged read. Each cache holds up to MAX_CACHED_INDEXES artefacts.
+MAX_CACHED_INDEXES = 64
+_pack_indexes: 'OrderedDict[str, Tuple[ObjectInfo, PackIndex]]' = OrderedDict()
+_tensor_indexes: 'OrderedDict[str, Tuple[ObjectInfo, TensorIndex]]' = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+class ModelNotFoundError(Exception):
+    """
+    Raised when an artefact is uploaded for a model that does not exist.
+    """
+
+
+def _artefact_key(model_id: str) -> str:
+    return f'{model_id}/artefact'
+
+
+def _tensor_index_key(model_id: str) -> str:
+    return f'{model_id}/artefact.tensors'
+
+
+def _forget_indexes(key: str) -> None:
+    with _indexes_lock:
+        _pack_indexes.pop(key, None)
+        _tensor_indexes.pop(key, None)
+
+
+def store_artefact_fileobj(model_id: str, fileobj: BinaryIO) -> Dict[str, Any]:
+    """
+    Uploads a model artefact from a file-like object to storage, checksumming it as it streams.
+
+    The checksums are computed in the same pass as the upload, compared against the size and ETag
+    the backend reports and recorded on the model's ModelTable item. Safetensors artefacts are
+    indexed in the same pass too, and the index is stored next to the artefact.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        fileobj (BinaryIO): The artefact contents.
+
+    Returns:
+        dict: The artefact checksums.
+
+    Raises:
+        ArtefactIntegrityError: If the backend reports a different size or ETag than was computed. The object is deleted.
+        ModelNotFoundError: If the model does not exist, e.g. because it was deleted during the upload. The
+            object is deleted.
+    """
+    key = _artefact_key(model_id)
+    reader = HashingReader(fileobj, ArtefactDigest())
+    indexer = TensorIndexer()
+    stored = backend.put(key, HashingReader(reader, indexer))
+
+    checksums = reader.digest.as_dict()
+    if stored.size != checksums['size'] or stored.etag not in (None, checksums['etag']):
+        backend.delete(key)
+        raise ArtefactIntegrityError(f"Artefact {key} was corrupted in transit: expected {checksums['size']} "
+                                     f"bytes with ETag {checksums['etag']}, storage reported {stored.size} "
+                                     f"bytes with ETag {stored.etag}")
+    tensor_index = indexer.index(stored.size)
+    if tensor_index is not None:
+        backend.put(_tensor_index_key(model_id), io.BytesIO(tensor_index.to_bytes(stored.size)))
+    else:
+        backend.delete(_tensor_index_key(model_id))
+    _forget_indexes(key)
+    if not record_artefact_checksums(model_id, checksums):
+        backend.delete(key)
+        backend.delete(_tensor_index_key(model_id))
+        raise ModelNotFoundError(f"Model {model_id} does not exist, artefact {key} was discarded")
+    return checksums
 
 
 def store_artefact(model_id: str, artefact_file_path: str) -> str:
     """
-    Uploads a model artefact file to S3.
+    Uploads a model artefact file to storage.
 
     Args:
         model_id (str): The ID of the model the artefact belongs to.
         artefact_file_path (str): The local file path of the artefact file.
 
     Returns:
-        str: The S3 key of the uploaded artefact file.
+        str: The storage key of the uploaded artefact file.
+    """
+    with open(artefact_file_path, 'rb') as f:
+        store_artefact_fileobj(model_id, f)
+    return _artefact_key(model_id)
+
+
+class ArtefactStream:
+    """
+    Iterable over the chunks of an artefact being downloaded, with its total size known up front.
     """
-    key = f'{model_id}/artefact'
-    s3.Object(bucket_name, key).upload_file(artefact_file_path)
-    return key
+
+    def __init__(self, size: int, chunks: Iterator[bytes]):
+        self.size = size
+        self._chunks = chunks
+
+    def __iter__(self) -> Iterator[bytes]:
+        return self._chunks
+
+
+def _expected_checksums(model_id: str, stored: ObjectInfo) -> Dict[str, Any]:
+    model = read_model(model_id)
+    if model is not None and model.artefact_checksums:
+        return model.artefact_checksums
+    # Artefacts uploaded before checksums were recorded can still be checked against their ETag.
+    return {'size': stored.size, 'etag': stored.etag, 'part_size': PART_SIZE}
+
+
+def stream_artefact(model_id: str, workers: int = 4, range_size: int = PART_SIZE,
+                    expected: Optional[Dict[str, Any]] = None) -> Optional[ArtefactStream]:
+    """
+    Streams a model artefact from storage, verifying its checksums as the bytes pass through.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        workers (int, optional): Number of ranges the backend may fetch concurrently (default: 4).
+        range_size (int, optional): Size of each range in bytes (default: PART_SIZE).
+        expected (dict, optional): The checksums the artefact must match (default: those recorded on the model).
+
+    Returns:
+        ArtefactStream or None: The artefact contents, or None if the model has no artefact. Iterating it
+            raises ArtefactIntegrityError after the last chunk if the checksums do not match, and
+            StaleObjectError if the artefact is replaced by one of another size or part way through.
+    """
+    key = _artefact_key(model_id)
+    stored = backend.head(key)
+    if stored is None:
+        return None
+
+    def chunks() -> Iterator[bytes]:
+        info = stored
+        for attempt in range(2):
+            checksums = expected or _expected_checksums(model_id, info)
+            digest = ArtefactDigest(part_size=checksums.get('part_size', PART_SIZE))
+            try:
+                for data in backend.iter_chunks(key, info, workers, range_size):
+                    digest.update(data)
+                    yield data
+            except StaleObjectError:
+                # An artefact replaced between the head and the first read is read again from a fresh head,
+                # provided nothing has been yielded yet and it still has the size announced up front.
+                info = backend.head(key) if attempt == 0 and digest.size == 0 else None
+                if info is None or info.size != stored.size:
+                    raise
+                continue
+            digest.verify(checksums)
+            return
+
+    return ArtefactStream(stored.size, chunks())
+
+
+def local_artefact_file(model_id: str) -> Optional[str]:
+    """
+    Returns the path of a model artefact when the storage backend holds it on local disk.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+
+    Returns:
+        str or None: The path, or None if the artefact is not on local disk.
+    """
+    return backend.local_path(_artefact_key(model_id))
+
+
+def evict_cached_artefact(model_id: str) -> None:
+    """
+    Drops any copy of a model artefact the storage backend caches, e.g. because it was replaced elsewhere.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+    """
+    backend.evict(_artefact_key(model_id))
+    _forget_indexes(_artefact_key(model_id))
 
 
 def retrieve_artefact(model_id: str, local_file_path: str) -> None:
     """
-    Downloads a model artefact file from S3.
+    Downloads a model artefact file from storage.
 
     Args:
         model_id (str): The ID of the model the artefact belongs to.
         local_file_path (str): The local file path to download the artefact file to.
+
+    Raises:
+        FileNotFoundError: If the model has no artefact.
+        ArtefactIntegrityError: If the downloaded bytes do not match the recorded checksums. The partial file is removed.
+    """
+    stream = stream_artefact(model_id)
+    if stream is None:
+        raise FileNotFoundError(f'Artefact not found for model {model_id}')
+    try:
+        with open(local_file_path, 'wb') as f:
+            for data in stream:
+                f.write(data)
+    except Exception:
+        os.remove(local_file_path)
+        raise
+
+
+def verify_artefact(model_id: str, workers: int = 8, range_size: int = PART_SIZE) -> Dict[str, Any]:
+    """
+    Checks a stored artefact against its recorded checksums without writing it anywhere.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        workers (int, optional): Number of ranges the backend may fetch concurrently (default: 8).
+        range_size (int, optional): Size of each range in bytes (default: PART_SIZE).
+
+    Returns:
+        dict: The checksums computed from the stored bytes.
+
+    Raises:
+        FileNotFoundError: If the model has no artefact.
+        ArtefactIntegrityError: If the stored bytes do not match the recorded checksums.
+    """
+    key = _artefact_key(model_id)
+    stored = backend.head(key)
+    if stored is None:
+        raise FileNotFoundError(f'Artefact not found for model {model_id}')
+    expected = _expected_checksums(model_id, stored)
+    digest = ArtefactDigest(part_size=expected.get('part_size', PART_SIZE))
+    for data in backend.iter_chunks(key, stored, workers, range_size):
+        digest.update(data)
+    digest.verify(expected)
+    return digest.as_dict()
+
+
+def store_packed_artefact(model_id: str, directory: str) -> Dict[str, Any]:
+    """
+    Packs every file under a directory into a single artefact and uploads it, without a temporary file.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        directory (str): The directory to pack. Members are named by their paths relative to it.
+
+    Returns:
+        dict: The checksums of the packed artefact.
+    """
+    return store_artefact_fileobj(model_id, ChunkReader(iter_pack(directory_members(directory))))
+
+
+def _load_index(cache: OrderedDict, model_id: str, read: Callable[[str, ObjectInfo], Any],
+                refresh: bool) -> Optional[Tuple[ObjectInfo, Any]]:
+    key = _artefact_key(model_id)
+    if not refresh:
+        with _indexes_lock:
+            cached = cache.get(key)
+            if cached is not None:
+                cache.move_to_end(key)
+                return cached
+    stored = backend.head(key)
+    if stored is None:
+        with _indexes_lock:
+            cache.pop(key, None)
+        return None
+    index = read(model_id, stored)
+    with _indexes_lock:
+        cache[key] = (stored, index)
+        if len(cache) > MAX_CACHED_INDEXES:
+            cache.popitem(last=False)
+    return stored, index
+
+
+def _read_indexed_range(model_id: str, name: str, load: Callable[..., Optional[Tuple[ObjectInfo, Any]]],
+                        verify: Callable[[Any, bytes], bool]) -> Optional[Tuple[Any, bytes]]:
+    # A cached index that turns out to be stale because the artefact was replaced is refreshed once.
+    # The index entry is returned with the bytes, since the cached index may be gone by the time a caller asks.
+    key = _artefact_key(model_id)
+    entry = None
+    for refresh in (False, True):
+        loaded = load(model_id, refresh=refresh)
+        if loaded is None:
+            return None
+        stored, index = loaded
+        entry = index.get(name)
+        if entry is None:
+            continue
+        try:
+            data = backend.read_range(key, stored, entry.offset, entry.size)
+        except StaleObjectError:
+            continue
+        if verify(entry, data):
+            return entry, data
+    if entry is None:
+        return None
+    raise ArtefactIntegrityError(f"{name} in artefact {key} does not match its checksum")
+
+
+def _read_pack_index(model_id: str, stored: ObjectInfo) -> PackIndex:
+    key = _artefact_key(model_id)
+    return read_index(lambda offset, length: backend.read_range(key, stored, offset, length), stored.size)
+
+
+def _load_pack_index(model_id: str, refresh: bool = False) -> Optional[Tuple[ObjectInfo, PackIndex]]:
+    return _load_index(_pack_indexes, model_id, _read_pack_index, refresh)
+
+
+def read_pack_index(model_id: str) -> Optional[PackIndex]:
+    """
+    Returns the members of a packed artefact, reading only the end of the artefact.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+
+    Returns:
+        PackIndex or None: The index, or None if the model has no artefact.
+
+    Raises:
+        PackError: If the artefact is not packed.
+    """
+    loaded = _load_pack_index(model_id)
+    return loaded[1] if loaded is not None else None
+
+
+def read_pack_member(model_id: str, name: str) -> Optional[bytes]:
+    """
+    Reads one member of a packed artefact with a single ranged read once the pack's index is cached.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        name (str): The member's path within the pack.
+
+    Returns:
+        bytes or None: The member's contents, or None if the model has no artefact or the pack has no such member.
+
+    Raises:
+        PackError: If the artefact is not packed.
+        ArtefactIntegrityError: If the member's bytes do not match the digest in the index.
+    """
+    read = _read_indexed_range(model_id, name, _load_pack_index, verify_member)
+    return read[1] if read is not None else None
+
+
+def unpack_artefact(model_id: str, directory: str, names: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Extracts members of a packed artefact into a directory.
+
+    All members are extracted from one streamed read of the artefact. Named members are read
+    individually with ranged reads, so the rest of the pack is never downloaded.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        directory (str): The directory to extract into.
+        names (Iterable[str], optional): Members to extract (default: all of them).
+
+    Returns:
+        dict: Extracted member names mapped to their sizes.
+
+    Raises:
+        FileNotFoundError: If the model has no artefact or the pack has no member with one of the names.
+        PackError: If the artefact is not packed.
+        ArtefactIntegrityError: If the artefact or a member does not match its checksums.
+    """
+    if names is None:
+        # A cached index could belong to an older version than the one about to be streamed.
+        loaded = _load_pack_index(model_id, refresh=True)
+        stream = stream_artefact(model_id) if loaded is not None else None
+        if stream is None:
+            raise FileNotFoundError(f'Artefact not found for model {model_id}')
+        chunks = iter(stream)
+        extracted = extract(loaded[1], chunks, directory)
+        # Reading past the last member, through the index, checks the whole artefact's checksums.
+        for _ in chunks:
+            pass
+        return extracted
+
+    extracted = {}
+    for name in names:
+        data = read_pack_member(model_id, name)
+        if data is None:
+            raise FileNotFoundError(f'Member {name} not found in artefact of model {model_id}')
+        with open(member_path(directory, name), 'wb') as f:
+            f.write(data)
+        extracted[name] = len(data)
+    return extracted
+
+
+def _read_tensor_index(model_id: str, stored: ObjectInfo) -> TensorIndex:
+    key = _artefact_key(model_id)
+    recorded = backend.head(_tensor_index_key(model_id))
+    if recorded is not None:
+        index = TensorIndex.from_bytes(b''.join(backend.iter_chunks(_tensor_index_key(model_id), recorded)),
+                                       stored.size)
+        if index is not None:
+            return index
+    # Artefacts uploaded before indexes were recorded are indexed from their header, without checksums.
+    return read_header(lambda offset, length: backend.read_range(key, stored, offset, length), stored.size)
+
+
+def _load_tensor_index(model_id: str, refresh: bool = False) -> Optional[Tuple[ObjectInfo, TensorIndex]]:
+    return _load_index(_tensor_indexes, model_id, _read_tensor_index, refresh)
+
+
+def read_tensor_index(model_id: str) -> Optional[TensorIndex]:
+    """
+    Returns the tensors of a safetensors artefact, from the index recorded when it was uploaded.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+
+    Returns:
+        TensorIndex or None: The index, or None if the model has no artefact.
+
+    Raises:
+        TensorError: If the artefact is not a safetensors file.
+    """
+    loaded = _load_tensor_index(model_id)
+    return loaded[1] if loaded is not None else None
+
+
+def read_tensor(model_id: str, name: str) -> Optional[bytes]:
+    """
+    Reads one tensor of a safetensors artefact with a single ranged read once the artefact's index is cached.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        name (str): The tensor's name.
+
+    Returns:
+        bytes or None: The tensor's raw bytes, or None if the model has no artefact or the artefact has no such tensor.
+
+    Raises:
+        TensorError: If the artefact is not a safetensors file.
+        ArtefactIntegrityError: If the tensor's bytes do not match the checksum recorded at upload.
+    """
+    read = read_tensor_with_info(model_id, name)
+    return read[1] if read is not None else None
+
+
+def read_tensor_with_info(model_id: str, name: str) -> Optional[Tuple[TensorInfo, bytes]]:
+    """
+    Reads one tensor of a safetensors artefact along with its entry in the index the read used.
+
+    Args:
+        model_id (str): The ID of the model the artefact belongs to.
+        name (str): The tensor's name.
+
+    Returns:
+        tuple or None: The tensor's dtype, shape and position, and its raw bytes, or None if the model has no
+            artefact or the artefact has no such tensor.
+
+    Raises:
+        TensorError: If the artefact is not a safetensors file.
+        ArtefactIntegrityError: If the tensor's bytes do not match the checksum recorded at upload.
     """
-    key = f'{model_id}/artefact'
-    s3.Object(bucket_name, key).download_file(local_file_path)
+    return _read_indexed_range(model_id, name, _load_tensor_index, verify_tensor)
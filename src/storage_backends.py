@@ -0,0 +1,734 @@
+import abc
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+from checksums import PART_SIZE, ArtefactDigest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET = 'my-model-bucket'
+# Size of each read when copying a file-like object to disk.
+COPY_CHUNK_SIZE = 1024 * 1024
+# Most keys S3 accepts in one DeleteObjects request.
+DELETE_BATCH_SIZE = 1000
+# Promotions waiting behind the running ones before further candidates are skipped until their next read.
+PROMOTION_QUEUE = 16
+
+
+class StaleObjectError(Exception):
+    """
+    Raised when an object changed since the ObjectInfo a read was based on was taken.
+    """
+
+
+class ObjectInfo(NamedTuple):
+    """
+    What a backend knows about a stored object.
+
+    `etag` is the S3-style ETag of the contents when the backend reports one that can be compared
+    with a locally computed ArtefactDigest.etag, otherwise None. `token` identifies this version of
+    the object to the backend that returned it and is passed back to `iter_chunks`.
+    """
+    size: int
+    etag: Optional[str]
+    token: Any
+
+
+class StorageBackend(abc.ABC):
+    """
+    Stores artefacts as opaque objects under string keys.
+
+    Subclasses implement the abstract methods; the others have defaults for backends without
+    multi-object deletes, resumable uploads, local files or caches.
+    """
+
+    @abc.abstractmethod
+    def put(self, key: str, fileobj: BinaryIO) -> ObjectInfo:
+        """
+        Stores an object, replacing any object already stored under the key.
+
+        Args:
+            key (str): The object key.
+            fileobj (BinaryIO): The contents, read once from start to end.
+
+        Returns:
+            ObjectInfo: The stored object as the backend reports it.
+        """
+
+    @abc.abstractmethod
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        """
+        Returns what the backend knows about an object, or None if there is no object under the key.
+
+        Args:
+            key (str): The object key.
+        """
+
+    @abc.abstractmethod
+    def iter_chunks(self, key: str, info: ObjectInfo, workers: int = 4,
+                    chunk_size: int = PART_SIZE) -> Iterator[bytes]:
+        """
+        Reads an object in order.
+
+        Args:
+            key (str): The object key.
+            info (ObjectInfo): The object, as returned by `head`.
+            workers (int, optional): Number of chunks the backend may fetch concurrently (default: 4).
+            chunk_size (int, optional): Size of each chunk in bytes (default: PART_SIZE).
+
+        Raises:
+            StaleObjectError: If the object is no longer the version `info` describes, detected no later
+                than the first chunk.
+        """
+
+    @abc.abstractmethod
+    def read_range(self, key: str, info: ObjectInfo, offset: int, length: int) -> bytes:
+        """
+        Reads one byte range of an object with a single request.
+
+        Args:
+            key (str): The object key.
+            info (ObjectInfo): The object, as returned by `head`.
+            offset (int): The first byte to read.
+            length (int): The number of bytes to read.
+
+        Raises:
+            StaleObjectError: If the object is no longer the version `info` describes.
+        """
+
+    @abc.abstractmethod
+    def delete(self, key: str) -> bool:
+        """
+        Deletes an object.
+
+        Args:
+            key (str): The object key.
+
+        Returns:
+            bool: True if the backend may have held an object under the key.
+        """
+
+    @abc.abstractmethod
+    def list(self, prefix: str = '') -> Iterator[Tuple[str, int]]:
+        """
+        Yields the key and size of every stored object whose key starts with `prefix`.
+
+        Args:
+            prefix (str, optional): Key prefix to filter on (default: all objects).
+        """
+
+    def delete_many(self, keys: List[str]) -> int:
+        """
+        Deletes several objects, with as few requests as the backend allows.
+
+        Args:
+            keys (list): The object keys.
+
+        Returns:
+            int: The number of objects deleted. Keys that could not be deleted are logged.
+        """
+        return sum(self.delete(key) for key in keys)
+
+    def incomplete_uploads(self, older_than: float) -> Iterator[Tuple[str, str]]:
+        """
+        Yields uploads that were started but never completed, e.g. because the uploader crashed.
+
+        Args:
+            older_than (float): Only yield uploads started before this Unix time, so uploads in progress are left alone.
+
+        Returns:
+            Iterator: The key each upload was writing and an ID to pass to `abort_upload`.
+        """
+        return iter(())
+
+    def abort_upload(self, key: str, upload_id: str) -> None:
+        """
+        Discards an incomplete upload and whatever it already stored.
+
+        Args:
+            key (str): The key the upload was writing.
+            upload_id (str): The ID `incomplete_uploads` yielded for it.
+        """
+
+    def local_path(self, key: str) -> Optional[str]:
+        """
+        Returns a path the object can be read from on local disk, or None if it is not on local disk.
+
+        Args:
+            key (str): The object key.
+        """
+        return None
+
+    def evict(self, key: str) -> None:
+        """
+        Drops any cached copy of an object, e.g. because another process replaced it.
+
+        Args:
+            key (str): The object key.
+        """
+
+
+class S3Backend(StorageBackend):
+    """
+    Stores objects in an S3 bucket, reading them back with concurrent ranged GETs.
+    """
+
+    def __init__(self, bucket_name: str = DEFAULT_BUCKET, s3: Optional[Any] = None):
+        """
+        Args:
+            bucket_name (str, optional): The bucket to store objects in (default: DEFAULT_BUCKET).
+            s3 (optional): The boto3 S3 resource to use (default: a new one).
+        """
+        self.bucket_name = bucket_name
+        self.s3 = s3 if s3 is not None else boto3.resource('s3')
+        # Multipart threshold and part size must be equal for the locally computed ETag to match S3's.
+        self.transfer_config = TransferConfig(multipart_threshold=PART_SIZE, multipart_chunksize=PART_SIZE)
+
+    @staticmethod
+    def _info(obj: Any) -> ObjectInfo:
+        # With SSE-KMS the ETag is not derived from the content, so there is nothing to compare it against.
+        etag = obj.e_tag.strip('"') if obj.server_side_encryption != 'aws:kms' else None
+        return ObjectInfo(obj.content_length, etag, obj.e_tag)
+
+    def put(self, key: str, fileobj: BinaryIO) -> ObjectInfo:
+        self.s3.Object(self.bucket_name, key).upload_fileobj(fileobj, Config=self.transfer_config)
+        return self._info(self.s3.Object(self.bucket_name, key))
+
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        obj = self.s3.Object(self.bucket_name, key)
+        try:
+            obj.load()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+        return self._info(obj)
+
+    def iter_chunks(self, key: str, info: ObjectInfo, workers: int = 4,
+                    chunk_size: int = PART_SIZE) -> Iterator[bytes]:
+        client = self.s3.meta.client
+
+        def fetch(start: int) -> bytes:
+            end = min(start + chunk_size, info.size) - 1
+            # IfMatch makes a concurrent overwrite fail loudly instead of splicing two versions together.
+            try:
+                response = client.get_object(Bucket=self.bucket_name, Key=key, Range=f'bytes={start}-{end}',
+                                             IfMatch=info.token)
+            except ClientError as e:
+                if e.response['Error']['Code'] in ('PreconditionFailed', '412'):
+                    raise StaleObjectError(key)
+                raise
+            return response['Body'].read()
+
+        starts = iter(range(0, info.size, chunk_size))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque(pool.submit(fetch, start) for _, start in zip(range(workers), starts))
+            while in_flight:
+                data = in_flight.popleft().result()
+                next_start = next(starts, None)
+                if next_start is not None:
+                    in_flight.append(pool.submit(fetch, next_start))
+                yield data
+
+    def read_range(self, key: str, info: ObjectInfo, offset: int, length: int) -> bytes:
+        if length == 0:
+            return b''
+        try:
+            response = self.s3.meta.client.get_object(Bucket=self.bucket_name, Key=key, IfMatch=info.token,
+                                                      Range=f'bytes={offset}-{offset + length - 1}')
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', '412'):
+                raise StaleObjectError(key)
+            raise
+        return response['Body'].read()
+
+    def delete(self, key: str) -> bool:
+        self.s3.Object(self.bucket_name, key).delete()
+        return True
+
+    def list(self, prefix: str = '') -> Iterator[Tuple[str, int]]:
+        paginator = self.s3.meta.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for item in page.get('Contents', []):
+                yield item['Key'], item['Size']
+
+    def delete_many(self, keys: List[str]) -> int:
+        deleted = 0
+        for start in range(0, len(keys), DELETE_BATCH_SIZE):
+            batch = keys[start:start + DELETE_BATCH_SIZE]
+            response = self.s3.meta.client.delete_objects(
+                Bucket=self.bucket_name, Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True})
+            errors = response.get('Errors', [])
+            for error in errors:
+                logger.warning("Could not delete %s: %s", error['Key'], error.get('Message', error.get('Code')))
+            deleted += len(batch) - len(errors)
+        return deleted
+
+    def incomplete_uploads(self, older_than: float) -> Iterator[Tuple[str, str]]:
+        paginator = self.s3.meta.client.get_paginator('list_multipart_uploads')
+        for page in paginator.paginate(Bucket=self.bucket_name):
+            for upload in page.get('Uploads', []):
+                if upload['Initiated'].timestamp() < older_than:
+                    yield upload['Key'], upload['UploadId']
+
+    def abort_upload(self, key: str, upload_id: str) -> None:
+        self.s3.meta.client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+
+
+class LocalBackend(StorageBackend):
+    """
+    Stores objects as files under a root directory, e.g. a local disk or an NFS mount.
+
+    Keys map to paths relative to the root. Writes go to a temporary file that is renamed into
+    place, so readers only ever see complete objects, and a reader that opened an object before it
+    was replaced keeps reading the version it opened.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): Directory to store objects under. Created if it does not exist.
+        """
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        """
+        Returns the path an object is stored at.
+
+        Args:
+            key (str): The object key.
+
+        Raises:
+            ValueError: If the key would resolve to a path outside the root.
+        """
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'Invalid object key {key!r}')
+        return path
+
+    def put(self, key: str, fileobj: BinaryIO) -> ObjectInfo:
+        return self.put_chunks(key, iter(lambda: fileobj.read(COPY_CHUNK_SIZE), b''))
+
+    def put_chunks(self, key: str, chunks: Iterable[bytes]) -> ObjectInfo:
+        """
+        Stores an object from an iterable of chunks.
+
+        Args:
+            key (str): The object key.
+            chunks (Iterable[bytes]): The contents, in order.
+
+        Returns:
+            ObjectInfo: The stored object.
+        """
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f'{path}.partial-{uuid.uuid4().hex}'
+        try:
+            with open(partial_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial_path, path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        return self.head(key)
+
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            stat = os.stat(self.path(key))
+        except FileNotFoundError:
+            return None
+        return ObjectInfo(stat.st_size, None, stat.st_mtime_ns)
+
+    def iter_chunks(self, key: str, info: ObjectInfo, workers: int = 4,
+                    chunk_size: int = PART_SIZE) -> Iterator[bytes]:
+        try:
+            f = open(self.path(key), 'rb')
+        except FileNotFoundError:
+            raise StaleObjectError(key)
+        with f:
+            if os.fstat(f.fileno()).st_mtime_ns != info.token:
+                raise StaleObjectError(key)
+            while data := f.read(chunk_size):
+                yield data
+
+    def read_range(self, key: str, info: ObjectInfo, offset: int, length: int) -> bytes:
+        try:
+            with open(self.path(key), 'rb') as f:
+                if os.fstat(f.fileno()).st_mtime_ns != info.token:
+                    raise StaleObjectError(key)
+                return os.pread(f.fileno(), length, offset)
+        except FileNotFoundError:
+            raise StaleObjectError(key)
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def list(self, prefix: str = '') -> Iterator[Tuple[str, int]]:
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.root).replace(os.sep, '/')
+                if key.startswith(prefix) and '.partial-' not in name:
+                    try:
+                        yield key, os.path.getsize(path)
+                    except FileNotFoundError:
+                        continue
+
+    def incomplete_uploads(self, older_than: float) -> Iterator[Tuple[str, str]]:
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                if '.partial-' not in name:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if os.path.getmtime(path) >= older_than:
+                        continue
+                except FileNotFoundError:
+                    continue
+                key, upload_id = os.path.relpath(path, self.root).replace(os.sep, '/').rsplit('.partial-', 1)
+                yield key, upload_id
+
+    def abort_upload(self, key: str, upload_id: str) -> None:
+        try:
+            os.remove(f'{self.path(key)}.partial-{upload_id}')
+        except FileNotFoundError:
+            pass
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        return path if os.path.isfile(path) else None
+
+
+class TieringPolicy:
+    """
+    Decides which objects belong in the hot tier from how often they are read.
+
+    Each object has an access score that goes up by one per read and halves every `half_life`
+    seconds, so it approximates the number of reads in the last `half_life * 1.44` seconds. Objects
+    are promoted once their score, rounded to the nearest whole read, reaches `promote_after`. When
+    the hot tier holds more than `capacity_bytes`, the objects with the lowest scores are demoted
+    first, and objects whose score has decayed below `demote_below` are demoted regardless of space.
+    Scores that have decayed below `forget_below` are dropped by `prune`, so only recently read
+    objects are tracked.
+    """
+
+    def __init__(self, promote_after: float = 3.0, half_life: float = 3600.0,
+                 capacity_bytes: Optional[int] = None, demote_below: float = 0.5, forget_below: float = 0.05):
+        """
+        Args:
+            promote_after (float, optional): Score at which an object is promoted (default: 3.0).
+            half_life (float, optional): Seconds for a score to halve without reads (default: 3600.0).
+            capacity_bytes (int, optional): Size the hot tier is kept under (default: unlimited).
+            demote_below (float, optional): Score below which a hot object is demoted (default: 0.5).
+            forget_below (float, optional): Score below which an object's score is dropped (default: 0.05).
+        """
+        self.promote_after = promote_after
+        self.half_life = half_life
+        self.capacity_bytes = capacity_bytes
+        self.demote_below = demote_below
+        self.forget_below = forget_below
+        self._scores: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def score(self, key: str, now: Optional[float] = None) -> float:
+        """
+        Returns the current access score of an object.
+
+        Args:
+            key (str): The object key.
+            now (float, optional): The current time (default: time.monotonic()).
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            score, updated = self._scores.get(key, (0.0, now))
+        return score * math.pow(0.5, (now - updated) / self.half_life)
+
+    def record_access(self, key: str, now: Optional[float] = None) -> float:
+        """
+        Counts a read of an object.
+
+        Args:
+            key (str): The object key.
+            now (float, optional): The current time (default: time.monotonic()).
+
+        Returns:
+            float: The object's score including this read.
+        """
+        now = time.monotonic() if now is None else now
+        score = self.score(key, now) + 1
+        with self._lock:
+            self._scores[key] = (score, now)
+        return score
+
+    def forget(self, key: str) -> None:
+        with self._lock:
+            self._scores.pop(key, None)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """
+        Drops the scores that have decayed below `forget_below`, which then count as never read.
+
+        Args:
+            now (float, optional): The current time (default: time.monotonic()).
+
+        Returns:
+            int: The number of scores dropped.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            decayed = [key for key, (score, updated) in self._scores.items()
+                       if score * math.pow(0.5, (now - updated) / self.half_life) < self.forget_below]
+            for key in decayed:
+                del self._scores[key]
+        return len(decayed)
+
+    def should_promote(self, key: str) -> bool:
+        # Rounded so that N reads in quick succession count as N despite the decay between them.
+        return self.score(key) + 0.5 >= self.promote_after
+
+    def demotions(self, hot: Dict[str, int]) -> Iterator[str]:
+        """
+        Yields the hot objects to demote.
+
+        Args:
+            hot (dict): Keys of the objects in the hot tier mapped to their sizes.
+        """
+        now = time.monotonic()
+        used = sum(hot.values())
+        for key in sorted(hot, key=lambda key: self.score(key, now)):
+            if self.score(key, now) < self.demote_below or \
+                    (self.capacity_bytes is not None and used > self.capacity_bytes):
+                used -= hot[key]
+                yield key
+
+
+class TieredBackend(StorageBackend):
+    """
+    A hot local tier in front of a cold backend that holds every object.
+
+    Writes go to the cold tier. Reads come from the hot tier when it has the object, otherwise from
+    the cold tier, and objects read often enough are copied into the hot tier in the background, by
+    at most `promotion_workers` threads. The copy is checked against the cold tier's ETag, when it
+    reports one, before it is used. Every `rebalance_interval` seconds a read also starts a
+    rebalance in the background, which demotes objects that have gone cold.
+
+    Read counts and the record of what the hot tier holds live in the process, so a hot tier
+    directory must not be shared by several processes: each would demote the others' promotions
+    and keep its own tally against `capacity_bytes`.
+    """
+
+    def __init__(self, hot: LocalBackend, cold: StorageBackend, policy: Optional[TieringPolicy] = None,
+                 promotion_workers: int = 2, rebalance_interval: float = 60.0):
+        """
+        Args:
+            hot (LocalBackend): The hot tier.
+            cold (StorageBackend): The cold tier, the system of record.
+            policy (TieringPolicy, optional): When to promote and demote objects (default: TieringPolicy()).
+            promotion_workers (int, optional): Promotions copied at once (default: 2).
+            rebalance_interval (float, optional): Minimum seconds between rebalances started by reads (default: 60.0).
+        """
+        self.hot = hot
+        self.cold = cold
+        self.policy = policy if policy is not None else TieringPolicy()
+        self.promotion_workers = promotion_workers
+        self.rebalance_interval = rebalance_interval
+        self.promotions = 0
+        self.demotions = 0
+        self._executor = ThreadPoolExecutor(max_workers=promotion_workers, thread_name_prefix='tiering')
+        self._last_rebalance = time.monotonic()
+        # Objects already in the hot tier when the backend starts have no score, so they are demoted first.
+        self._hot: Dict[str, int] = dict(hot.list())
+        self._promoting: Set[str] = set()
+        # Bumped whenever an object is replaced or deleted, so a promotion that raced with it is discarded.
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def put(self, key: str, fileobj: BinaryIO) -> ObjectInfo:
+        info = self.cold.put(key, fileobj)
+        self.evict(key)
+        return info
+
+    def head(self, key: str) -> Optional[ObjectInfo]:
+        info = self.hot.head(key)
+        if info is not None:
+            return info._replace(token=(self.hot, info.token))
+        info = self.cold.head(key)
+        return info._replace(token=(self.cold, info.token)) if info is not None else None
+
+    def iter_chunks(self, key: str, info: ObjectInfo, workers: int = 4,
+                    chunk_size: int = PART_SIZE) -> Iterator[bytes]:
+        tier, info = self._read_from(key, info)
+        return tier.iter_chunks(key, info, workers, chunk_size)
+
+    def read_range(self, key: str, info: ObjectInfo, offset: int, length: int) -> bytes:
+        tier, info = self._read_from(key, info)
+        return tier.read_range(key, info, offset, length)
+
+    def _read_from(self, key: str, info: ObjectInfo) -> Tuple[StorageBackend, ObjectInfo]:
+        tier, token = info.token
+        self.policy.record_access(key)
+        if tier is self.cold and self.policy.should_promote(key):
+            self._start_promotion(key)
+        self._maybe_rebalance()
+        return tier, info._replace(token=token)
+
+    def delete(self, key: str) -> bool:
+        deleted = self.cold.delete(key)
+        self.evict(key)
+        self.policy.forget(key)
+        return deleted
+
+    def list(self, prefix: str = '') -> Iterator[Tuple[str, int]]:
+        return self.cold.list(prefix)
+
+    def delete_many(self, keys: List[str]) -> int:
+        deleted = self.cold.delete_many(keys)
+        for key in keys:
+            self.evict(key)
+            self.policy.forget(key)
+        return deleted
+
+    def incomplete_uploads(self, older_than: float) -> Iterator[Tuple[str, str]]:
+        return self.cold.incomplete_uploads(older_than)
+
+    def abort_upload(self, key: str, upload_id: str) -> None:
+        self.cold.abort_upload(key, upload_id)
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self.hot.local_path(key)
+        if path is not None:
+            self.policy.record_access(key)
+            self._maybe_rebalance()
+        return path
+
+    def evict(self, key: str) -> None:
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+        self._drop_hot(key)
+
+    def _start_promotion(self, key: str) -> None:
+        with self._lock:
+            if key in self._promoting or key in self._hot or \
+                    len(self._promoting) >= self.promotion_workers + PROMOTION_QUEUE:
+                return
+            self._promoting.add(key)
+        self._executor.submit(self._promote, key)
+
+    def _maybe_rebalance(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_rebalance < self.rebalance_interval:
+                return
+            self._last_rebalance = now
+        self._executor.submit(self.rebalance)
+
+    def _promote(self, key: str) -> None:
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        try:
+            info = self.cold.head(key)
+            if info is None:
+                return
+            digest = ArtefactDigest()
+
+            def chunks() -> Iterator[bytes]:
+                for data in self.cold.iter_chunks(key, info):
+                    digest.update(data)
+                    yield data
+
+            promoted = self.hot.put_chunks(key, chunks())
+            if info.etag is not None and digest.etag != info.etag:
+                logger.warning("Promoted copy of %s does not match its ETag, discarding it", key)
+                self.hot.delete(key)
+                return
+            with self._lock:
+                current = self._generations.get(key, 0) == generation
+                if current:
+                    self._hot[key] = promoted.size
+            if not current:
+                self.hot.delete(key)
+                return
+            self.promotions += 1
+            self.rebalance()
+        except Exception:
+            logger.exception("Promotion of %s failed", key)
+        finally:
+            with self._lock:
+                self._promoting.discard(key)
+
+    def rebalance(self) -> int:
+        """
+        Demotes the hot objects the policy no longer wants in the hot tier, and drops decayed scores.
+
+        Returns:
+            int: The number of objects demoted.
+        """
+        with self._lock:
+            hot = dict(self._hot)
+        demoted = 0
+        for key in self.policy.demotions(hot):
+            if self._drop_hot(key):
+                demoted += 1
+        self.demotions += demoted
+        self.policy.prune()
+        return demoted
+
+    def _drop_hot(self, key: str) -> bool:
+        with self._lock:
+            was_hot = self._hot.pop(key, None) is not None
+        return self.hot.delete(key) or was_hot
+
+
+def backend_from_config(config: Dict[str, str]) -> StorageBackend:
+    """
+    Builds the storage backend selected by MODEL_REGISTRY_* settings.
+
+    MODEL_REGISTRY_STORAGE picks the backend: `s3` (the default) stores artefacts in
+    MODEL_REGISTRY_BUCKET, `local` stores them under MODEL_REGISTRY_STORAGE_DIR, and `tiered` keeps
+    frequently read artefacts under MODEL_REGISTRY_STORAGE_DIR in front of the bucket, promoting
+    them after MODEL_REGISTRY_PROMOTE_AFTER recent reads and keeping the directory under
+    MODEL_REGISTRY_HOT_TIER_BYTES.
+
+    Args:
+        config (dict): Settings, usually os.environ.
+
+    Returns:
+        StorageBackend: The configured backend.
+
+    Raises:
+        ValueError: If the backend is unknown or MODEL_REGISTRY_STORAGE_DIR is missing for one that needs it.
+    """
+    kind = config.get('MODEL_REGISTRY_STORAGE', 's3')
+    if kind == 's3':
+        return S3Backend(config.get('MODEL_REGISTRY_BUCKET', DEFAULT_BUCKET))
+    if kind not in ('local', 'tiered'):
+        raise ValueError(f"Unknown MODEL_REGISTRY_STORAGE {kind!r}, expected 's3', 'local' or 'tiered'")
+    root = config.get('MODEL_REGISTRY_STORAGE_DIR')
+    if not root:
+        raise ValueError(f"MODEL_REGISTRY_STORAGE={kind} needs MODEL_REGISTRY_STORAGE_DIR")
+    if kind == 'local':
+        return LocalBackend(root)
+    capacity = config.get('MODEL_REGISTRY_HOT_TIER_BYTES')
+    policy = TieringPolicy(promote_after=float(config.get('MODEL_REGISTRY_PROMOTE_AFTER', 3)),
+                           capacity_bytes=int(capacity) if capacity else None)
+    return TieredBackend(LocalBackend(root), S3Backend(config.get('MODEL_REGISTRY_BUCKET', DEFAULT_BUCKET)), policy)
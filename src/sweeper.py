@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from admission import TokenBucket
+from models import ModelTable
+from storage_backends import DELETE_BATCH_SIZE, StorageBackend
+
+logger = logging.getLogger(__name__)
+
+# False positive rate of the live model filter. A false positive only means an orphaned object is
+# kept until a later sweep, so this trades a few leftovers for memory: about 1.8 MB per million models.
+FALSE_POSITIVE_RATE = 0.001
+# Incomplete uploads younger than this many seconds may still be in progress and are left alone.
+UPLOAD_MAX_AGE = 24 * 3600
+
+
+class BloomFilter:
+    """
+    Set of strings in a fixed-size bit array that may report strings it was never given, but never
+    misses one it was given.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = FALSE_POSITIVE_RATE):
+        """
+        Args:
+            capacity (int): Number of strings the filter is sized for. Adding more raises the false positive rate.
+            error_rate (float, optional): False positive rate at `capacity` strings (default: FALSE_POSITIVE_RATE).
+        """
+        capacity = max(capacity, 1)
+        self.bits = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._array)
+
+
+def live_models(expected: Optional[int] = None) -> BloomFilter:
+    """
+    Reads the ID of every model in the ModelTable into a Bloom filter.
+
+    Args:
+        expected (int, optional): Number of models to size the filter for (default: the table's
+            item count as DynamoDB reports it, plus 10% for models created since it was last updated).
+
+    Returns:
+        BloomFilter: The IDs of the models that exist.
+    """
+    if expected is None:
+        expected = int(ModelTable.describe_table().get('ItemCount', 0) * 1.1) + 1000
+    live = BloomFilter(expected)
+    for model in ModelTable.scan(attributes_to_get=['model_id']):
+        live.add(model.model_id)
+    return live
+
+
+def existing_models(model_ids: Iterable[str]) -> Set[str]:
+    """
+    Returns which of the given models exist, with strongly consistent reads straight from DynamoDB.
+
+    The reads bypass the metadata cache and hedged reads, whose answers may be stale, since a model
+    wrongly reported missing here has its artefacts deleted.
+
+    Args:
+        model_ids (Iterable[str]): The IDs to look up.
+
+    Returns:
+        set: The IDs of the models that exist.
+    """
+    return {model.model_id for model in ModelTable.batch_get(set(model_ids), consistent_read=True,
+                                                             attributes_to_get=['model_id'])}
+
+
+class Sweeper:
+    """
+    Deletes stored objects that belong to models that no longer exist, and incomplete uploads.
+
+    A sweep streams the backend's object listing and checks the model ID each key starts with
+    against a Bloom filter of live models, so memory stays bounded by the filter and one batch of
+    candidates however many objects there are. Keys the filter does not know are checked against
+    DynamoDB before they are deleted, so a model created after the filter was built keeps its
+    artefacts. Deletes are sent in batches of DELETE_BATCH_SIZE, at no more than
+    `deletes_per_second` when given.
+    """
+
+    def __init__(self, backend: StorageBackend, dry_run: bool = False, deletes_per_second: Optional[float] = None,
+                 upload_max_age: float = UPLOAD_MAX_AGE, batch_size: int = DELETE_BATCH_SIZE):
+        """
+        Args:
+            backend (StorageBackend): The backend to sweep.
+            dry_run (bool, optional): Count and log what would be deleted without deleting it (default: False).
+            deletes_per_second (float, optional): Most objects deleted per second (default: no limit).
+            upload_max_age (float, optional): Seconds after which an incomplete upload is aborted (default: UPLOAD_MAX_AGE).
+            batch_size (int, optional): Objects per delete request, at most DELETE_BATCH_SIZE (default: DELETE_BATCH_SIZE).
+        """
+        self.backend = backend
+        self.dry_run = dry_run
+        self.upload_max_age = upload_max_age
+        self.batch_size = min(batch_size, DELETE_BATCH_SIZE)
+        self._limiter = TokenBucket(deletes_per_second, self.batch_size) if deletes_per_second else None
+        self.scanned = 0
+        self.scanned_bytes = 0
+        self.orphaned = 0
+        self.orphaned_bytes = 0
+        self.deleted = 0
+        self.uploads_aborted = 0
+
+    def sweep(self, prefix: str = '', live: Optional[BloomFilter] = None) -> Dict[str, Any]:
+        """
+        Runs one sweep over the objects whose keys start with `prefix`.
+
+        Args:
+            prefix (str, optional): Key prefix to sweep (default: every object).
+            live (BloomFilter, optional): The IDs of the models that exist (default: read with `live_models`).
+
+        Returns:
+            dict: What the sweep found and deleted, as `stats` reports it.
+        """
+        started = time.time()
+        if live is None:
+            live = live_models()
+        candidates: List[Tuple[str, int]] = []
+        for key, size in self.backend.list(prefix):
+            self.scanned += 1
+            self.scanned_bytes += size
+            model_id, separator, _ = key.partition('/')
+            # Objects outside a model's prefix were not stored by the registry, so they are not its to delete.
+            if not separator or model_id in live:
+                continue
+            candidates.append((key, size))
+            if len(candidates) >= self.batch_size:
+                self._delete_orphans(candidates)
+                candidates = []
+        if candidates:
+            self._delete_orphans(candidates)
+        for key, upload_id in self.backend.incomplete_uploads(started - self.upload_max_age):
+            logger.info("%s incomplete upload %s of %s", 'Would abort' if self.dry_run else 'Aborting', upload_id, key)
+            if not self.dry_run:
+                self.backend.abort_upload(key, upload_id)
+            self.uploads_aborted += 1
+        return self.stats()
+
+    def _delete_orphans(self, candidates: List[Tuple[str, int]]) -> None:
+        existing = existing_models(key.partition('/')[0] for key, _ in candidates)
+        orphans = [(key, size) for key, size in candidates if key.partition('/')[0] not in existing]
+        if not orphans:
+            return
+        self.orphaned += len(orphans)
+        self.orphaned_bytes += sum(size for _, size in orphans)
+        if self.dry_run:
+            for key, size in orphans:
+                logger.info("Would delete %s (%d bytes)", key, size)
+            return
+        if self._limiter is not None:
+            time.sleep(self._limiter.reserve(len(orphans)))
+        self.deleted += self.backend.delete_many([key for key, _ in orphans])
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the objects and bytes scanned, the orphaned objects and bytes found, and the objects
+        deleted and incomplete uploads aborted (or that would have been, in a dry run).
+        """
+        return {'scanned': self.scanned, 'scanned_bytes': self.scanned_bytes, 'orphaned': self.orphaned,
+                'orphaned_bytes': self.orphaned_bytes, 'deleted': self.deleted,
+                'uploads_aborted': self.uploads_aborted, 'dry_run': self.dry_run}
@@ -0,0 +1,423 @@
+import json
+import mmap
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from math import prod
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from urllib.parse import quote
+
+import httpx
+
+try:
+    import numpy
+except ImportError:  # Tensors are returned as raw bytes without numpy; only LazyTensors.array needs it.
+    numpy = None
+
+# A safetensors file is an 8-byte little-endian header length, a JSON header mapping tensor names to
+# their dtype, shape and byte range (relative to the end of the header), then the tensor data.
+_HEADER_SIZE = struct.Struct('<Q')
+# The safetensors format caps headers at 100 MB; anything larger is not a safetensors file.
+MAX_HEADER_SIZE = 100 * 1024 * 1024
+METADATA_KEY = '__metadata__'
+
+DTYPE_SIZES = {'BOOL': 1, 'U8': 1, 'I8': 1, 'F8_E4M3': 1, 'F8_E5M2': 1, 'U16': 2, 'I16': 2, 'F16': 2, 'BF16': 2,
+               'U32': 4, 'I32': 4, 'F32': 4, 'U64': 8, 'I64': 8, 'F64': 8}
+NUMPY_DTYPES = {'BOOL': '?', 'U8': 'u1', 'I8': 'i1', 'U16': '<u2', 'I16': '<i2', 'F16': '<f2', 'U32': '<u4',
+                'I32': '<i4', 'F32': '<f4', 'U64': '<u8', 'I64': '<i8', 'F64': '<f8'}
+
+
+class TensorError(Exception):
+    """
+    Raised when an artefact is not a valid safetensors file, or a tensor cannot be loaded.
+    """
+
+
+class TensorInfo(NamedTuple):
+    """
+    One tensor in a safetensors artefact: where its bytes are within the artefact, and their CRC32
+    (None when the index was read from the artefact's own header rather than recorded at upload).
+    """
+    name: str
+    dtype: str
+    shape: List[int]
+    offset: int
+    size: int
+    crc32: Optional[int] = None
+
+
+class TensorIndex:
+    """
+    The tensors of a safetensors artefact, in the order their bytes appear, and its free-form metadata.
+    """
+
+    def __init__(self, tensors: List[TensorInfo], metadata: Optional[Dict[str, str]] = None):
+        self.tensors = tensors
+        self.metadata = metadata or {}
+        self._by_name = {tensor.name: tensor for tensor in tensors}
+
+    def get(self, name: str) -> Optional[TensorInfo]:
+        return self._by_name.get(name)
+
+    def __iter__(self) -> Iterator[TensorInfo]:
+        return iter(self.tensors)
+
+    def __len__(self) -> int:
+        return len(self.tensors)
+
+    def to_bytes(self, artefact_size: int) -> bytes:
+        """
+        Serializes the index for storing next to the artefact it describes.
+
+        Args:
+            artefact_size (int): Size of that artefact, so an index left behind by an older upload can be told apart.
+        """
+        return json.dumps({'artefact_size': artefact_size, 'metadata': self.metadata,
+                           'tensors': [tensor._asdict() for tensor in self.tensors]},
+                          separators=(',', ':')).encode()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, artefact_size: int) -> Optional['TensorIndex']:
+        """
+        Reads an index stored with `to_bytes`.
+
+        Returns:
+            TensorIndex or None: The index, or None if it was stored for an artefact of a different size.
+        """
+        try:
+            stored = json.loads(data)
+            if stored['artefact_size'] != artefact_size:
+                return None
+            return cls([TensorInfo(**tensor) for tensor in stored['tensors']], stored['metadata'])
+        except (ValueError, KeyError, TypeError) as e:
+            raise TensorError(f'Stored tensor index is corrupt: {e}')
+
+
+def parse_header(header: bytes) -> TensorIndex:
+    """
+    Parses the JSON header of a safetensors file into an index with offsets from the start of the file.
+
+    Args:
+        header (bytes): The JSON header, without the length prefix.
+
+    Returns:
+        TensorIndex: The index, without checksums.
+
+    Raises:
+        TensorError: If the header is not a valid safetensors header.
+    """
+    data_start = _HEADER_SIZE.size + len(header)
+    try:
+        entries = json.loads(header)
+        metadata = entries.pop(METADATA_KEY, None)
+        tensors = []
+        for name, entry in entries.items():
+            begin, end = entry['data_offsets']
+            shape = [int(dim) for dim in entry['shape']]
+            tensors.append(TensorInfo(name, entry['dtype'], shape, data_start + begin, end - begin))
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise TensorError(f'Not a safetensors header: {e}')
+
+    tensors.sort(key=lambda tensor: tensor.offset)
+    end = data_start
+    for tensor in tensors:
+        if tensor.offset < end or tensor.size < 0:
+            raise TensorError(f'Tensor {tensor.name} overlaps another tensor')
+        itemsize = DTYPE_SIZES.get(tensor.dtype)
+        if itemsize is not None and tensor.size != itemsize * prod(tensor.shape):
+            raise TensorError(f'Tensor {tensor.name} has {tensor.size} bytes, which does not fit its dtype and shape')
+        end = tensor.offset + tensor.size
+    return TensorIndex(tensors, metadata)
+
+
+def read_header(read_range: Callable[[int, int], bytes], size: int) -> TensorIndex:
+    """
+    Reads the index of a safetensors file from its header, with two reads.
+
+    Args:
+        read_range (Callable[[int, int], bytes]): Returns `length` bytes of the file from `offset`.
+        size (int): The size of the file in bytes.
+
+    Returns:
+        TensorIndex: The index, without checksums.
+
+    Raises:
+        TensorError: If the file is not a safetensors file.
+    """
+    if size < _HEADER_SIZE.size:
+        raise TensorError('Artefact is too small to be a safetensors file')
+    header_size, = _HEADER_SIZE.unpack(read_range(0, _HEADER_SIZE.size))
+    if not 0 < header_size <= min(MAX_HEADER_SIZE, size - _HEADER_SIZE.size):
+        raise TensorError('Artefact is not a safetensors file')
+    index = parse_header(read_range(_HEADER_SIZE.size, header_size))
+    if index.tensors and index.tensors[-1].offset + index.tensors[-1].size > size:
+        raise TensorError('Artefact ends before its last tensor')
+    return index
+
+
+class TensorIndexer:
+    """
+    Builds the index of a safetensors file, with a CRC32 of every tensor, from its bytes as they stream past.
+
+    Bytes that do not start with a safetensors header are ignored after the first few, so it can watch
+    every upload.
+    """
+
+    def __init__(self):
+        self._header = bytearray()
+        self._header_size: Optional[int] = None
+        self._index: Optional[TensorIndex] = None
+        self._failed = False
+        self._position = 0
+        self._pending: Iterator[TensorInfo] = iter(())
+        self._current: Optional[TensorInfo] = None
+        self._crc = 0
+        self._crcs: Dict[str, int] = {}
+
+    def update(self, data: bytes) -> None:
+        """
+        Feeds the next chunk of the file into the indexer.
+
+        Args:
+            data (bytes): The next bytes of the file, in order.
+        """
+        if self._failed or not data:
+            return
+        view = memoryview(data)
+        if self._index is None:
+            view = self._update_header(view)
+            if self._index is None:
+                return
+        self._update_tensors(view)
+
+    def _update_header(self, view: memoryview) -> memoryview:
+        needed = _HEADER_SIZE.size + (self._header_size or 0) - len(self._header)
+        self._header += view[:needed]
+        view = view[needed:]
+        if self._header_size is None:
+            if len(self._header) < _HEADER_SIZE.size:
+                return view
+            self._header_size, = _HEADER_SIZE.unpack(self._header)
+            if not 0 < self._header_size <= MAX_HEADER_SIZE:
+                self._failed = True
+                return view
+            return self._update_header(view) if view else view
+        if len(self._header) > _HEADER_SIZE.size and self._header[_HEADER_SIZE.size] != ord('{'):
+            self._failed = True
+            self._header = bytearray()
+        elif len(self._header) == _HEADER_SIZE.size + self._header_size:
+            try:
+                self._index = parse_header(bytes(self._header[_HEADER_SIZE.size:]))
+            except TensorError:
+                self._failed = True
+                return view
+            self._position = len(self._header)
+            self._pending = iter(self._index)
+            self._current = next(self._pending, None)
+            self._header = bytearray()
+        return view
+
+    def _update_tensors(self, view: memoryview) -> None:
+        while self._current is not None:
+            tensor = self._current
+            if self._position >= tensor.offset + tensor.size:
+                self._crcs[tensor.name] = self._crc
+                self._crc = 0
+                self._current = next(self._pending, None)
+                continue
+            if not view:
+                return
+            if self._position < tensor.offset:
+                take = min(len(view), tensor.offset - self._position)
+            else:
+                take = min(len(view), tensor.offset + tensor.size - self._position)
+                self._crc = zlib.crc32(view[:take], self._crc)
+            view = view[take:]
+            self._position += take
+
+    def index(self, size: int) -> Optional[TensorIndex]:
+        """
+        Returns the index once the whole file has been seen.
+
+        Args:
+            size (int): The size of the file in bytes.
+
+        Returns:
+            TensorIndex or None: The index with checksums, or None if the file was not a complete safetensors file.
+        """
+        if self._index is None or self._failed:
+            return None
+        self._update_tensors(memoryview(b''))
+        if self._current is not None or self._position > size:
+            return None
+        tensors = [tensor._replace(crc32=self._crcs[tensor.name]) for tensor in self._index]
+        return TensorIndex(tensors, self._index.metadata)
+
+
+def verify_tensor(tensor: TensorInfo, data: bytes) -> bool:
+    """
+    Checks a tensor's bytes against the size and, when recorded, the CRC32 in the index.
+    """
+    return len(data) == tensor.size and (tensor.crc32 is None or zlib.crc32(data) == tensor.crc32)
+
+
+class LazyTensors:
+    """
+    Read-only mapping from tensor names to their raw bytes that loads each tensor on first access.
+
+    Opened on a local safetensors file, tensors are views of a memory mapping, so only the pages
+    that are touched are ever read. Opened on a registry server, each tensor is fetched with its own
+    request to `GET /models/{model_id}/artefact/tensors/{name}` and kept once fetched.
+
+    Example:
+        with LazyTensors.from_server('http://registry:8000', model_id, auth=('user', 'password')) as tensors:
+            tensors.prefetch(name for name in tensors if name.startswith('embed'))
+            embeddings = tensors.array('embed_tokens.weight')
+    """
+
+    def __init__(self, index: TensorIndex, fetch: Callable[[TensorInfo], bytes], close: Callable[[], None]):
+        self.index = index
+        self._fetch = fetch
+        self._close = close
+        self._loaded: Dict[str, bytes] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'LazyTensors':
+        """
+        Opens a local safetensors file, e.g. one downloaded with `cli.py retrieve_artefact`.
+
+        Raises:
+            TensorError: If the file is not a safetensors file.
+        """
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            index = read_header(lambda offset, length: mapped[offset:offset + length], len(mapped))
+        except TensorError:
+            mapped.close()
+            raise
+        view = memoryview(mapped)
+        loaded = []
+
+        def fetch(tensor: TensorInfo) -> memoryview:
+            data = view[tensor.offset:tensor.offset + tensor.size]
+            loaded.append(data)
+            return data
+
+        def close() -> None:
+            try:
+                for data in loaded:
+                    data.release()
+                view.release()
+                mapped.close()
+            except BufferError:
+                pass  # Arrays handed out still use the mapping; it is unmapped once they are garbage-collected.
+
+        return cls(index, fetch, close)
+
+    @classmethod
+    def from_server(cls, base_url: str, model_id: str, auth=None,
+                    client: Optional[httpx.Client] = None) -> 'LazyTensors':
+        """
+        Opens a model's safetensors artefact on a registry server, fetching only its index up front.
+
+        Args:
+            base_url (str): The server's base URL.
+            model_id (str): The ID of the model the artefact belongs to.
+            auth (optional): HTTP auth for the server, e.g. a (username, password) tuple.
+            client (httpx.Client, optional): Client to send requests with (default: a new one, closed with this object).
+
+        Raises:
+            TensorError: If the model has no artefact or the artefact is not a safetensors file.
+        """
+        owned = client is None
+        if owned:
+            client = httpx.Client(base_url=base_url, auth=auth, timeout=60)
+        path = f'/models/{quote(model_id, safe="")}/artefact/tensors'
+        try:
+            response = client.get(path)
+            if response.status_code in (404, 409):
+                raise TensorError(response.json().get('detail', response.text))
+            response.raise_for_status()
+            listing = response.json()
+        except Exception:
+            if owned:
+                client.close()
+            raise
+        index = TensorIndex([TensorInfo(**tensor) for tensor in listing['tensors']], listing['metadata'])
+
+        def fetch(tensor: TensorInfo) -> bytes:
+            response = client.get(f'{path}/{quote(tensor.name, safe="/")}')
+            response.raise_for_status()
+            return response.content
+
+        return cls(index, fetch, client.close if owned else lambda: None)
+
+    def __getitem__(self, name: str) -> bytes:
+        data = self._loaded.get(name)
+        if data is None:
+            tensor = self.index.get(name)
+            if tensor is None:
+                raise KeyError(name)
+            data = self._loaded[name] = self._fetch(tensor)
+        return data
+
+    def __contains__(self, name: str) -> bool:
+        return self.index.get(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return (tensor.name for tensor in self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def metadata(self) -> Dict[str, str]:
+        return self.index.metadata
+
+    def info(self, name: str) -> TensorInfo:
+        """
+        Returns a tensor's dtype, shape and location without loading it.
+        """
+        tensor = self.index.get(name)
+        if tensor is None:
+            raise KeyError(name)
+        return tensor
+
+    def prefetch(self, names: Iterable[str], workers: int = 8) -> None:
+        """
+        Loads several tensors concurrently, e.g. the first layers a serving framework needs at startup.
+
+        Args:
+            names (Iterable[str]): Tensors to load.
+            workers (int, optional): Number of tensors to load at once (default: 8).
+        """
+        missing = [name for name in names if name not in self._loaded]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for name, data in zip(missing, pool.map(lambda name: self._fetch(self.info(name)), missing)):
+                self._loaded[name] = data
+
+    def array(self, name: str):
+        """
+        Returns a tensor as a numpy array that shares the loaded bytes.
+
+        Raises:
+            TensorError: If numpy is not installed or has no equivalent of the tensor's dtype (e.g. BF16).
+        """
+        if numpy is None:
+            raise TensorError('numpy is required to load tensors as arrays')
+        tensor = self.info(name)
+        dtype = NUMPY_DTYPES.get(tensor.dtype)
+        if dtype is None:
+            raise TensorError(f'Tensor {name} has dtype {tensor.dtype}, which numpy does not support')
+        return numpy.frombuffer(self[name], dtype=dtype).reshape(tensor.shape)
+
+    def close(self) -> None:
+        self._loaded.clear()
+        self._close()
+
+    def __enter__(self) -> 'LazyTensors':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
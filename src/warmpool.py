@@ -0,0 +1,104 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Type
+
+from pynamodb.models import Model
+
+logger = logging.getLogger(__name__)
+
+# Hash key that no model uses; warming reads it so each ping costs the smallest possible read.
+WARM_KEY = '__connection-warmer__'
+
+
+class WarmPool:
+    """
+    Keeps a number of connections to DynamoDB open, so reads after an idle period do not pay for a
+    new TCP and TLS handshake.
+
+    Every `interval` seconds a background thread sends `connections` reads at once. Because they are
+    in flight together, botocore has to hold that many connections in its pool, and each of them is
+    used often enough that neither side closes it as idle.
+    """
+
+    def __init__(self, model: Type[Model], connections: int = 8, interval: float = 30.0):
+        """
+        Args:
+            model (Type[Model]): The PynamoDB model whose connection pool is kept warm.
+            connections (int, optional): Number of connections to keep open (default: 8).
+            interval (float, optional): Seconds between warming rounds (default: 30).
+
+        Raises:
+            ValueError: If `connections` or `interval` is not positive.
+        """
+        if connections < 1:
+            raise ValueError(f"connections must be positive, got {connections}")
+        if interval <= 0:
+            raise ValueError(f"interval must be positive, got {interval}")
+        self.model = model
+        self.connections = connections
+        self.interval = interval
+        self._executor = ThreadPoolExecutor(max_workers=connections, thread_name_prefix='dynamodb-warmer')
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rounds = 0
+        self.failures = 0
+
+    def start(self) -> None:
+        """
+        Warms the pool once, then keeps it warm from a background thread.
+
+        The model's connection pool is enlarged to hold the warm connections; this only takes effect
+        if it is called before the model's first request.
+        """
+        if self._thread is None:
+            if self.model.Meta.max_pool_connections < self.connections:
+                self.model.Meta.max_pool_connections = self.connections
+            self.warm()
+            self._thread = threading.Thread(target=self._run, name="dynamodb-warm-pool", daemon=True)
+            self._thread.start()
+
+    def _ping(self, barrier: threading.Barrier) -> None:
+        try:
+            barrier.wait(timeout=self.interval)
+        except threading.BrokenBarrierError:
+            pass
+        try:
+            self.model.get(WARM_KEY)
+        except self.model.DoesNotExist:
+            pass
+
+    def warm(self) -> int:
+        """
+        Sends one round of concurrent reads.
+
+        Returns:
+            int: The number of reads that failed.
+        """
+        barrier = threading.Barrier(self.connections)
+        futures = [self._executor.submit(self._ping, barrier) for _ in range(self.connections)]
+        failures = 0
+        for future in futures:
+            if future.exception() is not None:
+                failures += 1
+                logger.warning("Warming a DynamoDB connection failed: %s", future.exception())
+        self.rounds += 1
+        self.failures += failures
+        return failures
+
+    def close(self) -> None:
+        """
+        Stops keeping the pool warm. Connections already open stay in the pool.
+        """
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._executor.shutdown()
+
+    def _run(self) -> None:
+        while not self._closed.wait(self.interval):
+            try:
+                self.warm()
+            except Exception:
+                logger.exception("Warming the DynamoDB connection pool failed")
@@ -0,0 +1,177 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from pynamodb.exceptions import UpdateError
+
+from models import ModelTable
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on how long an accepted update may sit in memory before it is written to DynamoDB.
+MAX_FLUSH_INTERVAL = 30.0
+
+
+class WriteBehindQueue:
+    """
+    Coalescing write-behind buffer for ModelTable metadata updates.
+
+    Updates are merged per model (last writer wins per field) and written by a background thread
+    with a single UpdateItem call per model every `flush_interval` seconds, so a model that is
+    updated every few seconds costs one write per interval instead of one write per update.
+    """
+
+    def __init__(self, flush_interval: float = 1.0, max_pending: int = 1000,
+                 on_write: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            flush_interval (float, optional): Seconds between background flushes (default: 1.0).
+            max_pending (int, optional): Number of buffered models that triggers an early flush (default: 1000).
+            on_write (Callable[[str], None], optional): Called with the model ID after each successful write (default: None).
+
+        Raises:
+            ValueError: If `flush_interval` is not in (0, MAX_FLUSH_INTERVAL] or `max_pending` is not positive.
+        """
+        if not 0 < flush_interval <= MAX_FLUSH_INTERVAL:
+            raise ValueError(f"flush_interval must be in (0, {MAX_FLUSH_INTERVAL}], got {flush_interval}")
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be positive, got {max_pending}")
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.on_write = on_write
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        # Updates taken by the running flush, kept visible to `pending` until their write completes.
+        self._inflight: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.updates_received = 0
+        self.writes_issued = 0
+
+    def start(self) -> None:
+        """
+        Starts the background flusher thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="write-behind-flusher", daemon=True)
+            self._thread.start()
+
+    def put(self, model_id: str, fields: Dict[str, Any]) -> None:
+        """
+        Buffers an update for a model, merging it over any update still pending for that model.
+
+        Args:
+            model_id (str): Unique identifier for the model.
+            fields (dict): ModelTable attribute names mapped to their new values.
+
+        Raises:
+            RuntimeError: If the queue has been closed.
+        """
+        if self._closed.is_set():
+            raise RuntimeError("WriteBehindQueue is closed")
+        with self._lock:
+            self._pending.setdefault(model_id, {}).update(fields)
+            self.updates_received += 1
+            if len(self._pending) >= self.max_pending:
+                self._wakeup.set()
+
+    def pending(self, model_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns a copy of the fields buffered for a model, or None if nothing is pending.
+
+        Fields that a flush is writing right now are included until their write completes, so a
+        read that overlays them never sees the model as it was before the update.
+
+        Args:
+            model_id (str): Unique identifier for the model.
+        """
+        with self._lock:
+            inflight = self._inflight.get(model_id)
+            fields = self._pending.get(model_id)
+            if inflight is None and fields is None:
+                return None
+            return {**(inflight or {}), **(fields or {})}
+
+    def discard(self, model_id: str) -> None:
+        """
+        Drops any update buffered for a model, e.g. because the model is being deleted.
+
+        Args:
+            model_id (str): Unique identifier for the model.
+        """
+        with self._lock:
+            self._pending.pop(model_id, None)
+            self._inflight.pop(model_id, None)
+
+    def flush(self) -> int:
+        """
+        Writes every buffered update to DynamoDB.
+
+        Updates for models that no longer exist are dropped. Updates that fail for any other reason are
+        merged back into the buffer, underneath anything written since, and retried on the next flush.
+        Until its write completes, an update stays visible to `pending`.
+
+        Returns:
+            int: The number of UpdateItem calls issued.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                self._inflight = dict(batch)
+            writes = 0
+            try:
+                for model_id, fields in batch.items():
+                    actions = [getattr(ModelTable, name).set(value) for name, value in fields.items()]
+                    try:
+                        ModelTable(model_id).update(actions=actions, condition=ModelTable.model_id.exists())
+                    except UpdateError as e:
+                        if e.cause_response_code != 'ConditionalCheckFailedException':
+                            logger.warning("Write-behind update of model %s failed, retrying: %s", model_id, e)
+                            self._requeue(model_id, fields)
+                        else:
+                            self._complete(model_id)
+                        continue
+                    self._complete(model_id)
+                    writes += 1
+                    if self.on_write is not None:
+                        self.on_write(model_id)
+            finally:
+                # Anything the flush did not get to, e.g. after an unexpected error, goes back into the buffer.
+                with self._lock:
+                    leftover, self._inflight = self._inflight, {}
+                for model_id, fields in leftover.items():
+                    self._requeue(model_id, fields)
+                self.writes_issued += writes
+            return writes
+
+    def close(self) -> None:
+        """
+        Stops the background flusher and drains the buffer.
+        """
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _requeue(self, model_id: str, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            newer = self._pending.get(model_id, {})
+            self._pending[model_id] = {**fields, **newer}
+            self._inflight.pop(model_id, None)
+
+    def _complete(self, model_id: str) -> None:
+        with self._lock:
+            self._inflight.pop(model_id, None)
+
+    def _run(self) -> None:
+        while not self._closed.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from src.admission import (AdmissionMiddleware, ConcurrencyPool, PoolSaturated, TokenBucket, _throttled,
+                           admission_from_config, release_slot)
+
+
+class TestTokenBucket(unittest.TestCase):
+    """
+    Test suite for the token bucket.
+    """
+
+    def test_burst_then_retry_after(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        wait = bucket.try_acquire()
+
+        self.assertGreater(wait, 0)
+        self.assertLessEqual(wait, 0.1)
+
+    def test_reserve_goes_into_debt(self):
+        bucket = TokenBucket(rate=1000)
+
+        self.assertEqual(bucket.reserve(1000), 0)
+        self.assertAlmostEqual(bucket.reserve(500), 0.5, places=2)
+
+
+class TestConcurrencyPool(unittest.TestCase):
+    """
+    Test suite for the bounded concurrency pool.
+    """
+
+    def test_full_queue_rejects_immediately(self):
+        async def scenario():
+            pool = ConcurrencyPool('artefact', limit=1, max_queue=0, queue_timeout=10)
+            await pool.acquire()
+            started = time.monotonic()
+            with self.assertRaises(PoolSaturated):
+                await pool.acquire()
+            self.assertLess(time.monotonic() - started, 1)
+            pool.release()
+            await pool.acquire()
+            self.assertEqual(pool.rejected, 1)
+
+        asyncio.run(scenario())
+
+    def test_queued_request_times_out(self):
+        async def scenario():
+            pool = ConcurrencyPool('artefact', limit=1, max_queue=5, queue_timeout=0.05)
+            await pool.acquire()
+            with self.assertRaises(PoolSaturated):
+                await pool.acquire()
+            self.assertEqual(pool.waiting, 0)
+
+        asyncio.run(scenario())
+
+
+class TestAdmissionMiddleware(unittest.TestCase):
+    """
+    Test suite for admission control in front of the API.
+    """
+
+    def make_client(self, **settings) -> TestClient:
+        app = FastAPI()
+
+        @app.get('/models/{model_id}')
+        def read(model_id: str):
+            return {'model_id': model_id}
+
+        @app.get('/models/{model_id}/artefact')
+        def download(model_id: str):
+            return StreamingResponse(iter([b'x' * 1000] * 5))
+
+        class SlotFreeResponse(StreamingResponse):
+            async def __call__(self, scope, receive, send):
+                release_slot(scope)
+                await super().__call__(scope, receive, send)
+
+        @app.get('/models/{model_id}/artefact/members/{name}')
+        def download_member(model_id: str, name: str):
+            async def body():
+                self.active_while_sending.append(self.settings['artefact_pool'].active)
+                yield b'x' * 1000
+            response_class = SlotFreeResponse if name == 'cached' else StreamingResponse
+            return response_class(body())
+
+        config = {'MODEL_REGISTRY_ARTEFACT_CONCURRENCY': '1', 'MODEL_REGISTRY_ARTEFACT_QUEUE': '0'}
+        kwargs = admission_from_config(config)
+        kwargs.update(settings)
+        self.settings = kwargs
+        self.active_while_sending = []
+        app.add_middleware(AdmissionMiddleware, **kwargs)
+        return TestClient(app)
+
+    def test_saturated_artefact_pool_returns_503_without_blocking_metadata(self):
+        client = self.make_client()
+        # Simulate a long-running download holding the only artefact slot.
+        asyncio.run(self.settings['artefact_pool'].acquire())
+
+        response = client.get('/models/1/artefact')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['retry-after'], '1')
+
+        response = client.get('/models/1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_request_rate_limit_returns_429(self):
+        client = self.make_client(requests_per_second=2)
+
+        statuses = [client.get('/models/1', auth=('alice', 'pw')).status_code for _ in range(3)]
+        # Admission runs before authentication, so another username from the same address is no way around the limit.
+        other = client.get('/models/1', auth=('bob', 'pw'))
+
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(other.status_code, 429)
+
+    def test_bandwidth_limit_slows_downloads(self):
+        client = self.make_client(bytes_per_second=10_000)
+
+        started = time.monotonic()
+        sizes = [len(client.get('/models/1/artefact').content) for _ in range(3)]
+
+        self.assertEqual(sizes, [5000] * 3)
+        # The first 10 KB is the burst allowance; the next 5 KB had to wait for refills.
+        self.assertGreater(time.monotonic() - started, 0.3)
+
+    def test_responses_sent_from_the_event_loop_give_up_their_slot(self):
+        client = self.make_client()
+
+        self.assertEqual(client.get('/models/1/artefact/members/cached').status_code, 200)
+        self.assertEqual(client.get('/models/1/artefact/members/streamed').status_code, 200)
+
+        self.assertEqual(self.active_while_sending, [0, 1])
+        self.assertEqual(self.settings['artefact_pool'].active, 0)
+
+
+class TestThrottledZeroCopySend(unittest.TestCase):
+    """
+    Test suite for bandwidth limits on zero-copy sends.
+    """
+
+    def test_zero_copy_send_is_split_and_paced(self):
+        with tempfile.TemporaryFile() as f:
+            f.write(os.urandom(3 * 1024 * 1024 + 5))
+            f.flush()
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+
+            async def scenario():
+                throttled = _throttled(send, TokenBucket(rate=10 * 1024 * 1024, capacity=1024 * 1024))
+                await throttled({'type': 'http.response.zerocopysend', 'file': f.fileno(), 'offset': 5,
+                                 'count': 3 * 1024 * 1024, 'more_body': False})
+
+            started = time.monotonic()
+            asyncio.run(scenario())
+
+        self.assertEqual([(message['offset'], message['count'], message['more_body']) for message in sent],
+                         [(5, 1024 * 1024, True), (5 + 1024 * 1024, 1024 * 1024, True),
+                          (5 + 2 * 1024 * 1024, 1024 * 1024, False)])
+        # The first MiB is the burst allowance; the other two had to wait for refills at 10 MiB/s.
+        self.assertGreater(time.monotonic() - started, 0.15)
+
+
+if __name__ == '__main__':
+    unittest.main()
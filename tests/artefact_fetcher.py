@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from src.artefact_fetcher import ArtefactFetcher, FlightCancelled
+from src.storage import ArtefactStream
+
+
+class TestArtefactFetcher(unittest.TestCase):
+    """
+    Test suite for single-flight artefact fetching.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.fetcher = ArtefactFetcher(self.tmp.name)
+        self.chunks = [os.urandom(64 * 1024) for _ in range(20)]
+        self.checksums = {'sha256': hashlib.sha256(b''.join(self.chunks)).hexdigest()}
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _slow_stream(self, model_id, expected=None):
+        def chunks():
+            for chunk in self.chunks:
+                time.sleep(0.005)
+                yield chunk
+        return ArtefactStream(sum(map(len, self.chunks)), chunks())
+
+    @patch('src.artefact_fetcher.stream_artefact')
+    def test_concurrent_downloads_share_one_fetch(self, mock_stream):
+        """
+        Test that 50 concurrent clients all receive the full artefact from a single upstream fetch.
+        """
+        mock_stream.side_effect = self._slow_stream
+        results = []
+
+        def client():
+            results.append(b''.join(self.fetcher.fetch('model-1', self.checksums).iter_bytes()))
+
+        threads = [threading.Thread(target=client) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(mock_stream.call_count, 1)
+        self.assertEqual(self.fetcher.upstream_fetches, 1)
+        self.assertTrue(all(result == b''.join(self.chunks) for result in results))
+        with open(os.path.join(self.tmp.name, 'model-1', f"artefact.{self.checksums['sha256']}"), 'rb') as f:
+            self.assertEqual(f.read(), b''.join(self.chunks))
+
+    @patch('src.artefact_fetcher.stream_artefact')
+    def test_missing_artefact(self, mock_stream):
+        """
+        Test that fetching a model without an artefact returns None and caches nothing.
+        """
+        mock_stream.return_value = None
+
+        self.assertIsNone(self.fetcher.fetch('model-1', self.checksums))
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    @patch('src.artefact_fetcher.stream_artefact')
+    def test_failed_fetch_is_not_cached(self, mock_stream):
+        """
+        Test that a fetch failing part way raises in readers and leaves no file behind.
+        """
+        def failing(model_id, expected=None):
+            def chunks():
+                yield self.chunks[0]
+                raise IOError('connection reset')
+            return ArtefactStream(sum(map(len, self.chunks)), chunks())
+
+        mock_stream.side_effect = failing
+        flight = self.fetcher.fetch('model-1', self.checksums)
+
+        with self.assertRaises(IOError):
+            b''.join(flight.iter_bytes())
+        time.sleep(0.05)
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'model-1')), [])
+
+    @patch('src.artefact_fetcher.stream_artefact')
+    def test_async_readers_follow_the_fetch_on_one_thread(self, mock_stream):
+        """
+        Test that 50 async readers on one event loop each receive the full artefact while it is fetched.
+        """
+        mock_stream.side_effect = self._slow_stream
+        flight = self.fetcher.fetch('model-1', self.checksums)
+
+        async def read():
+            return b''.join([data async for data in flight.aiter_bytes()])
+
+        async def read_all():
+            return await asyncio.gather(*(read() for _ in range(50)))
+
+        results = asyncio.run(read_all())
+
+        self.assertEqual(self.fetcher.upstream_fetches, 1)
+        self.assertTrue(all(result == b''.join(self.chunks) for result in results))
+        self.assertEqual(flight._waiters, set())
+
+    @patch('src.artefact_fetcher.stream_artefact')
+    def test_ids_outside_the_cache_dir_are_refused(self, mock_stream):
+        """
+        Test that model IDs which are path components, and artefacts without a SHA-256, are not fetched into the cache.
+        """
+        for model_id in ('', '.', '..', 'a/../../etc'):
+            self.assertIsNone(self.fetcher.fetch(model_id, self.checksums))
+        self.assertIsNone(self.fetcher.fetch('model-1', {}))
+        mock_stream.assert_not_called()
+
+    @patch('src.artefact_fetcher.stream_artefact')
+    def test_least_recently_used_artefacts_are_evicted(self, mock_stream):
+        """
+        Test that fetches beyond the size cap evict the artefacts used longest ago.
+        """
+        mock_stream.side_effect = lambda model_id, expected=None: ArtefactStream(1000, iter([b'x' * 1000]))
+        self.fetcher.max_bytes = 3500
+        sha256 = self.checksums['sha256']
+
+        for i, model_id in enumerate(['model-1', 'model-2', 'model-3']):
+            b''.join(self.fetcher.fetch(model_id, self.checksums).iter_bytes())
+            time.sleep(0.05)
+            os.utime(os.path.join(self.tmp.name, model_id, f'artefact.{sha256}'), (1000 + i, 1000 + i))
+        self.fetcher.touch('model-1', sha256)
+        b''.join(self.fetcher.fetch('model-4', self.checksums).iter_bytes())
+        time.sleep(0.05)
+
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ['model-1', 'model-3', 'model-4'])
+        self.assertEqual(self.fetcher.evictions, 1)
+
+    @patch('src.artefact_fetcher.stream_artefact')
+    def test_cancelled_fetch_is_not_cached(self, mock_stream):
+        """
+        Test that cancelling a fetch stops it, fails its readers and lets the next request start a fresh fetch.
+        """
+        mock_stream.side_effect = self._slow_stream
+        flight = self.fetcher.fetch('model-1', self.checksums)
+
+        self.assertEqual(self.fetcher.cancel('model-1'), 1)
+        with self.assertRaises(FlightCancelled):
+            b''.join(flight.iter_bytes())
+        time.sleep(0.05)
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'model-1')), [])
+
+        self.assertEqual(b''.join(self.fetcher.fetch('model-1', self.checksums).iter_bytes()), b''.join(self.chunks))
+        self.assertEqual(self.fetcher.upstream_fetches, 2)
+        self.assertEqual(mock_stream.call_args.kwargs['expected'], self.checksums)
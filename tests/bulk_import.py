@@ -0,0 +1,99 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from src.bulk_import import import_manifest, read_manifest
+
+
+class TestBulkImport(unittest.TestCase):
+    """
+    Test suite for the bulk import pipeline.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.artefact = os.path.join(self.tmp.name, 'model.bin')
+        with open(self.artefact, 'wb') as f:
+            f.write(b'weights')
+        self.manifest = os.path.join(self.tmp.name, 'manifest.jsonl')
+        with open(self.manifest, 'w') as f:
+            for i in range(60):
+                record = {'name': f'model-{i}', 'tags': {'zoo': 'test'}}
+                if i % 2 == 0:
+                    record['artefact'] = self.artefact
+                f.write(json.dumps(record) + '\n')
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_read_csv_manifest(self):
+        """
+        Test that CSV manifests are read with JSON-encoded tags and blank columns treated as missing.
+        """
+        path = os.path.join(self.tmp.name, 'manifest.csv')
+        with open(path, 'w') as f:
+            f.write('model_id,name,description,tags,artefact\n')
+            f.write('m1,First,,"{""a"": 1}",\n')
+
+        entries = list(read_manifest(path))
+
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].model_id, 'm1')
+        self.assertEqual(entries[0].tags, {'a': 1})
+        self.assertIsNone(entries[0].description)
+        self.assertIsNone(entries[0].artefact)
+
+    @patch('src.bulk_import.store_artefact')
+    @patch('src.bulk_import.ModelTable')
+    def test_import_batches_metadata_and_uploads_artefacts(self, mock_table, mock_store):
+        """
+        Test that metadata is written in batches of 25 and every artefact is uploaded once.
+        """
+        report = import_manifest(self.manifest, upload_workers=4, queue_size=2)
+
+        self.assertEqual(mock_table.batch_write.call_count, 3)
+        self.assertEqual(mock_store.call_count, 30)
+        self.assertEqual(report.metadata.items, 60)
+        self.assertEqual(report.upload.items, 30)
+        self.assertEqual(report.failures, [])
+
+    @patch('src.bulk_import.store_artefact')
+    @patch('src.bulk_import.ModelTable')
+    def test_resume_after_failed_uploads(self, mock_table, mock_store):
+        """
+        Test that a rerun skips finished entries and retries failed uploads under the same model IDs.
+        """
+        mock_store.side_effect = Exception('network down')
+        first = import_manifest(self.manifest)
+        failed_ids = sorted(call.args[0] for call in mock_store.call_args_list)
+
+        mock_store.reset_mock(side_effect=True)
+        second = import_manifest(self.manifest)
+
+        self.assertEqual(len(first.failures), 30)
+        self.assertEqual(second.skipped, 30)
+        self.assertEqual(second.failures, [])
+        self.assertEqual(sorted(call.args[0] for call in mock_store.call_args_list), failed_ids)
+
+    @patch('src.bulk_import.record_change')
+    @patch('src.bulk_import.store_artefact')
+    @patch('src.bulk_import.ModelTable')
+    def test_resume_after_crash_reuses_generated_ids(self, mock_table, mock_store, mock_record_change):
+        """
+        Test that a crash between a batch write and its checkpoint does not give the batch new IDs on resume.
+        """
+        mock_record_change.side_effect = RuntimeError('crashed')
+        with self.assertRaises(RuntimeError):
+            import_manifest(self.manifest)
+        written = [call.kwargs['model_id'] for call in mock_table.call_args_list]
+
+        mock_table.reset_mock()
+        mock_record_change.side_effect = None
+        import_manifest(self.manifest)
+        rewritten = [call.kwargs['model_id'] for call in mock_table.call_args_list]
+
+        self.assertEqual(len(written), 25)
+        self.assertEqual(rewritten[:25], written)
+        self.assertEqual(len(set(rewritten)), 60)
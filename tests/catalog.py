@@ -0,0 +1,99 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch, MagicMock
+
+from src.catalog import Catalog, CatalogRecord
+from src.changefeed import CREATE, DELETE, ChangeEvent
+
+
+def make_model(model_id, name='model', tags=None, updated=1_700_000_000):
+    model = MagicMock(model_id=model_id, version=1, tags=tags,
+                      last_updated_at=datetime.fromtimestamp(updated, tz=timezone.utc))
+    model.name = name
+    return model
+
+
+class TestCatalog(unittest.TestCase):
+    """
+    Test suite for the in-memory model catalog.
+    """
+
+    @patch('src.catalog.ModelTable')
+    def test_load_builds_compact_records(self, mock_table):
+        """
+        Test that a load keeps only the catalog fields, with tag keys shared between records.
+        """
+        mock_table.scan.return_value = [make_model(f'model-{i}', tags={''.join(['te', 'am']): 'vision'})
+                                        for i in range(3)]
+        catalog = Catalog()
+
+        self.assertEqual(catalog.load(), 3)
+        records = list(catalog)
+        self.assertFalse(hasattr(records[0], '__dict__'))
+        self.assertIs(records[0].tags[0][0], records[1].tags[0][0])
+        self.assertIs(records[0].tags[0][0], sys.intern('team'))
+        self.assertEqual(catalog.watermark, 1_700_000_000)
+
+    @patch('src.catalog.ModelTable.scan')
+    def test_refresh_only_reads_changes(self, mock_scan):
+        """
+        Test that a refresh scans with a last_updated_at filter and merges what it finds.
+        """
+        mock_scan.return_value = [make_model('model-1'), make_model('model-2')]
+        catalog = Catalog()
+        catalog.load()
+
+        mock_scan.reset_mock()
+        mock_scan.return_value = [make_model('model-2', name='renamed', updated=1_700_000_100)]
+        self.assertEqual(catalog.refresh(), 1)
+
+        condition = mock_scan.call_args.args[0]
+        self.assertEqual(condition.operator, '>')
+        self.assertEqual(catalog.get('model-2').name, 'renamed')
+        self.assertEqual(len(catalog), 2)
+        self.assertEqual(catalog.watermark, 1_700_000_100)
+
+    def test_apply_delete(self):
+        """
+        Test that applying a None record removes the model.
+        """
+        catalog = Catalog()
+        catalog.apply('model-1', CatalogRecord('model-1', 'model', 1, 1.0))
+        catalog.apply('model-1', None)
+
+        self.assertIsNone(catalog.get('model-1'))
+
+    def test_save_and_restore(self):
+        """
+        Test that a saved snapshot restores the same records and watermark.
+        """
+        catalog = Catalog()
+        for i in range(10):
+            catalog.apply(f'model-{i}', CatalogRecord(f'model-{i}', f'name-{i}', i, float(i),
+                                                      (('team', 'vision'), ('step', i))))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'catalog.json')
+            catalog.save(path)
+            restored = Catalog.from_file(path)
+
+        self.assertEqual(len(restored), 10)
+        self.assertEqual(restored.watermark, 9.0)
+        self.assertEqual(restored.get('model-7').tag_dict(), {'team': 'vision', 'step': 7})
+        self.assertEqual(restored.get('model-7').version, 7)
+
+    @patch('src.catalog.ModelTable.get')
+    def test_apply_change_events(self, mock_get):
+        """
+        Test that change feed events re-read created models and drop deleted ones.
+        """
+        mock_get.return_value = make_model('model-1', name='fresh')
+        catalog = Catalog()
+
+        catalog.apply_change(ChangeEvent('seq-1', 'model-1', CREATE, 0.0))
+        self.assertEqual(catalog.get('model-1').name, 'fresh')
+
+        catalog.apply_change(ChangeEvent('seq-2', 'model-1', DELETE, 0.0))
+        self.assertIsNone(catalog.get('model-1'))
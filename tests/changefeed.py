@@ -0,0 +1,145 @@
+import os
+import tempfile
+import time
+import unittest
+
+from moto import mock_dynamodb
+
+from src.changefeed import (CREATE, DELETE, UPDATE, ChangeEvent, ChangeFeedConsumer, ChangeLog, DynamoChangeLog,
+                            InMemoryChangeLog)
+from src.ids import id_floor
+from src.models import ChangeLogTable
+
+
+class TestChangeFeedConsumer(unittest.TestCase):
+    """
+    Test suite for tailing the change log, against the in-memory stand-in.
+    """
+
+    def setUp(self) -> None:
+        self.log = InMemoryChangeLog()
+        self.received = []
+
+    def test_delivers_new_events_in_order_once(self):
+        """
+        Test that each poll delivers only events not delivered before, oldest first.
+        """
+        consumer = ChangeFeedConsumer(self.log)
+        consumer.subscribe(self.received.append)
+        self.log.append('model-1', CREATE)
+        self.log.append('model-1', UPDATE)
+
+        self.assertEqual(consumer.poll(), 2)
+        self.log.append('model-1', DELETE)
+        self.assertEqual(consumer.poll(), 1)
+        self.assertEqual(consumer.poll(), 0)
+
+        self.assertEqual([event.operation for event in self.received], [CREATE, UPDATE, DELETE])
+        self.assertIsNotNone(consumer.latency_percentile(99))
+
+    def test_late_writer_within_lookback_is_not_missed(self):
+        """
+        Test that an event recorded with an older sequence after the consumer moved past it is still delivered.
+        """
+        consumer = ChangeFeedConsumer(self.log, lookback=5.0)
+        consumer.subscribe(self.received.append)
+        self.log.append('model-1', CREATE)
+        consumer.poll()
+
+        late = ChangeEvent(id_floor(time.time() - 2) + '0', 'model-2', CREATE, time.time())
+        self.log._sequences.insert(0, late.sequence)
+        self.log._events.insert(0, late)
+
+        self.assertEqual(consumer.poll(), 1)
+        self.assertEqual(self.received[-1].model_id, 'model-2')
+
+    def test_resumes_from_checkpoint(self):
+        """
+        Test that a new consumer with the same checkpoint picks up events recorded while it was down.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = os.path.join(tmp, 'checkpoint')
+            first = ChangeFeedConsumer(self.log, checkpoint_path=checkpoint, lookback=0)
+            self.log.append('model-1', CREATE)
+            first.poll()
+
+            self.log.append('model-2', CREATE)
+            second = ChangeFeedConsumer(self.log, checkpoint_path=checkpoint, lookback=0)
+            second.subscribe(self.received.append)
+            second.poll()
+
+        self.assertEqual([event.model_id for event in self.received], ['model-2'])
+
+    def test_subscriber_errors_do_not_stop_delivery(self):
+        """
+        Test that a failing subscriber does not prevent others from receiving the event.
+        """
+        consumer = ChangeFeedConsumer(self.log)
+        consumer.subscribe(lambda event: 1 / 0)
+        consumer.subscribe(self.received.append)
+        self.log.append('model-1', CREATE)
+
+        consumer.poll()
+
+        self.assertEqual(len(self.received), 1)
+
+    def test_background_propagation(self):
+        """
+        Test that a started consumer delivers events within a poll interval.
+        """
+        consumer = ChangeFeedConsumer(self.log, poll_interval=0.01)
+        consumer.subscribe(self.received.append)
+        consumer.start()
+        try:
+            self.log.append('model-1', CREATE)
+            deadline = time.time() + 2
+            while not self.received and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            consumer.stop()
+
+        self.assertEqual(len(self.received), 1)
+        self.assertLess(consumer.latency_percentile(50), 1.0)
+
+    def test_change_logs_must_implement_append_and_read_after(self):
+        """
+        Test that a change log missing either operation cannot be created.
+        """
+        class AppendOnly(ChangeLog):
+            def append(self, model_id, operation):
+                return ChangeEvent('0', model_id, operation, 0.0)
+
+        with self.assertRaises(TypeError):
+            AppendOnly()
+
+
+@mock_dynamodb
+class TestDynamoChangeLog(unittest.TestCase):
+    """
+    Test suite for the change log stored in DynamoDB.
+    """
+
+    def setUp(self) -> None:
+        ChangeLogTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        self.log = DynamoChangeLog(shards=4)
+
+    def test_events_are_spread_over_shards_and_read_in_order(self):
+        """
+        Test that appends go to several hash keys and reads merge them back into sequence order.
+        """
+        appended = [self.log.append(f'model-{i}', CREATE) for i in range(20)]
+
+        shards = {item.shard for item in ChangeLogTable.scan()}
+        self.assertGreater(len(shards), 1)
+        self.assertLessEqual(shards, {f'changes-{index}' for index in range(4)})
+        self.assertEqual(self.log.read_after(id_floor(0)), appended)
+        self.assertEqual(self.log.read_after(appended[4].sequence, limit=6), appended[5:11])
+
+    def test_changes_to_one_model_share_a_shard(self):
+        """
+        Test that all events of a model are stored under the same hash key.
+        """
+        self.log.append('model-1', CREATE)
+        self.log.append('model-1', UPDATE)
+
+        self.assertEqual({item.shard for item in ChangeLogTable.scan()}, {self.log.shard('model-1')})
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import unittest
+
+from src.checksums import ArtefactDigest, ArtefactIntegrityError, HashingReader
+
+
+class TestArtefactDigest(unittest.TestCase):
+    """
+    Test suite for incremental artefact checksums.
+    """
+
+    def setUp(self) -> None:
+        self.part_size = 1024
+        self.data = os.urandom(self.part_size * 3 + 100)
+
+    def test_single_part_etag_is_md5(self):
+        """
+        Test that artefacts smaller than one part get a plain MD5 ETag, as a single PutObject would.
+        """
+        digest = ArtefactDigest(part_size=self.part_size)
+        digest.update(self.data[:500])
+
+        self.assertEqual(digest.etag, hashlib.md5(self.data[:500]).hexdigest())
+        self.assertEqual(digest.sha256, hashlib.sha256(self.data[:500]).hexdigest())
+
+    def test_multipart_etag(self):
+        """
+        Test that larger artefacts get the multipart ETag: MD5 of the part MD5s, suffixed with the part count.
+        """
+        digest = ArtefactDigest(part_size=self.part_size)
+        digest.update(self.data)
+
+        parts = [self.data[i:i + self.part_size] for i in range(0, len(self.data), self.part_size)]
+        expected = hashlib.md5(b''.join(hashlib.md5(part).digest() for part in parts)).hexdigest()
+        self.assertEqual(digest.etag, f'{expected}-4')
+        self.assertEqual(digest.size, len(self.data))
+
+    def test_chunking_does_not_change_checksums(self):
+        """
+        Test that the checksums do not depend on how the stream is split into chunks.
+        """
+        whole = ArtefactDigest(part_size=self.part_size)
+        whole.update(self.data)
+        chunked = ArtefactDigest(part_size=self.part_size)
+        for i in range(0, len(self.data), 333):
+            chunked.update(self.data[i:i + 333])
+
+        self.assertEqual(whole.as_dict(), chunked.as_dict())
+
+    def test_verify_detects_mismatch(self):
+        """
+        Test that verify passes for matching checksums, ignores missing ones and raises on a mismatch.
+        """
+        digest = ArtefactDigest(part_size=self.part_size)
+        digest.update(self.data)
+
+        digest.verify(digest.as_dict())
+        digest.verify({'etag': digest.etag})
+        with self.assertRaises(ArtefactIntegrityError):
+            digest.verify({**digest.as_dict(), 'sha256': hashlib.sha256(b'other').hexdigest()})
+
+    def test_hashing_reader_is_single_pass(self):
+        """
+        Test that HashingReader checksums exactly the bytes read through it and does not look seekable.
+        """
+        class Source:
+            def __init__(self, data):
+                self.data, self.offset = data, 0
+
+            def read(self, size=-1):
+                end = len(self.data) if size < 0 else self.offset + size
+                chunk, self.offset = self.data[self.offset:end], min(end, len(self.data))
+                return chunk
+
+        reader = HashingReader(Source(self.data), ArtefactDigest(part_size=self.part_size))
+        while reader.read(700):
+            pass
+
+        self.assertFalse(hasattr(reader, 'seek'))
+        self.assertEqual(reader.digest.sha256, hashlib.sha256(self.data).hexdigest())
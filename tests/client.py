@@ -0,0 +1,320 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import httpx
+from fastapi.testclient import TestClient
+from moto import mock_dynamodb
+
+from src.client import AsyncRegistryClient, RegistryClient, RegistryError, RetryPolicy
+
+AUTH = ('user', 'password')
+
+
+@mock_dynamodb
+class TestRegistryClient(unittest.TestCase):
+    """
+    Test suite for the registry client against the server app.
+    """
+
+    def setUp(self) -> None:
+        import server
+        import storage
+        from models import ModelTable
+        ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        self.tmp = tempfile.TemporaryDirectory()
+        patcher = patch('storage.backend', storage.backend_from_config({
+            'MODEL_REGISTRY_STORAGE': 'local', 'MODEL_REGISTRY_STORAGE_DIR': os.path.join(self.tmp.name, 'store')}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server = server
+        self.storage = storage
+        test_client = TestClient(server.app)
+        test_client.auth = AUTH
+        self.client = RegistryClient('', client=test_client, cache_dir=os.path.join(self.tmp.name, 'cache'))
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.tmp.cleanup()
+
+    def test_metadata_round_trip_with_revalidation(self):
+        created = self.client.create_model('resnet', tags={'team': 'vision'})
+        model_id = created['model_id']
+
+        first = self.client.read_model(model_id)
+        self.assertEqual((first['name'], first['tags']), ('resnet', {'team': 'vision'}))
+        with patch('server.model_etag', wraps=self.server.model_etag) as etag:
+            self.assertEqual(self.client.read_model(model_id), first)
+            self.assertEqual(etag.call_count, 1)
+        self.assertEqual(self.client.cache.revalidations, 1)
+
+        first['tags']['team'] = 'changed by the caller'
+        self.assertEqual(self.client.read_model(model_id)['tags'], {'team': 'vision'})
+
+        updated = self.client.update_model(model_id, description='v2')
+        self.assertEqual(self.client.read_model(model_id)['description'], 'v2')
+        self.assertEqual(updated['description'], 'v2')
+
+        self.assertTrue(self.client.delete_model(model_id))
+        self.assertIsNone(self.client.read_model(model_id))
+        self.assertFalse(self.client.delete_model(model_id))
+        self.assertIsNone(self.client.update_model(model_id, name='gone'))
+
+    def test_read_models_skips_missing(self):
+        ids = [self.client.create_model(f'model-{i}')['model_id'] for i in range(5)]
+
+        models = self.client.read_models(ids + ['missing'])
+
+        self.assertEqual(sorted(models), sorted(ids))
+
+    def test_fetch_artefact_downloads_only_when_changed(self):
+        model_id = self.client.create_model('bert')['model_id']
+        source = os.path.join(self.tmp.name, 'weights.bin')
+        with open(source, 'wb') as f:
+            f.write(os.urandom(100_000))
+        checksums = self.client.upload_artefact(model_id, source)
+
+        with patch.object(self.client, 'download_artefact', wraps=self.client.download_artefact) as download:
+            path = self.client.fetch_artefact(model_id)
+            self.assertEqual(self.client.fetch_artefact(model_id), path)
+            self.assertEqual(download.call_count, 1)
+        with open(path, 'rb') as cached, open(source, 'rb') as original:
+            self.assertEqual(cached.read(), original.read())
+
+        with open(source, 'wb') as f:
+            f.write(b'replaced')
+        self.assertNotEqual(self.client.upload_artefact(model_id, source)['sha256'], checksums['sha256'])
+        with open(self.client.fetch_artefact(model_id), 'rb') as f:
+            self.assertEqual(f.read(), b'replaced')
+
+    def test_upload_for_missing_model_is_refused(self):
+        source = os.path.join(self.tmp.name, 'weights.bin')
+        with open(source, 'wb') as f:
+            f.write(b'weights')
+
+        with self.assertRaises(RegistryError) as raised:
+            self.client.upload_artefact('missing', source)
+
+        self.assertEqual(raised.exception.status_code, 404)
+        self.assertEqual(list(self.storage.backend.list()), [])
+
+    def test_local_copy_removed_before_it_is_opened_falls_back_to_storage(self):
+        model_id = self.client.create_model('bert')['model_id']
+        source = os.path.join(self.tmp.name, 'weights.bin')
+        with open(source, 'wb') as f:
+            f.write(b'weights')
+        self.client.upload_artefact(model_id, source)
+        target = os.path.join(self.tmp.name, 'out', 'artefact')
+
+        with patch('server.local_artefact_path', return_value=os.path.join(self.tmp.name, 'evicted')):
+            self.client.download_artefact(model_id, target)
+
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'weights')
+
+    def test_corrupt_download_leaves_nothing(self):
+        model_id = self.client.create_model('bert')['model_id']
+        source = os.path.join(self.tmp.name, 'weights.bin')
+        with open(source, 'wb') as f:
+            f.write(b'weights')
+        self.client.upload_artefact(model_id, source)
+        target = os.path.join(self.tmp.name, 'out', 'artefact')
+
+        with self.assertRaises(Exception) as raised:
+            self.client.download_artefact(model_id, target, {'sha256': '0' * 64})
+
+        self.assertIn('checksum mismatch', str(raised.exception))
+        self.assertEqual(os.listdir(os.path.dirname(target)), [])
+        with self.assertRaises(RegistryError):
+            self.client.download_artefact('missing', target)
+
+    def test_async_client(self):
+        model_id = self.client.create_model('whisper')['model_id']
+
+        async def run():
+            async with AsyncRegistryClient('', client=httpx.AsyncClient(
+                    app=self.server.app, base_url='http://testserver', auth=AUTH)) as client:
+                first = await client.read_models([model_id, 'missing'])
+                second = await client.read_model(model_id)
+                return first, second, client.cache.revalidations
+
+        first, second, revalidations = asyncio.run(run())
+
+        self.assertEqual(list(first), [model_id])
+        self.assertEqual(second, first[model_id])
+        self.assertEqual(revalidations, 1)
+
+
+@mock_dynamodb
+class TestServerArtefactCache(unittest.TestCase):
+    """
+    Test suite for the server's local artefact cache staying current as artefacts change.
+    """
+
+    def setUp(self) -> None:
+        import server
+        import storage
+        from artefact_fetcher import ArtefactFetcher
+        from models import ModelTable
+        ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        for patcher in (patch('storage.backend', storage.backend_from_config({
+                            'MODEL_REGISTRY_STORAGE': 'local',
+                            'MODEL_REGISTRY_STORAGE_DIR': os.path.join(self.tmp.name, 'store')})),
+                        patch('local_artefacts.artefact_cache_dir', self.cache_dir),
+                        patch('server.artefact_fetcher', ArtefactFetcher(self.cache_dir))):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.server = server
+        self.http = TestClient(server.app)
+        self.http.auth = AUTH
+        self.client = RegistryClient('', client=self.http)
+        self.model_id = self.client.create_model('bert')['model_id']
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def _upload(self, data: bytes) -> None:
+        source = os.path.join(self.tmp.name, 'weights.bin')
+        with open(source, 'wb') as f:
+            f.write(data)
+        self.client.upload_artefact(self.model_id, source)
+
+    def _cache(self) -> None:
+        self.assertEqual(self.http.post(f'/models/{self.model_id}/prefetch').status_code, 202)
+        directory = os.path.join(self.cache_dir, self.model_id)
+        for _ in range(100):
+            if os.path.isdir(directory) and any(not name.endswith('.partial') for name in os.listdir(directory)):
+                return
+            time.sleep(0.01)
+        self.fail('the artefact was not cached')
+
+    def test_reupload_is_served_instead_of_the_cached_copy(self):
+        self._upload(b'old-bytes')
+        self._cache()
+
+        self._upload(b'new-bytes')
+
+        self.assertEqual(self.http.get(f'/models/{self.model_id}/artefact').content, b'new-bytes')
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, self.model_id)), [])
+
+    def test_reupload_is_served_even_if_the_eviction_is_missed(self):
+        self._upload(b'old-bytes')
+        self._cache()
+
+        with patch('server.forget_cached_artefact'):
+            self._upload(b'new-bytes')
+
+        self.assertEqual(self.http.get(f'/models/{self.model_id}/artefact').content, b'new-bytes')
+
+    def test_deleted_model_is_not_served_from_the_cache(self):
+        self._upload(b'old-bytes')
+        self._cache()
+
+        self.assertTrue(self.client.delete_model(self.model_id))
+
+        self.assertEqual(self.http.get(f'/models/{self.model_id}/artefact').status_code, 404)
+        self.assertEqual(os.listdir(os.path.join(self.cache_dir, self.model_id)), [])
+
+
+class TestRequestPaths(unittest.TestCase):
+    """
+    Test suite for the URLs the client requests.
+    """
+
+    def test_member_and_tensor_names_are_escaped(self):
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.raw_path)
+            return httpx.Response(200, content=b'', headers={'X-Tensor-Dtype': 'U8', 'X-Tensor-Shape': '0'})
+
+        with RegistryClient('', client=httpx.Client(base_url='http://registry',
+                                                    transport=httpx.MockTransport(handler))) as client:
+            client.read_member('model-1', 'configs/a b?c#d%e.json')
+            client.read_tensor('model-1', 'layers/0?x')
+
+        self.assertEqual(paths, [b'/models/model-1/artefact/members/configs/a%20b%3Fc%23d%25e.json',
+                                 b'/models/model-1/artefact/tensors/layers/0%3Fx'])
+
+    def test_model_ids_are_escaped(self):
+        paths = []
+
+        def handler(request):
+            paths.append(request.url.raw_path)
+            return httpx.Response(404, json={'detail': 'Model not found'})
+
+        with RegistryClient('', client=httpx.Client(base_url='http://registry',
+                                                    transport=httpx.MockTransport(handler))) as client:
+            client.read_model('a/b?c#d%e')
+            client.delete_model('a/b?c#d%e')
+            with self.assertRaises(RegistryError):
+                client.list_tensors('a/b?c#d%e')
+            with self.assertRaises(RegistryError):
+                client.read_member('a/b?c#d%e', 'config.json')
+
+        self.assertEqual(paths, [b'/models/a%2Fb%3Fc%23d%25e', b'/models/a%2Fb%3Fc%23d%25e',
+                                 b'/models/a%2Fb%3Fc%23d%25e/artefact/tensors',
+                                 b'/models/a%2Fb%3Fc%23d%25e/artefact/members/config.json'])
+
+
+class TestRetries(unittest.TestCase):
+    """
+    Test suite for retrying failed requests.
+    """
+
+    def client(self, statuses):
+        responses = iter(statuses)
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request)
+            status = next(responses)
+            return httpx.Response(status, json={'model_id': 'model-1', 'detail': 'busy'},
+                                  headers={'Retry-After': '1'} if status == 503 else {})
+
+        return RegistryClient('', client=httpx.Client(base_url='http://registry', transport=httpx.MockTransport(handler)))
+
+    @patch('src.client.time.sleep')
+    def test_rejected_requests_are_retried_after_retry_after(self, mock_sleep):
+        client = self.client([503, 503, 200])
+
+        self.assertEqual(client.read_model('model-1'), {'model_id': 'model-1', 'detail': 'busy'})
+
+        self.assertEqual((len(self.requests), client.retries), (3, 2))
+        self.assertTrue(all(call.args[0] >= 1 for call in mock_sleep.call_args_list))
+
+    @patch('src.client.time.sleep')
+    def test_non_idempotent_requests_are_not_retried_on_gateway_errors(self, mock_sleep):
+        client = self.client([502, 200])
+
+        with self.assertRaises(RegistryError) as raised:
+            client.create_model('resnet')
+
+        self.assertEqual(raised.exception.status_code, 502)
+        self.assertEqual(len(self.requests), 1)
+
+    @patch('src.client.time.sleep')
+    def test_gives_up_after_attempts(self, mock_sleep):
+        client = self.client([504] * 4)
+
+        with self.assertRaises(RegistryError):
+            client.read_model('model-1')
+
+        self.assertEqual(len(self.requests), RetryPolicy().attempts)
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(base_delay=0.1, max_delay=1.0)
+
+        delays = [policy.delay(10) for _ in range(100)]
+
+        self.assertTrue(all(0 <= delay <= 1.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 90)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import threading
+import time
+import unittest
+
+from src.hedging import Hedger, LatencyWindow
+
+
+class TestLatencyWindow(unittest.TestCase):
+    """
+    Test suite for the recent-latency percentile.
+    """
+
+    def test_threshold_needs_samples(self):
+        window = LatencyWindow(percentile=90, window=100, min_samples=10)
+        for latency in range(9):
+            window.record(latency)
+        self.assertIsNone(window.threshold)
+
+        window.record(9)
+
+        self.assertEqual(window.threshold, 9)
+
+    def test_threshold_follows_recent_latency(self):
+        window = LatencyWindow(percentile=50, window=100, min_samples=10)
+        for _ in range(100):
+            window.record(1.0)
+        for _ in range(100):
+            window.record(0.01)
+
+        self.assertEqual(window.threshold, 0.01)
+
+
+class TestHedger(unittest.TestCase):
+    """
+    Test suite for hedged calls.
+    """
+
+    def setUp(self) -> None:
+        self.hedger = Hedger(percentile=90, budget=0.5, min_samples=20, window=100)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self) -> None:
+        self.hedger.close()
+
+    def warm_up(self, kind: str = 'get_item') -> None:
+        for _ in range(20):
+            self.hedger.call(kind, time.sleep, 0.001)
+
+    def first_call_stalls(self, value):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        if call == 1:
+            time.sleep(1)
+        return value
+
+    def test_slow_call_is_hedged_and_hedge_wins(self):
+        self.warm_up()
+
+        start = time.perf_counter()
+        result = self.hedger.call('get_item', self.first_call_stalls, 'answer')
+
+        self.assertEqual(result, 'answer')
+        self.assertLess(time.perf_counter() - start, 0.5)
+        stats = self.hedger.stats()
+        self.assertEqual((stats['hedges'], stats['hedge_wins']), (1, 1))
+
+    def test_no_hedging_until_latency_is_known(self):
+        start = time.perf_counter()
+        self.hedger.call('get_item', self.first_call_stalls, 'answer')
+
+        self.assertGreaterEqual(time.perf_counter() - start, 1)
+        self.assertEqual(self.hedger.hedges, 0)
+
+    def test_budget_caps_hedges(self):
+        hedger = Hedger(percentile=50, budget=0.0, min_samples=5)
+        self.addCleanup(hedger.close)
+        for _ in range(5):
+            hedger.call('get_item', time.sleep, 0.001)
+
+        hedger.call('get_item', time.sleep, 0.05)
+        hedger.call('get_item', time.sleep, 0.05)
+
+        self.assertEqual((hedger.hedges, hedger.hedges_denied), (1, 1))
+
+    def test_error_raised_only_if_every_attempt_fails(self):
+        self.warm_up()
+
+        def fails_slowly():
+            with self.lock:
+                self.calls += 1
+                call = self.calls
+            if call == 1:
+                time.sleep(0.2)
+                raise IOError('primary failed')
+            raise IOError('hedge failed')
+
+        with self.assertRaises(IOError):
+            self.hedger.call('get_item', fails_slowly)
+        self.assertEqual(self.hedger.hedge_wins, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
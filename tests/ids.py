@@ -0,0 +1,62 @@
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from src.ids import ID_LENGTH, ModelIdGenerator, generate_model_id
+
+
+class TestModelIdGenerator(unittest.TestCase):
+    """
+    Test suite for ULID-style model ID generation.
+    """
+
+    def test_ids_are_sortable_by_creation_time(self):
+        """
+        Test that IDs are fixed-length and sort in generation order, including across milliseconds.
+        """
+        first = generate_model_id()
+        time.sleep(0.002)
+        ids = [generate_model_id() for _ in range(1000)]
+
+        self.assertTrue(all(len(model_id) == ID_LENGTH for model_id in ids))
+        self.assertLess(first, ids[0])
+        self.assertEqual(ids, sorted(ids))
+
+    def test_no_collisions_under_concurrent_creates(self):
+        """
+        Stress test: 50,000 IDs generated from 8 threads are all distinct, and each thread sees them strictly increase.
+        """
+        generator = ModelIdGenerator()
+        results = [[] for _ in range(8)]
+
+        def worker(out):
+            for _ in range(6250):
+                out.append(generator.generate())
+
+        threads = [threading.Thread(target=worker, args=(out,)) for out in results]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_ids = [model_id for out in results for model_id in out]
+        self.assertEqual(len(set(all_ids)), 50000)
+        for out in results:
+            self.assertTrue(all(a < b for a, b in zip(out, out[1:])))
+
+    def test_clock_going_backwards_stays_monotonic(self):
+        """
+        Test that IDs keep strictly increasing while the wall clock steps backwards over several calls.
+        """
+        generator = ModelIdGenerator()
+        start_ns = 1_700_000_000_000 * 1_000_000
+        # Forwards, then back a minute, further back, a little forwards but still behind, then past the start.
+        clock = [start_ns, start_ns + 5_000_000, start_ns - 60_000_000_000, start_ns - 120_000_000_000,
+                 start_ns - 119_000_000_000, start_ns - 1_000_000, start_ns + 10_000_000]
+
+        with patch('src.ids.time.time_ns', side_effect=clock):
+            ids = [generator.generate() for _ in clock]
+
+        self.assertTrue(all(a < b for a, b in zip(ids, ids[1:])), ids)
+        self.assertEqual(len(set(ids)), len(clock))
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from src.admission import RELEASE_SLOT
+from src.local_artefacts import LocalArtefactResponse, RangeNotSatisfiable, parse_range
+
+
+class TestParseRange(unittest.TestCase):
+    """
+    Test suite for Range header parsing.
+    """
+
+    def test_ranges(self):
+        self.assertIsNone(parse_range(None, 100))
+        self.assertEqual(parse_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=90-500', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_range('bytes=-500', 100), (0, 99))
+
+    def test_malformed_and_multiple_ranges_are_ignored(self):
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 100))
+        self.assertIsNone(parse_range('items=0-1', 100))
+        self.assertIsNone(parse_range('bytes=9-5', 100))
+
+    def test_unsatisfiable_ranges(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=100-', 100)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=-0', 100)
+
+
+class TestLocalArtefactResponse(unittest.TestCase):
+    """
+    Test suite for serving local artefact copies.
+    """
+
+    def setUp(self) -> None:
+        self.data = os.urandom(10 * 1024 * 1024 + 7)
+        self.tmp = tempfile.NamedTemporaryFile(delete=False)
+        self.tmp.write(self.data)
+        self.tmp.close()
+
+        app = FastAPI()
+
+        @app.get("/artefact")
+        def artefact(request: Request):
+            return LocalArtefactResponse(self.tmp.name, request.headers.get('range'))
+
+        self.client = TestClient(app)
+
+    def tearDown(self) -> None:
+        os.remove(self.tmp.name)
+
+    def test_full_download(self):
+        response = self.client.get("/artefact")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['content-length'], str(len(self.data)))
+        self.assertEqual(response.headers['accept-ranges'], 'bytes')
+        self.assertEqual(response.content, self.data)
+
+    def test_range_download(self):
+        response = self.client.get("/artefact", headers={'Range': 'bytes=100-199'})
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.headers['content-range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(response.content, self.data[100:200])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get("/artefact", headers={'Range': f'bytes={len(self.data)}-'})
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response.headers['content-range'], f'bytes */{len(self.data)}')
+
+    def test_gives_up_admission_slot_before_sending(self):
+        release = Mock()
+        messages = []
+
+        async def send(message):
+            if not messages:
+                self.assertEqual(release.call_count, 1)
+            messages.append(message)
+
+        scope = {'type': 'http', 'extensions': {}, RELEASE_SLOT: release}
+        asyncio.run(LocalArtefactResponse(self.tmp.name)(scope, None, send))
+
+        release.assert_called_once_with()
+        self.assertEqual(b''.join(bytes(m['body']) for m in messages[1:]), self.data)
+
+    def test_file_removed_after_response_is_built_is_still_sent(self):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        response = LocalArtefactResponse(self.tmp.name)
+        os.remove(self.tmp.name)
+        asyncio.run(response({'type': 'http', 'extensions': {}}, None, send))
+        open(self.tmp.name, 'wb').close()
+
+        self.assertEqual(messages[0]['status'], 200)
+        self.assertEqual(b''.join(bytes(m['body']) for m in messages[1:]), self.data)
+
+    def test_missing_file_is_reported_when_building_the_response(self):
+        with self.assertRaises(FileNotFoundError):
+            LocalArtefactResponse(self.tmp.name + '.missing')
@@ -1,6 +1,12 @@
 import unittest
+from unittest.mock import MagicMock, patch
 
-from src.operations import create_model, read_model, update_model, delete_model, ModelTable
+from moto import mock_dynamodb
+
+import src.operations as operations
+from src.operations import (create_model, read_model, update_model, delete_model, batch_read_models,
+                            record_artefact_checksums, ModelTable)
+from src.shared_cache import SharedMetadataCache
 
 
 class TestModelTableFunctions(unittest.TestCase):
@@ -130,3 +136,87 @@ class TestModelTableFunctions(unittest.TestCase):
         # delete the model again
         deleted = delete_model(model_id)
         self.assertFalse(deleted)
+
+
+@mock_dynamodb
+class TestConditionalCreate(unittest.TestCase):
+    """
+    Test suite for creating models without overwriting existing ones.
+    """
+
+    def setUp(self) -> None:
+        ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        create_model('model-1', 'Test Model', 'A test model', {'environment': 'dev'})
+
+    def test_create_existing_model(self):
+        """
+        Test that create_model function returns None and leaves the stored model untouched if the ID is taken.
+        """
+        duplicate = create_model('model-1', "Other Model")
+
+        self.assertIsNone(duplicate)
+        stored = ModelTable.get('model-1')
+        self.assertEqual((stored.name, stored.description), ('Test Model', 'A test model'))
+
+
+@mock_dynamodb
+class TestMutationsWithStaleCache(unittest.TestCase):
+    """
+    Test suite for updates and deletes while the metadata cache holds an out-of-date copy of the model.
+    """
+
+    def setUp(self) -> None:
+        ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        self.cache = SharedMetadataCache(256 * 1024)
+        self.addCleanup(self.cache.close, True)
+        patcher = patch.object(operations, 'metadata_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        create_model('model-1', 'a', tags={'team': 'nlp'})
+        read_model('model-1')
+
+    def test_update_keeps_attributes_written_since_the_cached_read(self):
+        # Written by another worker, whose invalidation this worker's cache never saw.
+        ModelTable('model-1').update(actions=[ModelTable.artefact_checksums.set({'sha256': 'abc'})])
+
+        updated = update_model('model-1', name='b')
+
+        stored = ModelTable.get('model-1')
+        self.assertEqual((stored.name, stored.tags, stored.artefact_checksums),
+                         ('b', {'team': 'nlp'}, {'sha256': 'abc'}))
+        self.assertEqual(updated.artefact_checksums, {'sha256': 'abc'})
+
+    def test_update_and_delete_of_a_model_deleted_elsewhere(self):
+        ModelTable('model-1').delete()
+        self.assertIsNotNone(read_model('model-1'))
+
+        self.assertIsNone(update_model('model-1', name='b'))
+        self.assertFalse(delete_model('model-1'))
+        self.assertEqual(ModelTable.count(), 0)
+
+    def test_checksums_recorded_after_a_delete_are_refused(self):
+        self.assertTrue(delete_model('model-1'))
+
+        self.assertFalse(record_artefact_checksums('model-1', {'sha256': 'abc'}))
+
+
+class TestBatchReadModels(unittest.TestCase):
+    """
+    Test suite for reading several models at once.
+    """
+
+    @patch('src.operations.ModelTable')
+    def test_reads_in_batches_of_100(self, mock_table):
+        """
+        Test that keys are deduplicated and requested at most 100 per BatchGetItem, and missing models are left out.
+        """
+        mock_table.batch_get.side_effect = lambda keys: [MagicMock(model_id=key) for key in keys
+                                                         if key != 'model-7']
+        model_ids = [f'model-{i}' for i in range(250)] + ['model-1']
+
+        models = batch_read_models(model_ids)
+
+        self.assertEqual([len(call.args[0]) for call in mock_table.batch_get.call_args_list], [100, 100, 50])
+        self.assertEqual(len(models), 249)
+        self.assertNotIn('model-7', models)
+        self.assertEqual(models['model-1'].model_id, 'model-1')
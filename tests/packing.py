@@ -0,0 +1,139 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import src.packing as packing
+from src.packing import ChunkReader, PackError, directory_members, extract, iter_pack, read_index
+from src.storage import backend_from_config, read_pack_member, store_packed_artefact, unpack_artefact
+
+
+class TestPackFormat(unittest.TestCase):
+    """
+    Test suite for writing, indexing and extracting packs.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source')
+        self.files = {'config.json': b'{"layers": 2}', 'tokenizer/vocab.txt': os.urandom(3000),
+                      'tokenizer/empty': b'', 'layers/0.json': os.urandom(10)}
+        for name, data in self.files.items():
+            path = os.path.join(self.source, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(data)
+        self.pack = b''.join(iter_pack(directory_members(self.source)))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        return self.pack[offset:offset + length]
+
+    def test_members_are_contiguous_ranges(self):
+        index = read_index(self.read_range, len(self.pack))
+
+        self.assertEqual(sorted(member.name for member in index), sorted(self.files))
+        for member in index:
+            self.assertEqual(self.read_range(member.offset, member.size), self.files[member.name])
+
+    def test_large_index_takes_a_second_read(self):
+        reads = []
+
+        def read_range(offset, length):
+            reads.append((offset, length))
+            return self.read_range(offset, length)
+
+        with patch.object(packing, 'INDEX_READ_SIZE', 32):
+            index = read_index(read_range, len(self.pack))
+
+        self.assertEqual(len(index), len(self.files))
+        self.assertEqual(len(reads), 2)
+
+    def test_not_a_pack(self):
+        with self.assertRaises(PackError):
+            read_index(lambda offset, length: b'\0' * length, 1000)
+
+    def test_extract_selected_members_from_chunks(self):
+        index = read_index(self.read_range, len(self.pack))
+        chunks = [self.pack[i:i + 7] for i in range(0, len(self.pack), 7)]
+        target = os.path.join(self.tmp.name, 'target')
+
+        extracted = extract(index, chunks, target, names=['tokenizer/vocab.txt', 'tokenizer/empty'])
+
+        self.assertEqual(extracted, {'tokenizer/vocab.txt': 3000, 'tokenizer/empty': 0})
+        with open(os.path.join(target, 'tokenizer', 'vocab.txt'), 'rb') as f:
+            self.assertEqual(f.read(), self.files['tokenizer/vocab.txt'])
+        self.assertFalse(os.path.exists(os.path.join(target, 'config.json')))
+
+    def test_extract_detects_corruption(self):
+        index = read_index(self.read_range, len(self.pack))
+        corrupted = bytearray(self.pack)
+        corrupted[index.get('tokenizer/vocab.txt').offset] ^= 0xFF
+
+        with self.assertRaises(PackError):
+            extract(index, [bytes(corrupted)], os.path.join(self.tmp.name, 'target'))
+
+    def test_chunk_reader(self):
+        reader = ChunkReader([b'abc', b'', b'defgh'])
+
+        self.assertEqual(reader.read(4), b'abcd')
+        self.assertEqual(reader.read(), b'efgh')
+        self.assertEqual(reader.read(1), b'')
+
+
+@patch('src.storage.read_model', return_value=None)
+@patch('src.storage.record_artefact_checksums')
+class TestPackedArtefacts(unittest.TestCase):
+    """
+    Test suite for storing and reading packed artefacts, against the local storage backend.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmp.name, 'source')
+        os.makedirs(os.path.join(self.source, 'shards'))
+        for i in range(20):
+            with open(os.path.join(self.source, 'shards', f'{i}.bin'), 'wb') as f:
+                f.write(bytes([i]) * (i * 100))
+        self.backend = backend_from_config({'MODEL_REGISTRY_STORAGE': 'local',
+                                            'MODEL_REGISTRY_STORAGE_DIR': os.path.join(self.tmp.name, 'store')})
+        for patcher in (patch('src.storage.backend', self.backend), patch.dict('src.storage._pack_indexes', clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_member_read_is_one_ranged_read(self, mock_record, mock_read_model):
+        store_packed_artefact('model-1', self.source)
+        self.assertEqual(read_pack_member('model-1', 'shards/3.bin'), bytes([3]) * 300)
+
+        with patch.object(self.backend, 'read_range', wraps=self.backend.read_range) as read_range:
+            self.assertEqual(read_pack_member('model-1', 'shards/7.bin'), bytes([7]) * 700)
+        self.assertEqual(read_range.call_count, 1)
+        self.assertIsNone(read_pack_member('model-1', 'shards/missing.bin'))
+
+    def test_replaced_artefact_refreshes_cached_index(self, mock_record, mock_read_model):
+        store_packed_artefact('model-1', self.source)
+        read_pack_member('model-1', 'shards/1.bin')
+        with open(os.path.join(self.source, 'shards', '1.bin'), 'wb') as f:
+            f.write(b'replaced')
+        store_packed_artefact('model-1', self.source)
+
+        self.assertEqual(read_pack_member('model-1', 'shards/1.bin'), b'replaced')
+
+    def test_unpack_everything(self, mock_record, mock_read_model):
+        store_packed_artefact('model-1', self.source)
+        target = os.path.join(self.tmp.name, 'target')
+
+        extracted = unpack_artefact('model-1', target)
+
+        self.assertEqual(len(extracted), 20)
+        with open(os.path.join(target, 'shards', '19.bin'), 'rb') as f:
+            self.assertEqual(f.read(), bytes([19]) * 1900)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import src.operations as operations
+from src.launcher import serve
+from src.models import ModelTable
+from src.shared_cache import WAYS, SharedMetadataCache
+
+
+def fill_and_invalidate(cache: SharedMetadataCache) -> None:
+    cache.worker = 1
+    value, generation = cache.get('model-2')
+    cache.put('model-2', b'from child', generation)
+    cache.invalidate('model-1')
+
+
+class TestSharedMetadataCache(unittest.TestCase):
+    """
+    Test suite for the shared-memory metadata cache.
+    """
+
+    def setUp(self) -> None:
+        self.cache = SharedMetadataCache(256 * 1024, slot_size=256, ttl=30)
+
+    def tearDown(self) -> None:
+        self.cache.close(unlink=True)
+
+    def test_put_get_invalidate(self):
+        value, generation = self.cache.get('model-1')
+        self.assertIsNone(value)
+
+        self.assertTrue(self.cache.put('model-1', b'{"name": "a"}', generation))
+        self.assertEqual(self.cache.get('model-1')[0], b'{"name": "a"}')
+
+        self.cache.invalidate('model-1')
+        self.assertIsNone(self.cache.get('model-1')[0])
+
+    def test_fill_started_before_invalidation_is_dropped(self):
+        _, generation = self.cache.get('model-1')
+        self.cache.invalidate('model-1')
+
+        self.assertFalse(self.cache.put('model-1', b'stale', generation))
+        self.assertIsNone(self.cache.get('model-1')[0])
+
+    def test_entries_expire(self):
+        self.cache.ttl = 0.05
+        self.cache.put('model-1', b'value', self.cache.get('model-1')[1])
+
+        time.sleep(0.1)
+
+        self.assertIsNone(self.cache.get('model-1')[0])
+
+    def test_full_bucket_evicts_one_entry(self):
+        cache = SharedMetadataCache(6 * 1024, slot_size=128)
+        self.addCleanup(cache.close, True)
+        self.assertEqual(cache.buckets, 1)
+        for i in range(WAYS + 1):
+            cache.put(f'model-{i}', b'value', cache.get(f'model-{i}')[1])
+
+        cached = [i for i in range(WAYS + 1) if cache.get(f'model-{i}')[0] is not None]
+
+        self.assertEqual(len(cached), WAYS)
+        self.assertIn(WAYS, cached)
+
+    def test_oversized_values_are_not_cached(self):
+        self.assertFalse(self.cache.put('model-1', b'x' * 256, 0))
+        self.assertEqual(self.cache.oversized, 1)
+
+    def test_shared_with_forked_workers(self):
+        self.cache.put('model-1', b'from parent', self.cache.get('model-1')[1])
+
+        child = multiprocessing.get_context('fork').Process(target=fill_and_invalidate, args=(self.cache,))
+        child.start()
+        child.join()
+
+        self.assertEqual(child.exitcode, 0)
+        self.assertEqual(self.cache.get('model-2')[0], b'from child')
+        self.assertIsNone(self.cache.get('model-1')[0])
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+
+class TestCachedReads(unittest.TestCase):
+    """
+    Test suite for reading models through the metadata cache.
+    """
+
+    def setUp(self) -> None:
+        self.cache = SharedMetadataCache(256 * 1024)
+        patcher = patch.object(operations, 'metadata_cache', self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.cache.close(unlink=True)
+
+    @patch('src.operations.ModelTable.get')
+    def test_second_read_is_served_from_cache(self, mock_get):
+        mock_get.return_value = ModelTable(model_id='model-1', name='a', tags={'team': 'nlp'})
+
+        operations.read_model('model-1')
+        model = operations.read_model('model-1')
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual((model.name, model.tags), ('a', {'team': 'nlp'}))
+
+    @patch('src.operations.ModelTable.update')
+    @patch('src.operations.ModelTable.get')
+    def test_update_invalidates(self, mock_get, mock_update):
+        mock_get.side_effect = lambda model_id: ModelTable(model_id=model_id, name='a')
+        operations.read_model('model-1')
+
+        operations.update_model('model-1', name='b')
+
+        self.assertIsNone(self.cache.get('model-1')[0])
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_write_behind_and_shared_cache_are_exclusive(self):
+        with self.assertRaises(RuntimeError):
+            operations.enable_write_behind()
+        self.assertIsNone(operations.write_behind_queue)
+
+        with patch.object(operations, 'write_behind_queue', MagicMock()), self.assertRaises(RuntimeError):
+            operations.enable_metadata_cache(self.cache)
+
+    @patch('src.launcher.bind_socket')
+    def test_launcher_refuses_write_behind(self, mock_bind):
+        with patch.dict(os.environ, {'MODEL_REGISTRY_WRITE_BEHIND_INTERVAL': '1'}), self.assertRaises(ValueError):
+            serve(workers=2)
+        mock_bind.assert_not_called()
+
+    @patch('src.launcher.bind_socket')
+    def test_launcher_refuses_tiered_storage_with_several_workers(self, mock_bind):
+        with patch.dict(os.environ, {'MODEL_REGISTRY_STORAGE': 'tiered'}), self.assertRaises(ValueError):
+            serve(workers=2)
+        mock_bind.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
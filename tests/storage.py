@@ -1,6 +1,13 @@
-from unittest.mock import patch, MagicMock, TestCase
+import io
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch, MagicMock
 
-from src.storage import retrieve_artefact, store_artefact
+from src.storage import (ArtefactDigest, ArtefactIntegrityError, ModelNotFoundError, StaleObjectError,
+                         backend_from_config, retrieve_artefact, store_artefact, store_artefact_fileobj,
+                         stream_artefact, verify_artefact)
+from src.storage_backends import S3Backend
 
 
 class TestStoreArtefact(TestCase):
@@ -152,3 +159,132 @@ class TestRetrieveArtefact(TestCase):
         
         self.assertEqual(str(cm.exception), error_message)
         mock_s3.return_value.download_file.assert_called_once_with(local_file_path)
+
+
+class TestArtefactIntegrity(TestCase):
+    def setUp(self):
+        self.model_id = 'test-model'
+        self.data = b'artefact contents' * 100
+        self.digest = ArtefactDigest()
+        self.digest.update(self.data)
+
+    def _patch_backend(self, mock_s3):
+        patcher = patch('src.storage.backend', S3Backend('test-bucket', s3=mock_s3))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _mock_object(self, mock_s3, e_tag):
+        obj = mock_s3.Object.return_value
+        obj.e_tag = f'"{e_tag}"'
+        obj.content_length = len(self.data)
+        obj.server_side_encryption = None
+        mock_s3.meta.client.get_object.return_value = {'Body': io.BytesIO(self.data)}
+        return obj
+
+    @patch('src.storage.record_artefact_checksums')
+    def test_store_artefact_records_checksums(self, mock_record):
+        """
+        Test that uploading computes the checksums in the same pass and records them on the model.
+        """
+        mock_s3 = MagicMock()
+        self._patch_backend(mock_s3)
+        self._mock_object(mock_s3, self.digest.etag)
+        mock_s3.Object.return_value.upload_fileobj.side_effect = lambda reader, Config: reader.read()
+
+        checksums = store_artefact_fileobj(self.model_id, io.BytesIO(self.data))
+
+        self.assertEqual(checksums['sha256'], self.digest.sha256)
+        mock_record.assert_called_once_with(self.model_id, checksums)
+
+    @patch('src.storage.record_artefact_checksums')
+    def test_store_artefact_etag_mismatch(self, mock_record):
+        """
+        Test that an ETag mismatch after upload deletes the object and fails the upload.
+        """
+        mock_s3 = MagicMock()
+        self._patch_backend(mock_s3)
+        obj = self._mock_object(mock_s3, 'bad-etag')
+        obj.upload_fileobj.side_effect = lambda reader, Config: reader.read()
+
+        with self.assertRaises(ArtefactIntegrityError):
+            store_artefact_fileobj(self.model_id, io.BytesIO(self.data))
+
+        obj.delete.assert_called_once_with()
+        mock_record.assert_not_called()
+
+    @patch('src.storage.record_artefact_checksums')
+    def test_store_artefact_for_missing_model(self, mock_record):
+        """
+        Test that an upload for a model that does not exist deletes the object and fails the upload.
+        """
+        mock_record.return_value = False
+        mock_s3 = MagicMock()
+        self._patch_backend(mock_s3)
+        obj = self._mock_object(mock_s3, self.digest.etag)
+        obj.upload_fileobj.side_effect = lambda reader, Config: reader.read()
+
+        with self.assertRaises(ModelNotFoundError):
+            store_artefact_fileobj(self.model_id, io.BytesIO(self.data))
+
+        mock_s3.Object.assert_any_call('test-bucket', f'{self.model_id}/artefact')
+        obj.delete.assert_called()
+
+    @patch('src.storage.read_model')
+    def test_verify_artefact_detects_corruption(self, mock_read_model):
+        """
+        Test that verifying an artefact whose stored bytes differ from the recorded checksums raises.
+        """
+        mock_s3 = MagicMock()
+        self._patch_backend(mock_s3)
+        self._mock_object(mock_s3, self.digest.etag)
+        corrupted = dict(self.digest.as_dict(), sha256='0' * 64)
+        mock_read_model.return_value = MagicMock(artefact_checksums=corrupted)
+
+        with self.assertRaises(ArtefactIntegrityError):
+            verify_artefact(self.model_id)
+
+        mock_read_model.return_value = MagicMock(artefact_checksums=self.digest.as_dict())
+        mock_s3.meta.client.get_object.return_value = {'Body': io.BytesIO(self.data)}
+        self.assertEqual(verify_artefact(self.model_id)['sha256'], self.digest.sha256)
+
+
+class TestStreamArtefact(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = backend_from_config({'MODEL_REGISTRY_STORAGE': 'local',
+                                            'MODEL_REGISTRY_STORAGE_DIR': self.tmp.name})
+        patcher = patch('src.storage.backend', self.backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp.cleanup)
+
+    def _replace(self, data):
+        info = self.backend.put('model-1/artefact', io.BytesIO(data))
+        # Make sure the replacement is told apart even on filesystems with coarse timestamps.
+        os.utime(self.backend.path('model-1/artefact'), ns=(0, info.token + 1))
+
+    def test_artefact_replaced_before_the_first_read_is_read_again(self):
+        """
+        Test that a stream whose artefact is replaced by one of the same size reads the new version.
+        """
+        self.backend.put('model-1/artefact', io.BytesIO(b'old-bytes'))
+        expected = ArtefactDigest()
+        expected.update(b'new-bytes')
+        stream = stream_artefact('model-1', expected=expected.as_dict())
+
+        self._replace(b'new-bytes')
+
+        self.assertEqual(b''.join(stream), b'new-bytes')
+
+    def test_artefact_replaced_with_another_size_fails_the_stream(self):
+        """
+        Test that a stream cannot switch to a replacement that does not match the size it announced.
+        """
+        self.backend.put('model-1/artefact', io.BytesIO(b'old-bytes'))
+        stream = stream_artefact('model-1', expected={'size': 9})
+
+        self._replace(b'longer new bytes')
+
+        with self.assertRaises(StaleObjectError):
+            b''.join(stream)
@@ -0,0 +1,252 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from src.checksums import PART_SIZE
+from src.storage_backends import (PROMOTION_QUEUE, LocalBackend, ObjectInfo, S3Backend, StaleObjectError,
+                                  StorageBackend, TieredBackend, TieringPolicy, backend_from_config)
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('Condition not met in time')
+        time.sleep(0.01)
+
+
+class TestStorageBackend(unittest.TestCase):
+    """
+    Test suite for the backend interface.
+    """
+
+    def test_backends_must_implement_the_abstract_methods(self):
+        class WriteOnly(StorageBackend):
+            def put(self, key, fileobj):
+                return ObjectInfo(0, None, None)
+
+        with self.assertRaises(TypeError):
+            WriteOnly()
+
+        class Minimal(WriteOnly):
+            head = iter_chunks = read_range = list = lambda self, *args: None
+
+            def delete(self, key):
+                return True
+
+        backend = Minimal()
+        self.assertEqual(backend.delete_many(['a', 'b']), 2)
+        self.assertIsNone(backend.local_path('a'))
+        self.assertEqual(list(backend.incomplete_uploads(0)), [])
+
+
+class TestLocalBackend(unittest.TestCase):
+    """
+    Test suite for the local filesystem backend.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = LocalBackend(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_put_head_read_delete(self):
+        data = os.urandom(10_000)
+
+        info = self.backend.put('model-1/artefact', io.BytesIO(data))
+
+        self.assertEqual(info.size, len(data))
+        self.assertEqual(self.backend.head('model-1/artefact'), info)
+        self.assertEqual(b''.join(self.backend.iter_chunks('model-1/artefact', info, chunk_size=4096)), data)
+        self.assertEqual(list(self.backend.list('model-1/')), [('model-1/artefact', len(data))])
+        self.assertIsNotNone(self.backend.local_path('model-1/artefact'))
+
+        self.assertTrue(self.backend.delete('model-1/artefact'))
+        self.assertIsNone(self.backend.head('model-1/artefact'))
+        self.assertFalse(self.backend.delete('model-1/artefact'))
+
+    def test_stale_reads_are_refused(self):
+        info = self.backend.put('model-1/artefact', io.BytesIO(b'old contents'))
+        os.utime(self.backend.path('model-1/artefact'), ns=(0, info.token + 1))
+
+        with self.assertRaises(StaleObjectError):
+            b''.join(self.backend.iter_chunks('model-1/artefact', info))
+        self.backend.delete('model-1/artefact')
+        with self.assertRaises(StaleObjectError):
+            b''.join(self.backend.iter_chunks('model-1/artefact', info))
+
+    def test_failed_write_leaves_nothing_behind(self):
+        def chunks():
+            yield b'partial'
+            raise IOError('connection lost')
+
+        with self.assertRaises(IOError):
+            self.backend.put_chunks('model-1/artefact', chunks())
+
+        self.assertIsNone(self.backend.head('model-1/artefact'))
+        self.assertEqual(list(self.backend.list()), [])
+
+    def test_keys_cannot_escape_root(self):
+        with self.assertRaises(ValueError):
+            self.backend.put('../outside', io.BytesIO(b'x'))
+
+
+class TestTieringPolicy(unittest.TestCase):
+    """
+    Test suite for the access-frequency tiering policy.
+    """
+
+    def test_scores_decay(self):
+        policy = TieringPolicy(promote_after=3, half_life=10)
+        for _ in range(4):
+            policy.record_access('a', now=0)
+
+        self.assertAlmostEqual(policy.score('a', now=10), 2.0)
+        self.assertEqual(policy.score('unknown', now=10), 0.0)
+
+    def test_demotes_coldest_first_when_over_capacity(self):
+        policy = TieringPolicy(capacity_bytes=250, demote_below=0)
+        now = time.monotonic()
+        for key, reads in (('hot', 5), ('warm', 3), ('cold', 1)):
+            for _ in range(reads):
+                policy.record_access(key, now)
+
+        demoted = list(policy.demotions({'hot': 100, 'warm': 100, 'cold': 100}))
+
+        self.assertEqual(demoted, ['cold'])
+
+    def test_prune_drops_decayed_scores(self):
+        policy = TieringPolicy(half_life=10, forget_below=0.1)
+        policy.record_access('old', now=0)
+        policy.record_access('recent', now=40)
+
+        self.assertEqual(policy.prune(now=40), 1)
+        self.assertEqual(set(policy._scores), {'recent'})
+
+
+class TestTieredBackend(unittest.TestCase):
+    """
+    Test suite for the tiered backend, with a local directory standing in for the cold tier.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cold = LocalBackend(os.path.join(self.tmp.name, 'cold'))
+        self.hot = LocalBackend(os.path.join(self.tmp.name, 'hot'))
+        self.backend = TieredBackend(self.hot, self.cold, TieringPolicy(promote_after=2))
+        self.data = os.urandom(5000)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def read(self, key: str) -> bytes:
+        return b''.join(self.backend.iter_chunks(key, self.backend.head(key)))
+
+    def test_frequently_read_objects_are_promoted(self):
+        self.backend.put('model-1/artefact', io.BytesIO(self.data))
+        self.assertIsNone(self.backend.local_path('model-1/artefact'))
+
+        self.assertEqual(self.read('model-1/artefact'), self.data)
+        self.assertEqual(self.read('model-1/artefact'), self.data)
+        wait_for(lambda: self.backend.promotions == 1)
+
+        self.assertIsNotNone(self.backend.local_path('model-1/artefact'))
+        self.assertEqual(self.hot.head('model-1/artefact').size, len(self.data))
+
+    def test_overwrite_and_delete_evict_hot_copy(self):
+        self.backend.put('model-1/artefact', io.BytesIO(self.data))
+        self.read('model-1/artefact')
+        self.read('model-1/artefact')
+        wait_for(lambda: self.backend.promotions == 1)
+
+        self.backend.put('model-1/artefact', io.BytesIO(b'new contents'))
+        self.assertIsNone(self.hot.head('model-1/artefact'))
+        self.assertEqual(self.read('model-1/artefact'), b'new contents')
+
+        self.backend.delete('model-1/artefact')
+        self.assertIsNone(self.backend.head('model-1/artefact'))
+
+    def test_capacity_demotes_least_read(self):
+        self.backend.policy.capacity_bytes = len(self.data)
+        for key, reads in (('a/artefact', 2), ('b/artefact', 4)):
+            self.backend.put(key, io.BytesIO(self.data))
+            for _ in range(reads):
+                self.read(key)
+            wait_for(lambda: key in self.backend._hot or self.backend.demotions)
+
+        # Each promotion is counted before the rebalance that follows it, so wait for the demotion itself.
+        wait_for(lambda: self.backend.promotions == 2 and self.backend.demotions == 1)
+        self.assertIsNone(self.hot.head('a/artefact'))
+        self.assertIsNotNone(self.hot.head('b/artefact'))
+        self.assertEqual(self.backend.demotions, 1)
+
+    def test_reads_rebalance_cold_objects_out(self):
+        self.backend.rebalance_interval = 0
+        self.backend.put('model-1/artefact', io.BytesIO(self.data))
+        self.read('model-1/artefact')
+        self.read('model-1/artefact')
+        wait_for(lambda: self.backend.promotions == 1)
+
+        # An hour later the object has gone cold, and a read of another object demotes it.
+        self.backend.policy.half_life = 1e-6
+        self.backend.put('model-2/artefact', io.BytesIO(self.data))
+        self.read('model-2/artefact')
+
+        wait_for(lambda: self.backend.demotions == 1)
+        self.assertIsNone(self.hot.head('model-1/artefact'))
+        self.assertEqual(self.backend.policy._scores, {})
+
+    def test_promotions_are_bounded(self):
+        started = threading.Event()
+        release = threading.Event()
+        cold_iter_chunks = self.cold.iter_chunks
+
+        def slow_iter_chunks(key, info, workers=4, chunk_size=PART_SIZE):
+            started.set()
+            release.wait()
+            return cold_iter_chunks(key, info, workers, chunk_size)
+
+        self.backend = TieredBackend(self.hot, self.cold, TieringPolicy(promote_after=1), promotion_workers=1)
+        keys = [f'model-{i}/artefact' for i in range(1 + PROMOTION_QUEUE + 5)]
+        for key in keys:
+            self.cold.put(key, io.BytesIO(self.data))
+        with patch.object(self.cold, 'iter_chunks', slow_iter_chunks):
+            for key in keys:
+                self.backend._start_promotion(key)
+            started.wait(5)
+            self.assertEqual(len(self.backend._promoting), 1 + PROMOTION_QUEUE)
+            self.assertEqual(len(self.backend._executor._threads), 1)
+            release.set()
+            wait_for(lambda: self.backend.promotions == 1 + PROMOTION_QUEUE)
+
+
+class TestBackendFromConfig(unittest.TestCase):
+    """
+    Test suite for selecting the backend through configuration.
+    """
+
+    def test_selection(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.assertIsInstance(backend_from_config({'MODEL_REGISTRY_STORAGE': 'local',
+                                                       'MODEL_REGISTRY_STORAGE_DIR': tmp}), LocalBackend)
+            tiered = backend_from_config({'MODEL_REGISTRY_STORAGE': 'tiered', 'MODEL_REGISTRY_STORAGE_DIR': tmp,
+                                          'MODEL_REGISTRY_BUCKET': 'models', 'MODEL_REGISTRY_HOT_TIER_BYTES': '100'})
+            self.assertIsInstance(tiered, TieredBackend)
+            self.assertIsInstance(tiered.cold, S3Backend)
+            self.assertEqual(tiered.cold.bucket_name, 'models')
+            self.assertEqual(tiered.policy.capacity_bytes, 100)
+
+        with self.assertRaises(ValueError):
+            backend_from_config({'MODEL_REGISTRY_STORAGE': 'local'})
+        with self.assertRaises(ValueError):
+            backend_from_config({'MODEL_REGISTRY_STORAGE': 'ftp'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import io
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import boto3
+from moto import mock_dynamodb, mock_s3
+
+from src.storage_backends import LocalBackend, S3Backend
+from src.sweeper import BloomFilter, Sweeper, live_models
+
+
+def bloom(*model_ids: str) -> BloomFilter:
+    live = BloomFilter(100)
+    for model_id in model_ids:
+        live.add(model_id)
+    return live
+
+
+class TestBloomFilter(unittest.TestCase):
+    """
+    Test suite for the live model filter.
+    """
+
+    def test_no_false_negatives_and_few_false_positives(self):
+        live = BloomFilter(10_000, error_rate=0.01)
+        for i in range(10_000):
+            live.add(f'model-{i}')
+
+        self.assertTrue(all(f'model-{i}' in live for i in range(10_000)))
+        false_positives = sum(f'other-{i}' in live for i in range(10_000))
+        self.assertLess(false_positives, 200)
+        self.assertLess(live.size_bytes, 12_500)
+
+    @patch('src.sweeper.ModelTable')
+    def test_live_models_scans_ids(self, mock_model_table):
+        mock_model_table.describe_table.return_value = {'ItemCount': 2}
+        mock_model_table.scan.return_value = [MagicMock(model_id='model-1'), MagicMock(model_id='model-2')]
+
+        live = live_models()
+
+        mock_model_table.scan.assert_called_once_with(attributes_to_get=['model_id'])
+        self.assertIn('model-1', live)
+        self.assertIn('model-2', live)
+        self.assertEqual(live.count, 2)
+
+
+class TestSweeper(unittest.TestCase):
+    """
+    Test suite for deleting orphaned artefacts.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = LocalBackend(self.tmp.name)
+        for key in ('model-1/artefact', 'model-2/artefact', 'model-2/artefact.tensors', 'model-3/artefact',
+                    'README'):
+            self.backend.put(key, io.BytesIO(b'data'))
+        patcher = patch('src.sweeper.ModelTable.batch_get', side_effect=lambda ids, **kwargs: [
+            MagicMock(model_id=model_id) for model_id in ids if model_id == 'model-3'])
+        self.batch_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def keys(self):
+        return sorted(key for key, _ in self.backend.list())
+
+    def test_deletes_only_objects_of_missing_models(self):
+        stats = Sweeper(self.backend).sweep(live=bloom('model-1'))
+
+        self.assertEqual(self.keys(), ['README', 'model-1/artefact', 'model-3/artefact'])
+        self.assertEqual((stats['scanned'], stats['orphaned'], stats['orphaned_bytes'], stats['deleted']),
+                         (5, 2, 8, 2))
+
+    def test_dry_run_deletes_nothing(self):
+        stats = Sweeper(self.backend, dry_run=True).sweep(live=bloom('model-1'))
+
+        self.assertEqual(len(self.keys()), 5)
+        self.assertEqual((stats['orphaned'], stats['deleted']), (2, 0))
+
+    @patch('src.sweeper.time.sleep')
+    def test_deletes_are_rate_limited(self, mock_sleep):
+        for i in range(4, 10):
+            self.backend.put(f'model-{i}/artefact', io.BytesIO(b'data'))
+
+        stats = Sweeper(self.backend, deletes_per_second=2, batch_size=2).sweep(live=bloom('model-1'))
+
+        self.assertEqual(stats['deleted'], 8)
+        self.assertGreater(self.batch_get.call_count, 1)
+        self.assertGreaterEqual(sum(call.args[0] for call in mock_sleep.call_args_list), 2.5)
+
+    def test_aborts_stale_incomplete_uploads(self):
+        stale = os.path.join(self.tmp.name, 'model-1', 'artefact.partial-abc')
+        fresh = os.path.join(self.tmp.name, 'model-1', 'artefact.partial-def')
+        for path in (stale, fresh):
+            with open(path, 'wb') as f:
+                f.write(b'part')
+        os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+        stats = Sweeper(self.backend, upload_max_age=3600).sweep(live=bloom('model-1'))
+
+        self.assertEqual(stats['uploads_aborted'], 1)
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(fresh))
+
+
+@mock_dynamodb
+class TestConfirmingRead(unittest.TestCase):
+    """
+    Test suite for confirming orphans against DynamoDB before deleting them.
+    """
+
+    def setUp(self) -> None:
+        from models import ModelTable
+        ModelTable.create_table(read_capacity_units=1, write_capacity_units=1, wait=True)
+        ModelTable(model_id='model-1', name='created after the scan').save()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = LocalBackend(self.tmp.name)
+        self.backend.put('model-1/artefact', io.BytesIO(b'data'))
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_model_missing_from_the_filter_is_kept(self):
+        from models import ModelTable
+        with patch('src.sweeper.ModelTable.batch_get', wraps=ModelTable.batch_get) as batch_get:
+            stats = Sweeper(self.backend).sweep(live=bloom())
+
+        self.assertEqual((stats['orphaned'], stats['deleted']), (0, 0))
+        self.assertEqual([key for key, _ in self.backend.list()], ['model-1/artefact'])
+        self.assertTrue(batch_get.call_args.kwargs['consistent_read'])
+
+
+@mock_s3
+class TestS3Sweep(unittest.TestCase):
+    """
+    Test suite for sweeping an S3 bucket.
+    """
+
+    def setUp(self) -> None:
+        self.client = boto3.client('s3', region_name='us-east-1')
+        self.client.create_bucket(Bucket='my-model-bucket')
+        self.backend = S3Backend('my-model-bucket', s3=boto3.resource('s3', region_name='us-east-1'))
+
+    @patch('src.sweeper.ModelTable.batch_get', return_value=[])
+    def test_deletes_in_batches_and_aborts_uploads(self, mock_batch_get):
+        for i in range(1500):
+            self.client.put_object(Bucket='my-model-bucket', Key=f'deleted-{i}/artefact', Body=b'x')
+        self.client.put_object(Bucket='my-model-bucket', Key='model-1/artefact', Body=b'x')
+        self.client.create_multipart_upload(Bucket='my-model-bucket', Key='model-1/artefact')
+
+        with patch.object(self.backend.s3.meta.client, 'delete_objects',
+                          wraps=self.backend.s3.meta.client.delete_objects) as delete_objects:
+            stats = Sweeper(self.backend, upload_max_age=-60).sweep(live=bloom('model-1'))
+
+        self.assertEqual(delete_objects.call_count, 2)
+        self.assertEqual((stats['orphaned'], stats['deleted'], stats['uploads_aborted']), (1500, 1500, 1))
+        self.assertEqual([key for key, _ in self.backend.list()], ['model-1/artefact'])
+        self.assertEqual(self.client.list_multipart_uploads(Bucket='my-model-bucket').get('Uploads', []), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,230 @@
+import io
+import json
+import os
+import struct
+import tempfile
+import unittest
+import zlib
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+import tensors
+from src.storage import (ArtefactIntegrityError, backend_from_config, read_tensor, read_tensor_index,
+                         store_artefact_fileobj)
+from src.tensors import LazyTensors, TensorError, TensorIndexer, parse_header, read_header
+
+
+def safetensors(entries, metadata=None) -> bytes:
+    """
+    Builds a safetensors file from (name, dtype, shape, data) tuples.
+    """
+    header, offset = {}, 0
+    if metadata is not None:
+        header['__metadata__'] = metadata
+    for name, dtype, shape, data in entries:
+        header[name] = {'dtype': dtype, 'shape': shape, 'data_offsets': [offset, offset + len(data)]}
+        offset += len(data)
+    encoded = json.dumps(header).encode()
+    return struct.pack('<Q', len(encoded)) + encoded + b''.join(data for *_, data in entries)
+
+
+TENSORS = [('embed.weight', 'F32', [4, 8], os.urandom(128)), ('layers.0.bias', 'F16', [8], os.urandom(16)),
+           ('empty', 'I64', [0], b''), ('layers.1.weight', 'U8', [1000], os.urandom(1000))]
+
+
+class TestTensorIndex(unittest.TestCase):
+    """
+    Test suite for indexing safetensors files.
+    """
+
+    def setUp(self) -> None:
+        self.file = safetensors(TENSORS, metadata={'format': 'pt'})
+
+    def read_range(self, offset: int, length: int) -> bytes:
+        return self.file[offset:offset + length]
+
+    def test_streamed_index_locates_and_checksums_tensors(self):
+        indexer = TensorIndexer()
+        for i in range(0, len(self.file), 7):
+            indexer.update(self.file[i:i + 7])
+
+        index = indexer.index(len(self.file))
+
+        self.assertEqual(index.metadata, {'format': 'pt'})
+        self.assertEqual([tensor.name for tensor in index], [name for name, *_ in TENSORS])
+        for name, dtype, shape, data in TENSORS:
+            tensor = index.get(name)
+            self.assertEqual((tensor.dtype, tensor.shape, tensor.crc32), (dtype, shape, zlib.crc32(data)))
+            self.assertEqual(self.read_range(tensor.offset, tensor.size), data)
+
+    def test_header_index_matches_streamed_index(self):
+        indexer = TensorIndexer()
+        indexer.update(self.file)
+
+        streamed = indexer.index(len(self.file))
+        from_header = read_header(self.read_range, len(self.file))
+
+        self.assertEqual([tensor._replace(crc32=None) for tensor in streamed], list(from_header))
+
+    def test_other_files_are_not_indexed(self):
+        for data in (b'PK\x03\x04' + os.urandom(100), struct.pack('<Q', 4) + b'[1] ', self.file[:-10]):
+            indexer = TensorIndexer()
+            indexer.update(data)
+            self.assertIsNone(indexer.index(len(data)))
+
+        with self.assertRaises(TensorError):
+            read_header(lambda offset, length: b'\xff' * length, 1000)
+
+    def test_invalid_headers(self):
+        overlapping = {'a': {'dtype': 'U8', 'shape': [4], 'data_offsets': [0, 4]},
+                       'b': {'dtype': 'U8', 'shape': [4], 'data_offsets': [2, 6]}}
+        wrong_size = {'a': {'dtype': 'F32', 'shape': [4], 'data_offsets': [0, 4]}}
+
+        for header in (overlapping, wrong_size):
+            with self.assertRaises(TensorError):
+                parse_header(json.dumps(header).encode())
+
+    def test_lazy_file_views(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'model.safetensors')
+            with open(path, 'wb') as f:
+                f.write(self.file)
+
+            with LazyTensors.from_file(path) as lazy:
+                self.assertEqual(len(lazy), len(TENSORS))
+                self.assertEqual(lazy.info('layers.0.bias').shape, [8])
+                self.assertEqual(bytes(lazy['layers.1.weight']), TENSORS[3][3])
+                self.assertNotIn('missing', lazy)
+
+
+@patch('src.storage.record_artefact_checksums')
+class TestTensorArtefacts(unittest.TestCase):
+    """
+    Test suite for recording and reading tensor indexes of stored artefacts, against the local storage backend.
+    """
+
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.backend = backend_from_config({'MODEL_REGISTRY_STORAGE': 'local',
+                                            'MODEL_REGISTRY_STORAGE_DIR': self.tmp.name})
+        self.file = safetensors(TENSORS)
+        for patcher in (patch('src.storage.backend', self.backend),
+                        patch.dict('src.storage._tensor_indexes', clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_index_recorded_at_upload(self, mock_record):
+        store_artefact_fileobj('model-1', io.BytesIO(self.file))
+
+        self.assertIsNotNone(self.backend.head('model-1/artefact.tensors'))
+        self.assertEqual(read_tensor_index('model-1').get('embed.weight').crc32, zlib.crc32(TENSORS[0][3]))
+        with patch.object(self.backend, 'read_range', wraps=self.backend.read_range) as read_range:
+            self.assertEqual(read_tensor('model-1', 'layers.1.weight'), TENSORS[3][3])
+        self.assertEqual(read_range.call_count, 1)
+        self.assertIsNone(read_tensor('model-1', 'missing'))
+        self.assertIsNone(read_tensor_index('model-2'))
+
+    def test_replacing_with_other_artefact_drops_index(self, mock_record):
+        store_artefact_fileobj('model-1', io.BytesIO(self.file))
+        read_tensor_index('model-1')
+
+        store_artefact_fileobj('model-1', io.BytesIO(b'not tensors'))
+
+        self.assertIsNone(self.backend.head('model-1/artefact.tensors'))
+        # src.storage imports its sibling modules by their top-level names, so it raises their exceptions.
+        with self.assertRaises(tensors.TensorError):
+            read_tensor_index('model-1')
+
+    def test_artefacts_without_recorded_index_use_their_header(self, mock_record):
+        store_artefact_fileobj('model-1', io.BytesIO(self.file))
+        self.backend.delete('model-1/artefact.tensors')
+
+        self.assertIsNone(read_tensor_index('model-1').get('embed.weight').crc32)
+        self.assertEqual(read_tensor('model-1', 'embed.weight'), TENSORS[0][3])
+
+    def test_corrupted_tensor(self, mock_record):
+        store_artefact_fileobj('model-1', io.BytesIO(self.file))
+        offset = read_tensor_index('model-1').get('embed.weight').offset
+        with open(self.backend.path('model-1/artefact'), 'r+b') as f:
+            f.seek(offset)
+            f.write(b'\0')
+
+        with self.assertRaises(ArtefactIntegrityError):
+            read_tensor('model-1', 'embed.weight')
+
+
+@patch('storage.record_artefact_checksums')
+class TestLazyTensorsFromServer(unittest.TestCase):
+    """
+    Test suite for lazily fetching tensors through the server's tensor endpoints.
+    """
+
+    def setUp(self) -> None:
+        import server
+        import storage
+        self.tmp = tempfile.TemporaryDirectory()
+        self.storage = storage
+        for patcher in (patch('storage.backend', storage.backend_from_config({
+                'MODEL_REGISTRY_STORAGE': 'local', 'MODEL_REGISTRY_STORAGE_DIR': self.tmp.name})),
+                        patch.dict('storage._tensor_indexes', clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.client = TestClient(server.app)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_tensors_fetched_on_first_access(self, mock_record):
+        self.storage.store_artefact_fileobj('model-1', io.BytesIO(safetensors(TENSORS)))
+
+        with patch('server.read_tensor_with_info', wraps=self.storage.read_tensor_with_info) as fetched:
+            lazy = LazyTensors.from_server('', 'model-1', client=self.client)
+            self.assertEqual(fetched.call_count, 0)
+            lazy.prefetch(['embed.weight', 'layers.0.bias'])
+            self.assertEqual(lazy['embed.weight'], TENSORS[0][3])
+            self.assertEqual(fetched.call_count, 2)
+
+        response = self.client.get('/models/model-1/artefact/tensors/layers.0.bias')
+        self.assertEqual((response.headers['x-tensor-dtype'], response.headers['x-tensor-shape']), ('F16', '8'))
+        self.assertEqual(self.client.get('/models/model-1/artefact/tensors/missing').status_code, 404)
+
+    def test_names_with_url_characters(self, mock_record):
+        tensors = [('scale?v=2#a%b', 'U8', [4], os.urandom(4)), ('blocks/0 weight', 'U8', [2], os.urandom(2))]
+        self.storage.store_artefact_fileobj('model-1', io.BytesIO(safetensors(tensors)))
+
+        lazy = LazyTensors.from_server('', 'model-1', client=self.client)
+
+        self.assertEqual([lazy[name] for name, _, _, _ in tensors], [data for _, _, _, data in tensors])
+
+    def test_model_ids_with_url_characters(self, mock_record):
+        self.storage.store_artefact_fileobj('model 1?v=2#a%b', io.BytesIO(safetensors(TENSORS)))
+
+        lazy = LazyTensors.from_server('', 'model 1?v=2#a%b', client=self.client)
+
+        self.assertEqual(lazy['layers.0.bias'], TENSORS[1][3])
+
+    def test_tensor_served_when_index_dropped_after_read(self, mock_record):
+        # The headers come from the read itself, not a second index lookup that a replace or delete could empty.
+        self.storage.store_artefact_fileobj('model-1', io.BytesIO(safetensors(TENSORS)))
+
+        with patch('server.read_tensor_index', return_value=None):
+            response = self.client.get('/models/model-1/artefact/tensors/layers.0.bias')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, TENSORS[1][3])
+        self.assertEqual(response.headers['x-tensor-dtype'], 'F16')
+
+    def test_not_a_safetensors_artefact(self, mock_record):
+        self.storage.store_artefact_fileobj('model-1', io.BytesIO(b'pickle'))
+
+        with self.assertRaises(TensorError):
+            LazyTensors.from_server('', 'model-1', client=self.client)
+        self.assertEqual(self.client.get('/models/model-2/artefact/tensors').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
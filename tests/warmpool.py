@@ -0,0 +1,66 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from src.warmpool import WARM_KEY, WarmPool
+
+
+class TestWarmPool(unittest.TestCase):
+    """
+    Test suite for keeping DynamoDB connections warm.
+    """
+
+    def setUp(self) -> None:
+        self.model = MagicMock()
+        self.model.Meta.max_pool_connections = 10
+        self.model.DoesNotExist = KeyError
+        self.in_flight = 0
+        self.most_in_flight = 0
+        self.lock = threading.Lock()
+        self.released = threading.Event()
+
+        def get(key):
+            with self.lock:
+                self.in_flight += 1
+                self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            self.released.wait(0.05)
+            with self.lock:
+                self.in_flight -= 1
+            raise KeyError(key)
+
+        self.model.get.side_effect = get
+
+    def test_pings_are_concurrent(self):
+        pool = WarmPool(self.model, connections=16, interval=60)
+
+        pool.start()
+        pool.close()
+
+        self.assertEqual(self.model.Meta.max_pool_connections, 16)
+        self.assertEqual(self.model.get.call_count, 16)
+        self.model.get.assert_called_with(WARM_KEY)
+        self.assertEqual(self.most_in_flight, 16)
+        self.assertEqual((pool.rounds, pool.failures), (1, 0))
+
+    def test_keeps_warming_in_background(self):
+        pool = WarmPool(self.model, connections=2, interval=0.05)
+        pool.start()
+        self.addCleanup(pool.close)
+
+        deadline = threading.Event()
+        while pool.rounds < 3 and not deadline.wait(0.01):
+            pass
+
+        self.assertGreaterEqual(pool.rounds, 3)
+        self.assertEqual(self.model.Meta.max_pool_connections, 10)
+
+    def test_failures_are_counted(self):
+        self.model.get.side_effect = IOError('connection reset')
+        pool = WarmPool(self.model, connections=3, interval=60)
+
+        self.assertEqual(pool.warm(), 3)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
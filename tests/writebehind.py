@@ -0,0 +1,125 @@
+import unittest
+from unittest.mock import patch, MagicMock
+
+from pynamodb.exceptions import UpdateError
+
+from src.writebehind import WriteBehindQueue
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    """
+    Test suite for the coalescing write-behind queue.
+    """
+
+    def setUp(self) -> None:
+        self.queue = WriteBehindQueue(flush_interval=1.0)
+
+    def test_updates_are_coalesced(self):
+        """
+        Test that repeated updates to the same model merge into one pending entry, last writer winning.
+        """
+        self.queue.put('model-1', {'name': 'a', 'tags': {'step': 1}})
+        self.queue.put('model-1', {'tags': {'step': 2}})
+
+        self.assertEqual(self.queue.pending('model-1'), {'name': 'a', 'tags': {'step': 2}})
+        self.assertIsNone(self.queue.pending('model-2'))
+
+    @patch('src.writebehind.ModelTable')
+    def test_flush_issues_one_write_per_model(self, mock_table):
+        """
+        Test that a flush issues a single UpdateItem per model regardless of how many updates were buffered.
+        """
+        for step in range(10):
+            self.queue.put('model-1', {'tags': {'step': step}})
+        self.queue.put('model-2', {'name': 'b'})
+
+        writes = self.queue.flush()
+
+        self.assertEqual(writes, 2)
+        self.assertEqual(mock_table.return_value.update.call_count, 2)
+        mock_table.tags.set.assert_called_once_with({'step': 9})
+        self.assertIsNone(self.queue.pending('model-1'))
+
+    @patch('src.writebehind.ModelTable')
+    def test_failed_write_is_requeued_under_newer_updates(self, mock_table):
+        """
+        Test that a failed write goes back into the buffer without overwriting updates that arrived since.
+        """
+        error = UpdateError("boom")
+        error.cause = MagicMock(response={'Error': {'Code': 'ProvisionedThroughputExceededException'}})
+
+        def fail_and_race(*args, **kwargs):
+            self.queue.put('model-1', {'name': 'newer'})
+            raise error
+
+        mock_table.return_value.update.side_effect = fail_and_race
+        self.queue.put('model-1', {'name': 'older', 'description': 'kept'})
+
+        self.assertEqual(self.queue.flush(), 0)
+        self.assertEqual(self.queue.pending('model-1'), {'name': 'newer', 'description': 'kept'})
+
+    @patch('src.writebehind.ModelTable')
+    def test_updates_being_written_stay_pending(self, mock_table):
+        """
+        Test that an update stays visible to readers while the flush is writing it, and not after.
+        """
+        seen = []
+        mock_table.return_value.update.side_effect = lambda **kwargs: seen.append(self.queue.pending('model-1'))
+        self.queue.put('model-1', {'name': 'a'})
+
+        self.queue.flush()
+
+        self.assertEqual(seen, [{'name': 'a'}])
+        self.assertIsNone(self.queue.pending('model-1'))
+
+    @patch('src.writebehind.ModelTable')
+    def test_unexpected_error_requeues_the_rest_of_the_batch(self, mock_table):
+        """
+        Test that updates a flush did not get to because of an unexpected error are not lost.
+        """
+        mock_table.return_value.update.side_effect = IOError('connection reset')
+        self.queue.put('model-1', {'name': 'a'})
+        self.queue.put('model-2', {'name': 'b'})
+
+        with self.assertRaises(IOError):
+            self.queue.flush()
+
+        self.assertEqual(self.queue.pending('model-1'), {'name': 'a'})
+        self.assertEqual(self.queue.pending('model-2'), {'name': 'b'})
+
+    @patch('src.writebehind.ModelTable')
+    def test_update_of_deleted_model_is_dropped(self, mock_table):
+        """
+        Test that an update whose model was deleted before the flush is neither counted nor requeued.
+        """
+        error = UpdateError("conditional check failed")
+        error.cause = MagicMock(response={'Error': {'Code': 'ConditionalCheckFailedException'}})
+        mock_table.return_value.update.side_effect = error
+        self.queue.put('model-1', {'name': 'a'})
+
+        self.assertEqual(self.queue.flush(), 0)
+        self.assertEqual(self.queue.writes_issued, 0)
+        self.assertIsNone(self.queue.pending('model-1'))
+
+    @patch('src.writebehind.ModelTable')
+    def test_close_drains_buffer(self, mock_table):
+        """
+        Test that closing the queue flushes pending updates and rejects new ones.
+        """
+        self.queue.start()
+        self.queue.put('model-1', {'name': 'a'})
+
+        self.queue.close()
+
+        mock_table.return_value.update.assert_called_once()
+        with self.assertRaises(RuntimeError):
+            self.queue.put('model-1', {'name': 'b'})
+
+    def test_flush_interval_is_bounded(self):
+        """
+        Test that flush intervals outside (0, MAX_FLUSH_INTERVAL] are rejected.
+        """
+        with self.assertRaises(ValueError):
+            WriteBehindQueue(flush_interval=0)
+        with self.assertRaises(ValueError):
+            WriteBehindQueue(flush_interval=3600)